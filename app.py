@@ -1,10 +1,32 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import logging
+import os
+from uuid import uuid4
 from datetime import datetime, timedelta
-import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from contextlib import closing
+from retencion.analisis import SEGMENTOS, analizar_retencion, calcular_metricas_estilista
+from retencion.cohortes import matrices_cohortes, meses_con_visita
+from retencion.almacen import AlmacenCompartido
+from retencion.cache_disco import cargar_ventas_disco, existe_ventas_disco, guardar_ventas_disco, hash_contenido
+from retencion.envios import ProveedorHTTP, VentanaEnvio, enviar_en_segundo_plano
+from retencion.equipo import EQUIPO, NOMBRES_EQUIPO, ORDEN_ESTILISTAS, EMOJIS_ESTILISTA
+from retencion.exportar import crear_excel_whatsapp, crear_csv_whatsapp
+from retencion.filtros import IndiceClientes
+from retencion.historial import (
+    RUTA_HISTORIAL, abrir_historial, analizar_historial, corte_historial, ingresar_historial, version_historial,
+    visitas_diarias_historial, visitas_mensuales_historial
+)
+from retencion.instrumentacion import Instrumentacion
+from retencion.lectura import combinar_ventas, leer_contenidos_ventas
+from retencion.mensajes import generar_mensajes_whatsapp
+from retencion.tendencias import kpis_mensuales
+from retencion.visitas import visitas_diarias
+from retencion.vistas import (
+    COLUMNAS_RANKING, distribucion_segmentos, estadisticas_generales, ranking_visitas,
+    segmentos_por_estilista, top_clientes_por_estilista
+)
 
 st.set_page_config(
     page_title="BLUSH - Sistema de Retención de Clientes",
@@ -59,271 +81,333 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def agrupar_estilista(nombre):
-    """Agrupa estilistas según la estructura del salón"""
-    nombre = str(nombre).strip()
-    
-    estilistas_principales = ['Julio Luna', 'Julio', 'Julio Cesar']
-    estilistas_diarios = ['Jhon', 'Yuri']
-    estilistas_nuevos = ['Susy']
-    administracion = ['Vero', 'Veronica']
-    
-    # Normalizar Julio
-    if any(x in nombre for x in estilistas_principales):
-        return 'Julio Luna'
-    elif nombre in estilistas_diarios:
-        return nombre
-    elif nombre in estilistas_nuevos:
-        return nombre
-    elif any(x in nombre for x in administracion):
-        return 'Vero'
-    else:
-        return 'Otros'
-
-def es_producto(nombre_item, clase):
-    """Detecta si un item es producto o servicio"""
-    if pd.notna(clase):
-        return str(clase).upper().strip() == 'PRODUCTO'
-    
-    if pd.isna(nombre_item):
-        return False
-    
-    nombre_upper = str(nombre_item).upper()
-    
-    palabras_producto = [
-        'MASCARILLA', 'SHAMPOO', 'SHAMPO', 'ACONDICIONADOR',
-        'CREMA', 'SERUM', 'AMPOLLA', 'SPRAY', 'GEL',
-        'LOTION', 'REDKEN', 'LOREAL', 'TIGI', 'KERASTASE',
-        'X250ML', 'X300ML', 'X500ML', 'ML', 'GR',
-        'BED HEAD', 'ALL SOFT', 'FRIZZ DISMISS'
-    ]
-    
-    for palabra in palabras_producto:
-        if palabra in nombre_upper:
-            return True
-    
-    return False
+# CACHE DEL ANÁLISIS
+# Cada interacción con un filtro vuelve a ejecutar el script completo. Las
+# ventas leídas y el análisis se guardan en un almacén compartido por todas las
+# sesiones, por hash del contenido de los archivos (y fecha de referencia):
+# si varias personas suben el mismo Excel, se lee y analiza una sola vez y
+# todas usan los mismos objetos, que se tratan como de solo lectura. Lo que
+# ninguna sesión está mostrando se desaloja cuando se supera el presupuesto.
+MEMORIA_ALMACEN_MB = int(os.environ.get('BLUSH_MEMORIA_CACHE_MB', 1024))
 
-def generar_mensaje_whatsapp(nombre, estilista, dias_sin_visita, num_visitas):
-    """Genera mensaje personalizado según el perfil del cliente"""
-    
-    nombre_corto = nombre.split()[0] if nombre else "estimado(a) cliente"
-    
-    if dias_sin_visita > 90:
-        mensaje = f"""¡Hola {nombre_corto}! 💇‍♀️ Somos BLUSH Hair & Make-Up y te extrañamos mucho! 
+@st.cache_resource
+def almacen_compartido():
+    """Almacén de ventas y análisis del proceso (uno para todas las sesiones)"""
+    return AlmacenCompartido(MEMORIA_ALMACEN_MB * 2**20)
+
+almacen = almacen_compartido()
 
-Han pasado {dias_sin_visita} días desde tu última visita con {estilista} y queremos verte de nuevo ✨
+def cargar_ventas(hashes, contenidos, instrumentacion):
+    """Ventas de uno o más archivos, compartidas por hash (en el almacén y en disco).
 
-🎁 OFERTA ESPECIAL PARA TI:
-- 20% de descuento en tu próximo servicio
-- Válido hasta fin de mes
+    Cada archivo se toma del almacén, de la cache de disco o del Excel, en ese
+    orden, dentro del cálculo de su propia entrada: aunque otra entrada se
+    desaloje entre medio, nunca se pide un archivo que no se leyó. Si faltan
+    varios en ambas caches, se leen antes en paralelo y se dejan en disco.
+    """
+    with instrumentacion.etapa('lectura_excel', archivos=len(hashes)) as etapa:
+        origenes = {'desde_disco': 0, 'desde_excel': 0}
+        
+        def leer(i):
+            df = cargar_ventas_disco(hashes[i])
+            if df is not None:
+                origenes['desde_disco'] += 1
+                return df
+            df = leer_contenidos_ventas([contenidos[i]])[0]
+            guardar_ventas_disco(hashes[i], df)
+            origenes['desde_excel'] += 1
+            return df
+        
+        faltantes = [i for i, h in enumerate(hashes) if ('ventas', h) not in almacen and not existe_ventas_disco(h)]
+        if len(faltantes) > 1:
+            for i, df in zip(faltantes, leer_contenidos_ventas([contenidos[i] for i in faltantes])):
+                guardar_ventas_disco(hashes[i], df)
+        ventas = [almacen.obtener(('ventas', h), lambda i=i: leer(i)) for i, h in enumerate(hashes)]
+        etapa['filas'] = sum(len(df) for df in ventas)
+        etapa.update(origenes)
+        etapa['desde_almacen'] = len(hashes) - sum(origenes.values())
+    return ventas
 
-📍 Los Olivos, Lima
-📱 Escríbenos para agendar tu cita
+def ejecutar_analisis(hashes, nombres, fecha_referencia, contenidos, instrumentacion):
+    """Ejecuta el análisis completo (compartido por hashes, nombres y fecha de referencia).
 
-¡{estilista} te está esperando! 💕"""
+    Las etapas internas solo se registran cuando no hay acierto en el almacén.
+    """
+    def analizar():
+        df = combinar_ventas(cargar_ventas(hashes, contenidos, instrumentacion), nombres)
+        with instrumentacion.etapa('analizar_retencion', filas=len(df)) as etapa:
+            clientes, df_procesado = analizar_retencion(df, hoy=fecha_referencia)
+            etapa['clientes'] = len(clientes)
+        with instrumentacion.etapa('metricas_estilista') as etapa:
+            metricas_estilistas = calcular_metricas_estilista(df_procesado, clientes)
+            etapa['filas'] = len(metricas_estilistas)
+        return clientes, df_procesado, metricas_estilistas
     
-    elif dias_sin_visita > 60:
-        mensaje = f"""Hola {nombre_corto}! 😊
+    return almacen.obtener(('analisis', hashes, nombres, fecha_referencia), analizar,
+                           st.session_state['referencias_almacen'], 'analisis')
 
-{estilista} te manda saludos desde BLUSH! ✨
+def ejecutar_analisis_historial(ruta, version, fecha_referencia):
+    """Análisis del historial (compartido por versión del historial y fecha)"""
+    def analizar():
+        with closing(abrir_historial(ruta)) as conexion:
+            return analizar_historial(conexion, hoy=fecha_referencia)
+    
+    return almacen.obtener(('historial', ruta, version, fecha_referencia), analizar,
+                           st.session_state['referencias_almacen'], 'analisis')
 
-Hace {dias_sin_visita} días que no te vemos y ya es hora de consentirte de nuevo 💅
+def vista_almacenada(nombre, clave, crear):
+    """Resultado derivado de un análisis, guardado en el almacén por la clave del análisis.
 
-¿Agendamos tu cita esta semana?
-🎁 Tenemos promociones especiales para ti
+    Cuenta en el presupuesto de memoria y la sesión lo mantiene mientras lo muestra.
+    """
+    return almacen.obtener((nombre, clave), crear, st.session_state['referencias_almacen'], nombre)
 
-¡Te esperamos! 💕"""
-    
-    elif dias_sin_visita > 30:
-        mensaje = f"""¡{nombre_corto}! 💖
+def ejecutar_cohortes(clave, visitas, estilistas):
+    """Matrices de cohortes, total y por estilista (compartidas por la clave de los datos).
 
-{estilista} te recuerda que ya pasaron {dias_sin_visita} días desde tu última visita a BLUSH 
+    ``visitas`` es una función que arma los pares (cliente, mes) solo si
+    no están en el almacén.
+    """
+    return vista_almacenada('cohortes', clave, lambda: matrices_cohortes(visitas(), estilistas))
 
-Es momento de volver a lucir espectacular! ✨
+def ejecutar_tendencias(clave, fecha_referencia, visitas):
+    """Indicadores al cierre de cada mes (compartidos por la clave de los datos y la fecha).
 
-¿Cuándo te viene bien para tu próxima cita?
+    ``visitas`` arma las visitas por día solo si no están en el almacén.
+    """
+    return vista_almacenada('tendencias', (clave, fecha_referencia),
+                            lambda: kpis_mensuales(visitas(), fecha_referencia))
 
-Nos vemos pronto! 😊"""
-    
-    else:
-        mensaje = f"""¡Hola {nombre_corto}! 
+def visitas_historial(fecha_referencia):
+    with closing(abrir_historial()) as conexion:
+        return visitas_mensuales_historial(conexion, corte_historial(conexion, fecha_referencia))
 
-Gracias por confiar en BLUSH y en {estilista} 💕
+def visitas_diarias_de_historial(fecha_referencia):
+    with closing(abrir_historial()) as conexion:
+        return visitas_diarias_historial(conexion, corte_historial(conexion, fecha_referencia))
 
-Queremos saber si quedaste satisfecha con tu último servicio y recordarte que estamos aquí para consentirte siempre que lo necesites ✨
+# DIAGNÓSTICO
+# Cada etapa deja una línea JSON en el log (logger retencion.etapas) y, si se
+# activa en la barra lateral, una tabla con tiempos, memoria y filas.
+logger_etapas = logging.getLogger('retencion.etapas')
+if not logger_etapas.handlers:
+    manejador = logging.StreamHandler()
+    manejador.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    logger_etapas.addHandler(manejador)
+    logger_etapas.setLevel(os.environ.get('BLUSH_LOG_NIVEL', 'INFO'))
+    logger_etapas.propagate = False
 
-¡Hasta pronto! 💇‍♀️"""
-    
-    return mensaje
+if 'id_sesion' not in st.session_state:
+    st.session_state['id_sesion'] = uuid4().hex[:8]
+    # Las descargas se generan fuera de la ejecución del script
+    st.session_state['etapas_descarga'] = Instrumentacion({'sesion': st.session_state['id_sesion']}, max_etapas=10)
+    # Lo que esta sesión usa del almacén compartido; se suelta al cerrarse la sesión
+    st.session_state['referencias_almacen'] = almacen.sesion()
+instrumentacion = Instrumentacion({'sesion': st.session_state['id_sesion']})
+etapas_descarga = st.session_state['etapas_descarga']
 
-def analizar_retencion(df):
-    """Analiza patrones de retención de clientes"""
-    
-    df['FECHA'] = pd.to_datetime(df['FECHA'], errors='coerce').ffill()
-    df['MES'] = df['FECHA'].dt.to_period('M')
-    df['EMPLEADO'] = df['EMPLEADO'].apply(agrupar_estilista)
-    
-    # Detectar productos vs servicios
-    df['ES_PRODUCTO'] = df.apply(
-        lambda row: es_producto(row['PRODUCTO / SERVICIO'], row.get('CLASE', None)),
-        axis=1
-    )
-    
-    hoy = datetime.now()
-    
-    # Análisis por cliente
-    clientes = df.groupby('CLIENTE').agg({
-        'FECHA': ['min', 'max', 'count'],
-        'TOTAL': 'sum',
-        'EMPLEADO': lambda x: x.mode()[0] if len(x.mode()) > 0 else x.iloc[0],
-        'TELEF': 'first'
-    }).reset_index()
-    
-    clientes.columns = ['CLIENTE', 'PRIMERA_VISITA', 'ULTIMA_VISITA', 'NUM_VISITAS', 'GASTO_TOTAL', 'ESTILISTA', 'TELEFONO']
-    
-    clientes['DIAS_SIN_VISITA'] = (hoy - pd.to_datetime(clientes['ULTIMA_VISITA'])).dt.days
-    clientes['GASTO_PROMEDIO'] = clientes['GASTO_TOTAL'] / clientes['NUM_VISITAS']
-    
-    # Segmentación
-    def segmentar_cliente(row):
-        if row['NUM_VISITAS'] == 1:
-            if row['DIAS_SIN_VISITA'] > 60:
-                return 'Perdido'
-            else:
-                return 'Nuevo'
-        elif row['NUM_VISITAS'] <= 3:
-            if row['DIAS_SIN_VISITA'] > 90:
-                return 'En Riesgo'
-            else:
-                return 'Ocasional'
-        elif row['NUM_VISITAS'] <= 9:
-            if row['DIAS_SIN_VISITA'] > 60:
-                return 'En Riesgo'
-            else:
-                return 'Regular'
-        else:
-            return 'VIP'
-    
-    clientes['SEGMENTO'] = clientes.apply(segmentar_cliente, axis=1)
-    
-    # Generar mensajes
-    clientes['MENSAJE_WHATSAPP'] = clientes.apply(
-        lambda row: generar_mensaje_whatsapp(
-            row['CLIENTE'], 
-            row['ESTILISTA'], 
-            row['DIAS_SIN_VISITA'],
-            row['NUM_VISITAS']
-        ),
-        axis=1
-    )
-    
-    return clientes, df
+def descarga_medida(etapa, crear, clientes_filtrados):
+    """Callable para st.download_button que registra la generación del archivo"""
+    def generar():
+        with etapas_descarga.etapa(etapa, filas=len(clientes_filtrados)):
+            return crear(clientes_filtrados)
+    return generar
 
-def calcular_metricas_estilista(df, clientes):
-    """Calcula métricas detalladas por estilista"""
-    
-    metricas = []
-    
-    # Orden de visualización
-    orden_estilistas = ['Julio Luna', 'Jhon', 'Yuri', 'Susy', 'Vero', 'Otros']
-    
-    for emp in orden_estilistas:
-        df_emp = df[df['EMPLEADO'] == emp]
-        clientes_emp = clientes[clientes['ESTILISTA'] == emp]
-        
-        if len(df_emp) == 0:
-            continue
-        
-        # Métricas de clientes
-        total_clientes = len(clientes_emp)
-        retencion = (clientes_emp['NUM_VISITAS'] > 1).sum() / total_clientes * 100 if total_clientes > 0 else 0
-        activos = (clientes_emp['DIAS_SIN_VISITA'] <= 60).sum()
-        en_riesgo = (clientes_emp['SEGMENTO'] == 'En Riesgo').sum()
-        
-        # Métricas de servicios
-        servicios = df_emp[~df_emp['ES_PRODUCTO']]
-        productos = df_emp[df_emp['ES_PRODUCTO']]
-        
-        metricas.append({
-            'ESTILISTA': emp,
-            'TOTAL_CLIENTES': total_clientes,
-            'CLIENTES_ACTIVOS': activos,
-            'TASA_RETENCION': retencion,
-            'CLIENTES_EN_RIESGO': en_riesgo,
-            'VISITAS_PROMEDIO': clientes_emp['NUM_VISITAS'].mean() if total_clientes > 0 else 0,
-            'GASTO_PROMEDIO': clientes_emp['GASTO_PROMEDIO'].mean() if total_clientes > 0 else 0,
-            'TOTAL_SERVICIOS': len(servicios),
-            'TOTAL_PRODUCTOS': len(productos),
-            'INGRESO_SERVICIOS': servicios['TOTAL'].sum(),
-            'INGRESO_PRODUCTOS': productos['TOTAL'].sum(),
-            'TICKET_PROMEDIO': df_emp['TOTAL'].mean()
-        })
-    
-    return pd.DataFrame(metricas)
+# VISTAS DE LAS PESTAÑAS
+# Solo se ejecuta la pestaña abierta; lo que cada una calcula se guarda en el
+# almacén compartido por análisis (clave de los datos y fecha de referencia),
+# así que entra en el mismo presupuesto de memoria. Se tratan como de solo
+# lectura.
+FILAS_POR_PAGINA = 25
 
-def crear_excel_whatsapp(clientes_filtrados):
-    """Crea Excel con lista de WhatsApp"""
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Lista WhatsApp"
-    
-    # Estilos
-    header_fill = PatternFill(start_color="E91E63", end_color="E91E63", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-    
-    # Título
-    ws.merge_cells('A1:F1')
-    ws['A1'] = f'LISTA WHATSAPP - BLUSH SALON - {datetime.now().strftime("%d/%m/%Y")}'
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A1'].alignment = Alignment(horizontal='center')
-    
-    # Headers
-    headers = ['CLIENTE', 'TELEFONO', 'ESTILISTA', 'DIAS SIN VISITA', 'SEGMENTO', 'MENSAJE']
-    
-    for col, h in enumerate(headers, 1):
-        c = ws.cell(3, col)
-        c.value = h
-        c.fill = header_fill
-        c.font = header_font
-        c.alignment = Alignment(horizontal='center', wrap_text=True)
-        c.border = border
-    
-    # Datos
-    fila = 4
-    for _, row in clientes_filtrados.iterrows():
-        ws.cell(fila, 1, row['CLIENTE'])
-        ws.cell(fila, 2, str(row['TELEFONO']))
-        ws.cell(fila, 3, row['ESTILISTA'])
-        ws.cell(fila, 4, row['DIAS_SIN_VISITA'])
-        ws.cell(fila, 5, row['SEGMENTO'])
-        ws.cell(fila, 6, row['MENSAJE_WHATSAPP'])
-        
-        for col in range(1, 7):
-            c = ws.cell(fila, col)
-            c.border = border
-            if col == 6:
-                c.alignment = Alignment(wrap_text=True, vertical='top')
-        
-        fila += 1
-    
-    # Anchos
-    ws.column_dimensions['A'].width = 35
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 15
-    ws.column_dimensions['F'].width = 80
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
+def indice_clientes(clave, clientes):
+    """Índice de filtrado de la tabla de clientes (compartido entre sesiones, solo lectura)"""
+    return vista_almacenada('indice', clave, lambda: IndiceClientes(clientes))
+
+def ranking_clientes(clave, clientes):
+    """Todos los clientes de más a menos visitas (solo lectura)"""
+    return vista_almacenada('ranking', clave, lambda: ranking_visitas(clientes)[COLUMNAS_RANKING])
+
+def vista_estilistas(clave, clientes):
+    return vista_almacenada('estilistas', clave, lambda: top_clientes_por_estilista(clientes, NOMBRES_EQUIPO))
+
+def vista_segmentacion(clave, clientes):
+    return vista_almacenada('segmentacion', clave, lambda: (
+        distribucion_segmentos(clientes), segmentos_por_estilista(clientes, NOMBRES_EQUIPO)
+    ))
+
+def vista_estadisticas(clave, clientes):
+    return vista_almacenada('estadisticas', clave, lambda: estadisticas_generales(clientes))
+
+def tabla_paginada(tabla, clave, formato=None, filas_por_pagina=FILAS_POR_PAGINA):
+    """Muestra una página de la tabla; el costo no crece con el total de filas"""
+    paginas = max(1, -(-len(tabla) // filas_por_pagina))
+    pagina = 1
+    if paginas > 1:
+        # La clave incluye el total de páginas: si cambia el filtro, se vuelve a la primera
+        pagina = st.number_input(f'Página (de {paginas})', min_value=1, max_value=paginas, value=1,
+                                 key=f'{clave}_{paginas}')
+    inicio = (pagina - 1) * filas_por_pagina
+    vista = tabla.iloc[inicio:inicio + filas_por_pagina]
+    st.dataframe(vista.style.format(formato) if formato else vista, use_container_width=True)
+    if paginas > 1:
+        st.caption(f'Filas {inicio + 1}-{inicio + len(vista)} de {len(tabla)}')
+
+# ENVÍO AUTOMÁTICO
+# Se activa al configurar la URL del proveedor (p. ej. la API de WhatsApp
+# Cloud); la campaña corre en un hilo aparte y el tablero solo muestra el avance.
+URL_WHATSAPP = os.environ.get('BLUSH_WHATSAPP_URL')
+TOKEN_WHATSAPP = os.environ.get('BLUSH_WHATSAPP_TOKEN')
+
+@st.fragment(run_every=2)
+def avance_envio():
+    estado = st.session_state.get('envio_whatsapp')
+    if estado is None:
+        return
+    resumen = estado['resumen']
+    hechos = resumen['enviados'] + resumen['fallidos'] + resumen['ya_enviados']
+    st.progress(min(hechos / max(estado['total'], 1), 1.0),
+                text=f"{estado['campana']}: {resumen['enviados']} enviados, {resumen['fallidos']} fallidos, "
+                     f"{resumen['ya_enviados']} ya contactados de {estado['total']}")
+    if estado.get('error'):
+        st.error(f"❌ El envío se detuvo: {estado['error']}")
+    elif estado['terminado'] and resumen['pendientes']:
+        st.info(f"⏸️ {resumen['pendientes']} quedaron pendientes porque se cerró el horario de envío; "
+                "vuelve a enviar la campaña para completarla")
+
+def envio_automatico(clientes_filtrados):
+    """Envío de la lista por la API de WhatsApp (si hay proveedor configurado)"""
+    with st.expander("🚀 Envío automático"):
+        if not URL_WHATSAPP:
+            st.caption("Configura BLUSH_WHATSAPP_URL (y BLUSH_WHATSAPP_TOKEN) para enviar los mensajes "
+                       "automáticamente desde aquí.")
+            return
+        
+        campana = st.text_input('Campaña', value=datetime.now().strftime('%Y-%m'),
+                                help="Al repetir una campaña no se vuelve a escribir a quienes ya recibieron el mensaje")
+        respetar_horario = st.checkbox('Solo en horario recomendado (martes a jueves, 10-12 y 15-17)', value=True)
+        ventana = VentanaEnvio() if respetar_horario else None
+        if ventana is not None and not ventana.permite():
+            st.info(f"Fuera de horario: el envío empieza a las {ventana.proxima_apertura():%d/%m %H:%M}")
+        
+        en_curso = st.session_state.get('envio_whatsapp')
+        ocupado = en_curso is not None and not en_curso['terminado']
+        if st.button(f"Enviar a {len(clientes_filtrados)} clientes", disabled=ocupado or (ventana is not None and not ventana.permite())):
+            _, st.session_state['envio_whatsapp'] = enviar_en_segundo_plano(
+                clientes_filtrados, ProveedorHTTP(URL_WHATSAPP, TOKEN_WHATSAPP), campana, ventana=ventana
+            )
+        avance_envio()
+
+@st.fragment
+def pestana_whatsapp(indice):
+    """Pestaña de WhatsApp; al cambiar un filtro solo se vuelve a ejecutar esta parte"""
+    with instrumentacion.etapa('pestana_whatsapp') as etapa:
+        st.markdown("### 📱 Mensajes Personalizados para WhatsApp")
+        
+        st.info("💡 Filtra los clientes que quieres contactar y descarga la lista con mensajes personalizados")
+        
+        # Filtros
+        hay_riesgo = indice.clientes['RIESGO_CHURN'].notna().any()
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            segmento_filtro = st.multiselect(
+                'Segmento',
+                options=[s for s in SEGMENTOS if s in indice.clientes['SEGMENTO'].unique()],
+                default=['En Riesgo', 'Perdido']
+            )
+        
+        with col2:
+            estilistas_disponibles = [e for e in ORDEN_ESTILISTAS if e in indice.clientes['ESTILISTA'].unique()]
+        
+            estilista_filtro = st.multiselect(
+                'Estilista',
+                options=estilistas_disponibles,
+                default=estilistas_disponibles
+            )
+        
+        with col3:
+            dias_min = st.number_input('Días mínimos sin visita', min_value=0, value=30)
+        
+        with col4:
+            riesgo_min = st.slider(
+                'Riesgo de abandono mínimo (%)', min_value=0, max_value=100, value=0, step=5,
+                disabled=not hay_riesgo,
+                help="Probabilidad de que el cliente no vuelva en los próximos 90 días, según un modelo "
+                     "entrenado con el historial del salón (hace falta más de 3 meses de ventas)"
+            )
+            orden = st.radio('Ordenar por', ['Días sin visita', 'Riesgo de abandono'], horizontal=True,
+                             disabled=not hay_riesgo)
+        
+        # Filtrar: búsqueda en el índice, sin recorrer toda la tabla
+        clientes_filtrados = indice.filtrar(
+            segmento_filtro, estilista_filtro, dias_min, riesgo_min / 100 if hay_riesgo and riesgo_min else None
+        )
+        if hay_riesgo and orden == 'Riesgo de abandono':
+            clientes_filtrados = clientes_filtrados.sort_values('RIESGO_CHURN', ascending=False, kind='stable')
+        etapa['filas'] = len(clientes_filtrados)
+        
+        st.markdown(f"#### 📋 Clientes a contactar: **{len(clientes_filtrados)}**")
+        
+        if len(clientes_filtrados) > 0:
+            # Mostrar preview (solo se generan los mensajes visibles)
+            preview = clientes_filtrados.head(5)
+            mensajes_preview = generar_mensajes_whatsapp(preview)
+            for idx, row in preview.iterrows():
+                with st.expander(f"📱 {row['CLIENTE']} - {row['ESTILISTA']}"):
+                    col1, col2 = st.columns([1, 3])
+        
+                    with col1:
+                        st.markdown(f"""
+                        **Teléfono:** {row['TELEFONO']}  
+                        **Días sin visita:** {row['DIAS_SIN_VISITA']}  
+                        **Visitas totales:** {row['NUM_VISITAS']}  
+                        **Segmento:** {row['SEGMENTO']}
+                        """)
+                        if pd.notna(row['CADENCIA_DIAS']):
+                            st.markdown(f"**Ritmo:** cada {row['CADENCIA_DIAS']:.0f} días  \n"
+                                        f"**Próxima visita esperada:** {row['PROXIMA_VISITA']:%d/%m/%Y}")
+                        if pd.notna(row['RIESGO_CHURN']):
+                            st.markdown(f"**Riesgo de abandono:** {row['RIESGO_CHURN']:.0%}")
+        
+                    with col2:
+                        st.markdown("**Mensaje sugerido:**")
+                        st.text_area("", value=mensajes_preview[idx], height=200, key=f"msg_{idx}")
+                        st.markdown(f"[📱 Abrir WhatsApp](https://wa.me/51{row['TELEFONO']})")
+        
+            if len(clientes_filtrados) > 5:
+                st.markdown("#### 📋 Lista completa")
+                tabla_paginada(
+                    clientes_filtrados[['CLIENTE', 'TELEFONO', 'ESTILISTA', 'SEGMENTO', 'DIAS_SIN_VISITA',
+                                        'NUM_VISITAS', 'RIESGO_CHURN']],
+                    'pagina_whatsapp', formato={'RIESGO_CHURN': '{:.0%}'}
+                )
+        
+            # Botón descarga (el archivo se genera solo al hacer clic)
+            st.markdown("---")
+        
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col2:
+                st.download_button(
+                    label=f"📥 DESCARGAR LISTA COMPLETA ({len(clientes_filtrados)} clientes)",
+                    data=descarga_medida(
+                        'exportar_excel', lambda c: crear_excel_whatsapp(c, fecha_referencia), clientes_filtrados
+                    ),
+                    file_name=f"WhatsApp_BLUSH_{fecha_referencia.strftime('%d%m%Y')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+                st.download_button(
+                    label="📄 Descargar como CSV (listas muy grandes)",
+                    data=descarga_medida('exportar_csv', crear_csv_whatsapp, clientes_filtrados),
+                    file_name=f"WhatsApp_BLUSH_{fecha_referencia.strftime('%d%m%Y')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+            
+            envio_automatico(clientes_filtrados)
+        else:
+            st.warning("No hay clientes que cumplan con los filtros seleccionados")
 
 # HEADER
 st.markdown('<div class="main-header">💇‍♀️ BLUSH - Sistema de Retención de Clientes</div>', unsafe_allow_html=True)
@@ -340,20 +424,16 @@ with st.sidebar:
     
     st.markdown("---")
     st.markdown("### 👥 Nuestro Equipo")
-    st.markdown("""
-    **⭐ Estilista Principal:**
-    - Julio Luna (2-4 veces/mes)
-    
-    **💼 Estilistas Diarios:**
-    - Jhon
-    - Yuri
-    
-    **🌱 En Desarrollo:**
-    - Susy
-    
-    **📋 Administración:**
-    - Vero
-    """)
+    grupos_equipo = {}
+    for estilista in EQUIPO:
+        nombre = estilista['nombre']
+        if estilista.get('nota'):
+            nombre += f" ({estilista['nota']})"
+        grupos_equipo.setdefault((estilista['emoji'], estilista['grupo']), []).append(nombre)
+    st.markdown("\n\n".join(
+        f"**{emoji} {grupo}:**\n" + "\n".join(f"- {n}" for n in nombres)
+        for (emoji, grupo), nombres in grupos_equipo.items()
+    ))
     
     st.markdown("---")
     st.markdown("### 📊 Segmentos de Clientes")
@@ -361,13 +441,13 @@ with st.sidebar:
     **🌟 VIP** - 10 o más visitas  
     Cliente muy fiel. Prioridad máxima.
     
-    **💚 Regular** - 4 a 9 visitas, visitó <60 días  
+    **💚 Regular** - 4 a 9 visitas, al día con su ritmo  
     Cliente frecuente. Mantenerlo satisfecho.
     
     **💛 Ocasional** - 2 a 3 visitas  
     Viene de vez en cuando. Incentivar más visitas.
     
-    **⚠️ En Riesgo** - 2+ visitas, pero >60 días sin venir  
+    **⚠️ En Riesgo** - 2+ visitas, pero ya pasó 1,5 veces su ritmo sin venir  
     Puede abandonar. ¡Contactar urgente!
     
     **🆕 Nuevo** - 1 visita hace menos de 60 días  
@@ -375,6 +455,9 @@ with st.sidebar:
     
     **❌ Perdido** - 1 visita hace más de 60 días  
     No regresó. Intentar reactivación.
+    
+    *Una visita es un día con compras (varios servicios el mismo día cuentan como una) y
+    el ritmo es la mediana de días entre sus visitas.*
     """)
     
     st.markdown("---")
@@ -397,23 +480,92 @@ with st.sidebar:
     Tiempo desde su última cita.  
     Ideal: menos de 45 días.
     """)
+    
+    st.markdown("---")
+    mostrar_diagnostico = st.checkbox(
+        "🩺 Diagnóstico de rendimiento",
+        help="Muestra el tiempo, la memoria y las filas de cada etapa de esta ejecución"
+    )
 
 # UPLOAD
-uploaded_file = st.file_uploader(
-    "📤 Sube tu archivo histórico de ventas",
+uploaded_files = st.file_uploader(
+    "📤 Sube tus archivos históricos de ventas",
     type=['xlsx', 'xls'],
-    help="El archivo debe tener el formato del sistema de registro de ventas"
+    accept_multiple_files=True,
+    help="Uno o varios archivos con el formato del sistema de registro de ventas "
+         "(por ejemplo, varias sucursales o años anteriores); se analizan juntos"
+)
+
+usar_historial = st.checkbox(
+    "💾 Acumular en el historial local",
+    help="Guarda las ventas en un historial en este equipo. Al subir la exportación de un nuevo mes "
+         "solo se agregan las ventas que no estaban registradas y el análisis usa todo el historial."
+)
+
+fecha_referencia = st.date_input(
+    "📅 Fecha de referencia", value=datetime.now().date(), max_value=datetime.now().date(), format="DD/MM/YYYY",
+    help="El análisis usa solo las ventas hasta este día. Elige una fecha pasada para ver los indicadores "
+         "y la lista de WhatsApp tal como eran entonces (por ejemplo, al cierre del mes anterior)."
 )
 
-if uploaded_file:
+hay_historial = False
+if usar_historial and RUTA_HISTORIAL.exists():
+    with closing(abrir_historial()) as conexion:
+        hay_historial = version_historial(conexion)[0] > 0
+
+if uploaded_files or hay_historial:
     try:
         with st.spinner('⏳ Analizando datos...'):
-            df = pd.read_excel(uploaded_file, sheet_name='Hoja1', skiprows=9)
-            df = df[df['EMPLEADO'].notna()].copy()
-            clientes, df_procesado = analizar_retencion(df)
-            metricas_estilistas = calcular_metricas_estilista(df_procesado, clientes)
+            with instrumentacion.etapa('carga_archivos', archivos=len(uploaded_files)) as etapa:
+                contenidos = [f.getvalue() for f in uploaded_files]
+                hashes = tuple(hash_contenido(c) for c in contenidos)
+                nombres = tuple(f.name for f in uploaded_files)
+                etapa['bytes'] = sum(len(c) for c in contenidos)
+            
+            if usar_historial:
+                with instrumentacion.etapa('ingreso_historial') as etapa, closing(abrir_historial()) as conexion:
+                    lineas_archivo = lineas_nuevas = lineas_sin_fecha = 0
+                    if uploaded_files:
+                        for h, nombre, df in zip(hashes, nombres, cargar_ventas(hashes, contenidos, instrumentacion)):
+                            lineas, nuevas, sin_fecha = ingresar_historial(conexion, h, nombre, df)
+                            lineas_archivo += lineas
+                            lineas_nuevas += nuevas
+                            lineas_sin_fecha += sin_fecha
+                    version = version_historial(conexion)
+                    etapa['filas'] = lineas_nuevas
+                with instrumentacion.etapa('analisis_historial') as etapa:
+                    clientes, metricas_estilistas = ejecutar_analisis_historial(
+                        str(RUTA_HISTORIAL), version, fecha_referencia
+                    )
+                    etapa['filas'] = len(clientes)
+                clave_datos = (str(RUTA_HISTORIAL), version)
+                obtener_visitas = lambda: visitas_historial(fecha_referencia)
+                obtener_visitas_diarias = lambda: visitas_diarias_de_historial(fecha_referencia)
+            else:
+                with instrumentacion.etapa('analisis') as etapa:
+                    registradas = len(instrumentacion.etapas)
+                    clientes, df_procesado, metricas_estilistas = ejecutar_analisis(
+                        hashes, nombres, fecha_referencia, contenidos, instrumentacion
+                    )
+                    etapa['filas'] = len(clientes)
+                    etapa['cache'] = len(instrumentacion.etapas) == registradas
+                clave_datos = (hashes, nombres)
+                obtener_visitas = lambda: meses_con_visita(df_procesado['CLIENTE_ID'], df_procesado['FECHA'])
+                obtener_visitas_diarias = lambda: visitas_diarias(
+                    df_procesado['CLIENTE_ID'], df_procesado['FECHA'], df_procesado['TOTAL'], df_procesado['ES_PRODUCTO']
+                )
+        
+            clave_vistas = (clave_datos, fecha_referencia)
         
         st.success('✅ Análisis completado!')
+        if fecha_referencia < datetime.now().date():
+            st.info(f"📅 Mostrando los datos al {fecha_referencia:%d/%m/%Y}: las ventas posteriores no se consideran")
+        if usar_historial and uploaded_files:
+            st.info(f"💾 Historial: {lineas_nuevas} ventas nuevas agregadas "
+                    f"({lineas_archivo - lineas_nuevas - lineas_sin_fecha} ya estaban registradas)")
+            if lineas_sin_fecha:
+                st.warning(f"⚠️ Se omitieron {lineas_sin_fecha} líneas sin fecha al comienzo de los archivos "
+                           f"(la cola de una visita de la exportación anterior)")
         
         # KPIs PRINCIPALES
         col1, col2, col3, col4 = st.columns(4)
@@ -431,7 +583,7 @@ if uploaded_file:
                      help="Porcentaje de clientes que regresaron (tienen 2 o más visitas). Fórmula: (Clientes con 2+ visitas ÷ Total clientes) × 100")
         with col3:
             st.metric("⚠️ En Riesgo", f"{clientes_riesgo}",
-                     help="Clientes con historial (2+ visitas) que NO han visitado en los últimos 60 días. ¡Contáctalos urgente!")
+                     help="Clientes con historial (2+ visitas) que llevan más de 1,5 veces su ritmo habitual sin venir (entre 21 y 180 días). ¡Contáctalos urgente!")
         with col4:
             st.metric("✅ Activos", f"{clientes_activos}",
                      help="Clientes que visitaron en los últimos 60 días. Son tu base actual de ingresos")
@@ -439,229 +591,187 @@ if uploaded_file:
         st.markdown("---")
         
         # TABS
-        tab1, tab2, tab3, tab4 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
             "📊 Análisis por Estilista", 
             "👥 Segmentación", 
             "📱 Mensajes WhatsApp",
-            "📈 Estadísticas Generales"
-        ])
+            "📈 Estadísticas Generales",
+            "📅 Cohortes"
+        ], key='pestana_activa', on_change='rerun')
         
-        with tab1:
-            st.markdown("### 📊 Desempeño Completo por Estilista")
-            
-            st.info("💡 **Cómo leer la tabla:** La Tasa de Retención muestra qué % de clientes de cada estilista regresó (2+ visitas). Promedio de la industria: 15-30%. Verde = Mejor desempeño.")
-            
-            # Tabla completa con métricas
-            display_metricas = metricas_estilistas[[
-                'ESTILISTA', 'TOTAL_CLIENTES', 'CLIENTES_ACTIVOS', 'TASA_RETENCION',
-                'TOTAL_SERVICIOS', 'TOTAL_PRODUCTOS', 'INGRESO_SERVICIOS', 'INGRESO_PRODUCTOS'
-            ]].copy()
-            
-            display_metricas['INGRESO_TOTAL'] = display_metricas['INGRESO_SERVICIOS'] + display_metricas['INGRESO_PRODUCTOS']
-            
-            st.dataframe(
-                display_metricas.style.format({
-                    'TASA_RETENCION': '{:.1f}%',
-                    'INGRESO_SERVICIOS': 'S/ {:.0f}',
-                    'INGRESO_PRODUCTOS': 'S/ {:.0f}',
-                    'INGRESO_TOTAL': 'S/ {:.0f}'
-                }).background_gradient(cmap='RdYlGn', subset=['TASA_RETENCION']),
-                use_container_width=True,
-                height=300
-            )
-            
-            st.markdown("---")
-            
-            # Análisis detallado por estilista principal
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("#### 👥 Detalle de Clientes por Estilista")
+        if tab1.open:
+            with tab1, instrumentacion.etapa('pestana_estilistas'):
+                st.markdown("### 📊 Desempeño Completo por Estilista")
                 
-                for _, row in metricas_estilistas.iterrows():
-                    emoji = "⭐" if row['ESTILISTA'] == 'Julio Luna' else "💼" if row['ESTILISTA'] in ['Jhon', 'Yuri'] else "🌱" if row['ESTILISTA'] == 'Susy' else "📋" if row['ESTILISTA'] == 'Vero' else "👤"
-                    
-                    color = "vip-card" if row['TASA_RETENCION'] >= 25 else "success-card" if row['TASA_RETENCION'] >= 15 else "warning-card"
+                st.info("💡 **Cómo leer la tabla:** La Tasa de Retención muestra qué % de clientes de cada estilista regresó (2+ visitas). Promedio de la industria: 15-30%. Verde = Mejor desempeño.")
+                
+                # Tabla completa con métricas
+                display_metricas = metricas_estilistas[[
+                    'ESTILISTA', 'TOTAL_CLIENTES', 'CLIENTES_ACTIVOS', 'TASA_RETENCION',
+                    'TOTAL_SERVICIOS', 'TOTAL_PRODUCTOS', 'INGRESO_SERVICIOS', 'INGRESO_PRODUCTOS'
+                ]].copy()
+                
+                display_metricas['INGRESO_TOTAL'] = display_metricas['INGRESO_SERVICIOS'] + display_metricas['INGRESO_PRODUCTOS']
+                
+                st.dataframe(
+                    display_metricas.style.format({
+                        'TASA_RETENCION': '{:.1f}%',
+                        'INGRESO_SERVICIOS': 'S/ {:.0f}',
+                        'INGRESO_PRODUCTOS': 'S/ {:.0f}',
+                        'INGRESO_TOTAL': 'S/ {:.0f}'
+                    }).background_gradient(cmap='RdYlGn', subset=['TASA_RETENCION']),
+                    use_container_width=True,
+                    height=300
+                )
+                
+                st.markdown("---")
+                
+                # Análisis detallado por estilista principal
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.markdown("#### 👥 Detalle de Clientes por Estilista")
                     
-                    st.markdown(f"""
-                    <div class='{color}'>
-                        <h4>{emoji} {row['ESTILISTA']}</h4>
-                        <strong>Clientes:</strong> {row['TOTAL_CLIENTES']} total | {row['CLIENTES_ACTIVOS']} activos<br>
-                        <strong>Retención:</strong> {row['TASA_RETENCION']:.1f}% | Visitas/cliente: {row['VISITAS_PROMEDIO']:.1f}<br>
-                        <strong>En riesgo:</strong> {row['CLIENTES_EN_RIESGO']} clientes
-                    </div>
-                    """, unsafe_allow_html=True)
-                    st.markdown("")
-            
-            with col2:
-                st.markdown("#### 💰 Servicios y Productos")
+                    for _, row in metricas_estilistas.iterrows():
+                        emoji = EMOJIS_ESTILISTA.get(row['ESTILISTA'], "👤")
+                        
+                        color = "vip-card" if row['TASA_RETENCION'] >= 25 else "success-card" if row['TASA_RETENCION'] >= 15 else "warning-card"
+                        
+                        st.markdown(f"""
+                        <div class='{color}'>
+                            <h4>{emoji} {row['ESTILISTA']}</h4>
+                            <strong>Clientes:</strong> {row['TOTAL_CLIENTES']} total | {row['CLIENTES_ACTIVOS']} activos<br>
+                            <strong>Retención:</strong> {row['TASA_RETENCION']:.1f}% | Visitas/cliente: {row['VISITAS_PROMEDIO']:.1f}<br>
+                            <strong>En riesgo:</strong> {row['CLIENTES_EN_RIESGO']} clientes
+                        </div>
+                        """, unsafe_allow_html=True)
+                        st.markdown("")
                 
-                for _, row in metricas_estilistas.iterrows():
-                    emoji = "⭐" if row['ESTILISTA'] == 'Julio Luna' else "💼" if row['ESTILISTA'] in ['Jhon', 'Yuri'] else "🌱" if row['ESTILISTA'] == 'Susy' else "📋" if row['ESTILISTA'] == 'Vero' else "👤"
+                with col2:
+                    st.markdown("#### 💰 Servicios y Productos")
                     
-                    st.markdown(f"""
-                    <div class='metric-card'>
-                        <h4>{emoji} {row['ESTILISTA']}</h4>
-                        <strong>Servicios:</strong> {row['TOTAL_SERVICIOS']} (S/ {row['INGRESO_SERVICIOS']:.0f})<br>
-                        <strong>Productos:</strong> {row['TOTAL_PRODUCTOS']} (S/ {row['INGRESO_PRODUCTOS']:.0f})<br>
-                        <strong>Ticket promedio:</strong> S/ {row['TICKET_PROMEDIO']:.2f}
-                    </div>
-                    """, unsafe_allow_html=True)
-                    st.markdown("")
-            
-            st.markdown("---")
-            
-            # Top clientes por estilista
-            st.markdown("### 🏆 Top 5 Clientes por Estilista")
-            
-            for estilista in ['Julio Luna', 'Jhon', 'Yuri', 'Susy', 'Vero']:
-                if estilista in clientes['ESTILISTA'].values:
+                    for _, row in metricas_estilistas.iterrows():
+                        emoji = EMOJIS_ESTILISTA.get(row['ESTILISTA'], "👤")
+                        
+                        st.markdown(f"""
+                        <div class='metric-card'>
+                            <h4>{emoji} {row['ESTILISTA']}</h4>
+                            <strong>Servicios:</strong> {row['TOTAL_SERVICIOS']} (S/ {row['INGRESO_SERVICIOS']:.0f})<br>
+                            <strong>Productos:</strong> {row['TOTAL_PRODUCTOS']} (S/ {row['INGRESO_PRODUCTOS']:.0f})<br>
+                            <strong>Ticket promedio:</strong> S/ {row['TICKET_PROMEDIO']:.2f}
+                        </div>
+                        """, unsafe_allow_html=True)
+                        st.markdown("")
+                
+                st.markdown("---")
+                
+                # Top clientes por estilista
+                st.markdown("### 🏆 Top 5 Clientes por Estilista")
+                
+                for estilista, top_clientes in vista_estilistas(clave_vistas, clientes).items():
                     with st.expander(f"👤 {estilista} - Top 5 Clientes"):
-                        top_clientes = clientes[clientes['ESTILISTA'] == estilista].nlargest(5, 'NUM_VISITAS')[[
-                            'CLIENTE', 'NUM_VISITAS', 'GASTO_TOTAL', 'DIAS_SIN_VISITA', 'SEGMENTO'
-                        ]]
                         st.dataframe(
                             top_clientes.style.format({'GASTO_TOTAL': 'S/ {:.2f}'}),
                             use_container_width=True
                         )
         
-        with tab2:
-            st.markdown("### 👥 Segmentación de Clientes")
-            
-            st.info("💡 Los segmentos clasifican a tus clientes según su comportamiento de visitas. Cada color representa una acción diferente que debes tomar.")
-            
-            # Distribución por segmento
-            segmentos = clientes['SEGMENTO'].value_counts()
-            
-            col1, col2 = st.columns([1, 2])
-            
-            with col1:
-                st.markdown("#### Distribución General")
-                for seg, count in segmentos.items():
-                    pct = count / len(clientes) * 100
-                    st.metric(seg, f"{count} ({pct:.1f}%)")
-            
-            with col2:
-                st.markdown("#### Por Estilista Principal")
+        if tab2.open:
+            with tab2, instrumentacion.etapa('pestana_segmentacion'):
+                st.markdown("### 👥 Segmentación de Clientes")
+                
+                st.info("💡 Los segmentos clasifican a tus clientes según su comportamiento de visitas. Cada color representa una acción diferente que debes tomar.")
+                
+                # Distribución por segmento
+                segmentos, seg_estilista = vista_segmentacion(clave_vistas, clientes)
+                
+                col1, col2 = st.columns([1, 2])
                 
-                # Filtrar solo estilistas principales
-                estilistas_principales = ['Julio Luna', 'Jhon', 'Yuri', 'Susy', 'Vero']
-                clientes_principales = clientes[clientes['ESTILISTA'].isin(estilistas_principales)]
+                with col1:
+                    st.markdown("#### Distribución General")
+                    for seg, count in segmentos.items():
+                        pct = count / len(clientes) * 100
+                        st.metric(seg, f"{count} ({pct:.1f}%)")
                 
-                seg_estilista = pd.crosstab(clientes_principales['ESTILISTA'], clientes_principales['SEGMENTO'])
-                st.dataframe(seg_estilista, use_container_width=True, height=250)
+                with col2:
+                    st.markdown("#### Por Estilista Principal")
+                    st.dataframe(seg_estilista, use_container_width=True, height=250)
         
-        with tab3:
-            st.markdown("### 📱 Mensajes Personalizados para WhatsApp")
-            
-            st.info("💡 Filtra los clientes que quieres contactar y descarga la lista con mensajes personalizados")
-            
-            # Filtros
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                segmento_filtro = st.multiselect(
-                    'Segmento',
-                    options=clientes['SEGMENTO'].unique(),
-                    default=['En Riesgo', 'Perdido']
-                )
-            
-            with col2:
-                estilistas_disponibles = ['Julio Luna', 'Jhon', 'Yuri', 'Susy', 'Vero', 'Otros']
-                estilistas_disponibles = [e for e in estilistas_disponibles if e in clientes['ESTILISTA'].unique()]
+        if tab3.open:
+            with tab3:
+                pestana_whatsapp(indice_clientes(clave_vistas, clientes))
+        
+        if tab4.open:
+            with tab4, instrumentacion.etapa('pestana_estadisticas'):
+                st.markdown("### 📈 Estadísticas Generales")
                 
-                estilista_filtro = st.multiselect(
-                    'Estilista',
-                    options=estilistas_disponibles,
-                    default=estilistas_disponibles
-                )
-            
-            with col3:
-                dias_min = st.number_input('Días mínimos sin visita', min_value=0, value=30)
-            
-            # Filtrar
-            clientes_filtrados = clientes[
-                (clientes['SEGMENTO'].isin(segmento_filtro)) &
-                (clientes['ESTILISTA'].isin(estilista_filtro)) &
-                (clientes['DIAS_SIN_VISITA'] >= dias_min)
-            ].sort_values('DIAS_SIN_VISITA', ascending=False)
-            
-            st.markdown(f"#### 📋 Clientes a contactar: **{len(clientes_filtrados)}**")
-            
-            if len(clientes_filtrados) > 0:
-                # Mostrar preview
-                for idx, row in clientes_filtrados.head(5).iterrows():
-                    with st.expander(f"📱 {row['CLIENTE']} - {row['ESTILISTA']}"):
-                        col1, col2 = st.columns([1, 3])
-                        
-                        with col1:
-                            st.markdown(f"""
-                            **Teléfono:** {row['TELEFONO']}  
-                            **Días sin visita:** {row['DIAS_SIN_VISITA']}  
-                            **Visitas totales:** {row['NUM_VISITAS']}  
-                            **Segmento:** {row['SEGMENTO']}
-                            """)
-                        
-                        with col2:
-                            st.markdown("**Mensaje sugerido:**")
-                            st.text_area("", value=row['MENSAJE_WHATSAPP'], height=200, key=f"msg_{idx}")
-                            st.markdown(f"[📱 Abrir WhatsApp](https://wa.me/51{row['TELEFONO']})")
+                estadisticas = vista_estadisticas(clave_vistas, clientes)
+                col1, col2 = st.columns(2)
                 
-                if len(clientes_filtrados) > 5:
-                    st.info(f"Mostrando 5 de {len(clientes_filtrados)} clientes. Descarga el Excel para ver todos.")
+                with col1:
+                    st.markdown("#### 📊 Resumen de Visitas")
+                    st.markdown(f"""
+                    - **Promedio de visitas por cliente:** {estadisticas['visitas_promedio']:.2f}
+                    - **Mediana de visitas:** {estadisticas['visitas_mediana']:.0f}
+                    - **Cliente más frecuente:** {estadisticas['visitas_max']:.0f} visitas
+                    - **Clientes con 1 sola visita:** {estadisticas['una_visita']} ({estadisticas['pct_una_visita']:.1f}%)
+                    """)
+                
+                with col2:
+                    st.markdown("#### 💰 Análisis de Gasto")
+                    st.markdown(f"""
+                    - **Gasto promedio por visita:** S/ {estadisticas['gasto_promedio_visita']:.2f}
+                    - **Gasto total promedio por cliente:** S/ {estadisticas['gasto_promedio_cliente']:.2f}
+                    - **Cliente con mayor gasto:** S/ {estadisticas['gasto_max']:.2f}
+                    """)
                 
-                # Botón descarga
                 st.markdown("---")
+                st.markdown("#### 🎯 Clientes VIP del Salón (de más a menos visitas)")
                 
-                excel_data = crear_excel_whatsapp(clientes_filtrados)
+                tabla_paginada(ranking_clientes(clave_vistas, clientes), 'pagina_ranking',
+                               formato={'GASTO_TOTAL': 'S/ {:.2f}'}, filas_por_pagina=10)
                 
-                col1, col2, col3 = st.columns([1, 2, 1])
-                with col2:
-                    st.download_button(
-                        label=f"📥 DESCARGAR LISTA COMPLETA ({len(clientes_filtrados)} clientes)",
-                        data=excel_data,
-                        file_name=f"WhatsApp_BLUSH_{datetime.now().strftime('%d%m%Y')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
+                st.markdown("---")
+                st.markdown("#### 📉 Evolución de los Indicadores (cierre de cada mes)")
+                
+                evolucion = ejecutar_tendencias(clave_datos, fecha_referencia, obtener_visitas_diarias)
+                if len(evolucion) > 1:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.line_chart(evolucion[['TOTAL_CLIENTES', 'CLIENTES_ACTIVOS', 'CLIENTES_EN_RIESGO']].rename(columns={
+                            'TOTAL_CLIENTES': 'Total clientes', 'CLIENTES_ACTIVOS': 'Activos', 'CLIENTES_EN_RIESGO': 'En riesgo'
+                        }))
+                    with col2:
+                        st.line_chart(evolucion['TASA_RETENCION'].rename('Tasa de retención (%)'))
+                    st.caption("Cada punto es el indicador calculado con las ventas hasta el último día del mes "
+                               "(el último punto es la fecha de referencia).")
+                else:
+                    st.caption("Hace falta más de un mes de ventas para mostrar la evolución")
+    
+        if tab5.open:
+            with tab5, instrumentacion.etapa('pestana_cohortes') as etapa:
+                st.markdown("### 📅 Retención por Cohortes Mensuales")
+                
+                st.info("💡 Cada fila agrupa a los clientes que vinieron por primera vez ese mes. Cada columna muestra qué % de ellos volvió 1, 2, 3... meses después. Las celdas vacías son meses que todavía no pasaron.")
+                
+                matrices = ejecutar_cohortes(clave_vistas, obtener_visitas, clientes.set_index('CLIENTE_ID')['ESTILISTA'])
+                estilistas_cohorte = [e for e in ORDEN_ESTILISTAS if e in matrices]
+                cohorte_estilista = st.selectbox(
+                    'Estilista', options=['Todos'] + estilistas_cohorte,
+                    help="Por estilista, cada cliente cuenta con su estilista más frecuente"
+                )
+                matriz = matrices[None if cohorte_estilista == 'Todos' else cohorte_estilista]
+                etapa['filas'] = len(matriz)
+                
+                if len(matriz) > 0:
+                    columnas_meses = [c for c in matriz.columns if c.startswith('Mes ') and c != 'Mes 0']
+                    st.dataframe(
+                        matriz.style.format('{:.0f}%', subset=['Mes 0'] + columnas_meses, na_rep='')
+                        .background_gradient(cmap='RdYlGn', subset=columnas_meses, axis=None),
+                        use_container_width=True,
+                        height=min(38 * (len(matriz) + 1), 600)
                     )
-            else:
-                st.warning("No hay clientes que cumplan con los filtros seleccionados")
-        
-        with tab4:
-            st.markdown("### 📈 Estadísticas Generales")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("#### 📊 Resumen de Visitas")
-                st.markdown(f"""
-                - **Promedio de visitas por cliente:** {clientes['NUM_VISITAS'].mean():.2f}
-                - **Mediana de visitas:** {clientes['NUM_VISITAS'].median():.0f}
-                - **Cliente más frecuente:** {clientes['NUM_VISITAS'].max():.0f} visitas
-                - **Clientes con 1 sola visita:** {(clientes['NUM_VISITAS'] == 1).sum()} ({(clientes['NUM_VISITAS'] == 1).sum()/len(clientes)*100:.1f}%)
-                """)
-            
-            with col2:
-                st.markdown("#### 💰 Análisis de Gasto")
-                st.markdown(f"""
-                - **Gasto promedio por visita:** S/ {clientes['GASTO_PROMEDIO'].mean():.2f}
-                - **Gasto total promedio por cliente:** S/ {clientes['GASTO_TOTAL'].mean():.2f}
-                - **Cliente con mayor gasto:** S/ {clientes['GASTO_TOTAL'].max():.2f}
-                """)
-            
-            st.markdown("---")
-            st.markdown("#### 🎯 Top 10 Clientes VIP del Salón")
-            
-            top_vip = clientes.nlargest(10, 'NUM_VISITAS')[[
-                'CLIENTE', 'NUM_VISITAS', 'GASTO_TOTAL', 'ESTILISTA', 'DIAS_SIN_VISITA'
-            ]]
-            
-            st.dataframe(
-                top_vip.style.format({
-                    'GASTO_TOTAL': 'S/ {:.2f}'
-                }),
-                use_container_width=True
-            )
+                else:
+                    st.warning("No hay visitas con fecha para armar las cohortes")
     
     except Exception as e:
         st.error(f"❌ Error al procesar el archivo: {str(e)}")
@@ -712,7 +822,8 @@ else:
         Los que visitaron en los últimos 60 días. Son tu flujo de caja actual.
         
         **Clientes en Riesgo:**  
-        Tienen 2+ visitas pero no vienen hace 60+ días. ¡Están a punto de perderse!
+        Tienen 2+ visitas y ya pasó 1,5 veces su ritmo habitual (la mediana de días entre sus
+        visitas) sin que vuelvan. ¡Están a punto de perderse!
         
         **Días sin visita:**  
         Cuánto tiempo pasó desde su última cita. Lo ideal es <30 días para servicios de belleza.
@@ -728,9 +839,9 @@ else:
         | Segmento | Visitas | Última visita | ¿Qué hacer? |
         |----------|---------|---------------|-------------|
         | 🌟 **VIP** | 10+ | Cualquiera | Recompensar. Son tus mejores clientes. |
-        | 💚 **Regular** | 4-9 | <60 días | Mantener satisfechos. Base estable. |
-        | 💛 **Ocasional** | 2-3 | <90 días | Incentivar más visitas frecuentes. |
-        | ⚠️ **En Riesgo** | 2+ | >60 días | **¡Contactar urgente!** Pueden irse. |
+        | 💚 **Regular** | 4-9 | Dentro de su ritmo | Mantener satisfechos. Base estable. |
+        | 💛 **Ocasional** | 2-3 | Dentro de su ritmo | Incentivar más visitas frecuentes. |
+        | ⚠️ **En Riesgo** | 2+ | >1,5 veces su ritmo | **¡Contactar urgente!** Pueden irse. |
         | 🆕 **Nuevo** | 1 | <60 días | Dar seguimiento. Potencial de retención. |
         | ❌ **Perdido** | 1 | >60 días | Reactivar con promoción especial. |
         
@@ -801,3 +912,24 @@ st.markdown("""
     <p style='font-size: 0.8rem;'>Sistema de Retención de Clientes v2.5 - Conceptos Explicados</p>
 </div>
 """, unsafe_allow_html=True)
+
+# PANEL DE DIAGNÓSTICO
+if mostrar_diagnostico:
+    with st.sidebar:
+        st.markdown("### 🩺 Diagnóstico")
+        if instrumentacion.etapas:
+            st.dataframe(pd.DataFrame(instrumentacion.tabla()), hide_index=True, use_container_width=True)
+            st.caption(f"Total: {instrumentacion.segundos_totales():.2f} s (etapas de primer nivel) · "
+                       "pico_mb es el máximo de memoria del proceso")
+        else:
+            st.caption("Sin etapas registradas en esta ejecución")
+        if etapas_descarga.etapas:
+            st.markdown("**Últimas descargas**")
+            st.dataframe(pd.DataFrame(etapas_descarga.tabla()), hide_index=True, use_container_width=True)
+        
+        uso = almacen.metricas()
+        st.markdown("**Almacén compartido**")
+        st.caption(f"{uso['bytes'] / 2**20:.1f} de {uso['presupuesto_bytes'] / 2**20:.0f} MB · "
+                   f"{uso['entradas']} resultados ({uso['en_uso']} en uso por alguna sesión) · "
+                   f"aciertos {uso['tasa_aciertos']:.0%} ({uso['aciertos']} de {uso['aciertos'] + uso['fallos']}) · "
+                   f"{uso['desalojos']} desalojos ({uso['bytes_desalojados'] / 2**20:.0f} MB)")
@@ -0,0 +1,214 @@
+"""Mide tiempo y memoria de cada etapa del análisis con ventas sintéticas.
+
+    python benchmarks/benchmark_retencion.py --tamanos 10000 100000 --etiqueta v2
+    python benchmarks/benchmark_retencion.py --etiqueta v3 --comparar benchmarks/resultados/v2.json
+
+Por cada tamaño genera (o reutiliza de benchmarks/datos/) un Excel sintético,
+lo lee y ejecuta las etapas en el mismo orden que la app. El pico de memoria
+se mide con tracemalloc (que también registra los buffers de numpy) en una
+segunda ejecución de cada etapa, para que su sobrecosto no afecte los
+tiempos. Los resultados se guardan como JSON en benchmarks/resultados/ para
+comparar entre versiones.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datos_sinteticos import escribir_excel_ventas, generar_ventas
+from retencion import equipo, identidad, productos
+from retencion.analisis import (
+    agregar_clientes, agregar_riesgo_churn, calcular_metricas_estilista, compactar_ventas, completar_clientes,
+    filtrar_clientes
+)
+from retencion.bloques import analizar_por_bloques
+from retencion.equipo import ORDEN_ESTILISTAS, normalizar_estilistas
+from retencion.exportar import crear_excel_whatsapp
+from retencion.identidad import resolver_clientes
+from retencion.lectura import COLUMNAS_VENTAS, LINEAS_POR_BLOQUE, leer_excel_ventas, limpiar_ventas
+from retencion.mensajes import generar_mensajes_whatsapp
+from retencion.productos import clasificar_productos
+from retencion.tendencias import kpis_mensuales
+from retencion.visitas import visitas_diarias
+
+TAMANOS_POR_DEFECTO = [10_000, 100_000, 1_000_000, 10_000_000]
+# Filas de una hoja de Excel menos las 10 de cabecera y encabezado
+MAX_LINEAS_EXCEL = 1_048_576 - 10
+DIR_DATOS = RAIZ / 'benchmarks' / 'datos'
+DIR_RESULTADOS = RAIZ / 'benchmarks' / 'resultados'
+FECHA_REFERENCIA = pd.Timestamp('2025-07-01')
+UMBRAL_REGRESION = 1.2
+# Diferencias menores no cuentan como regresión (ruido en etapas muy cortas)
+MIN_DIFERENCIA = {'segundos': 0.05, 'pico_mb': 1.0}
+
+class Medidor:
+    """Acumula tiempo, pico de memoria y filas de cada etapa"""
+
+    def __init__(self, memoria=True):
+        self.memoria = memoria
+        self.etapas = {}
+
+    def medir(self, etapa, funcion, *args):
+        vaciar_caches()
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        segundos = time.perf_counter() - inicio
+        
+        pico = None
+        if self.memoria:
+            vaciar_caches()
+            tracemalloc.start()
+            funcion(*args)
+            pico = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        
+        self.etapas[etapa] = {
+            'segundos': round(segundos, 4),
+            'pico_mb': None if pico is None else round(pico, 2),
+            'filas': len(resultado) if hasattr(resultado, '__len__') else None,
+        }
+        print(f'  {etapa:<14} {segundos:9.3f} s' + ('' if pico is None else f' {pico:10.1f} MB'), flush=True)
+        return resultado
+
+def vaciar_caches():
+    """Vacía las caches de normalización, clasificación e identidad para medir en frío"""
+    equipo._cache_estilistas.clear()
+    productos._cache_items_producto.clear()
+    identidad._cache_nombres.clear()
+
+def ventas_de_prueba(n_lineas, semilla, medidor):
+    """Lee el Excel sintético del tamaño pedido (o usa el DataFrame si no cabe en Excel)"""
+    if n_lineas > MAX_LINEAS_EXCEL:
+        print(f'  lectura        omitida: {n_lineas:,} líneas no caben en una hoja de Excel', flush=True)
+        return limpiar_ventas(generar_ventas(n_lineas, semilla=semilla)[COLUMNAS_VENTAS])
+    
+    ruta = DIR_DATOS / f'ventas_{n_lineas}_{semilla}.xlsx'
+    if not ruta.exists():
+        print(f'  generando {ruta.name}...', flush=True)
+        DIR_DATOS.mkdir(parents=True, exist_ok=True)
+        escribir_excel_ventas(generar_ventas(n_lineas, semilla=semilla), ruta)
+    return medidor.medir('lectura', leer_excel_ventas, ruta)
+
+def bloques_de(df, lineas_por_bloque=LINEAS_POR_BLOQUE):
+    """Bloques de líneas de un DataFrame, como los de leer_excel_ventas_por_bloques"""
+    for inicio in range(0, len(df), lineas_por_bloque):
+        yield df.iloc[inicio:inicio + lineas_por_bloque].copy()
+
+def medir_tamano(n_lineas, semilla=0, memoria=True):
+    """Ejecuta todas las etapas para un tamaño y devuelve sus mediciones"""
+    medidor = Medidor(memoria)
+    df = ventas_de_prueba(n_lineas, semilla, medidor)
+    df['FECHA'] = df['FECHA'].ffill()
+    crudas = df
+    # Copia superficial: la segunda ejecución (la de memoria) parte de los mismos datos
+    df = medidor.medir('compactacion', lambda d: compactar_ventas(d.copy(deep=False)), df)
+    
+    df['CLIENTE_ID'] = medidor.medir('identidad', resolver_clientes, df['CLIENTE'], df.get('TELEF'))
+    df['EMPLEADO'] = medidor.medir('normalizacion', normalizar_estilistas, df['EMPLEADO'])
+    df['ES_PRODUCTO'] = medidor.medir('clasificacion', clasificar_productos, df['PRODUCTO / SERVICIO'], df.get('CLASE'))
+    visitas = medidor.medir('visitas', visitas_diarias, df['CLIENTE_ID'], df['FECHA'], df['TOTAL'], df['ES_PRODUCTO'])
+    clientes = medidor.medir('agregacion', agregar_clientes, df, visitas)
+    clientes = medidor.medir('segmentacion', completar_clientes, clientes, FECHA_REFERENCIA)
+    # Copia superficial: agregar_riesgo_churn agrega la columna a la tabla recibida
+    clientes = medidor.medir(
+        'churn', lambda c: agregar_riesgo_churn(c.copy(deep=False), visitas, FECHA_REFERENCIA), clientes
+    )
+    medidor.medir('mensajes', generar_mensajes_whatsapp, clientes)
+    medidor.medir('metricas', calcular_metricas_estilista, df, clientes)
+    medidor.medir('tendencias', kpis_mensuales, visitas, FECHA_REFERENCIA)
+    # El mismo análisis (clientes y métricas) agregando de a bloques
+    medidor.medir('por_bloques', lambda d: analizar_por_bloques(bloques_de(d), FECHA_REFERENCIA)[0], crudas)
+    
+    # Exportación con los filtros por defecto de la pestaña de WhatsApp
+    filtrados = filtrar_clientes(clientes, ['En Riesgo', 'Perdido'], ORDEN_ESTILISTAS, 30)
+    medidor.medir('exportacion', lambda c: crear_excel_whatsapp(c).getbuffer(), filtrados)
+    
+    return {'lineas': len(df), 'clientes': len(clientes), 'etapas': medidor.etapas}
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar_resultados(base, actual, umbral=UMBRAL_REGRESION):
+    """Imprime la razón actual/base por etapa y devuelve las regresiones"""
+    regresiones = []
+    print(f"\nComparación con '{base.get('etiqueta')}' (razón actual/base, umbral {umbral:.2f}):")
+    for tamano, medicion in actual['resultados'].items():
+        anterior = base['resultados'].get(tamano)
+        if anterior is None:
+            continue
+        print(f'  {int(tamano):,} líneas')
+        for etapa, valores in medicion['etapas'].items():
+            previos = anterior['etapas'].get(etapa)
+            if previos is None:
+                continue
+            for medida, unidad in (('segundos', 's'), ('pico_mb', 'MB')):
+                if not valores[medida] or not previos[medida]:
+                    continue
+                razon = valores[medida] / previos[medida]
+                marca = ''
+                if razon > umbral and valores[medida] - previos[medida] > MIN_DIFERENCIA[medida]:
+                    marca = '  <-- regresión'
+                    regresiones.append((tamano, etapa, medida, razon))
+                print(f'    {etapa:<14} {medida:<9} {previos[medida]:10.3f} -> {valores[medida]:10.3f} {unidad:<2} x{razon:5.2f}{marca}')
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de las etapas del análisis de retención.')
+    parser.add_argument('--tamanos', nargs='+', type=int, default=TAMANOS_POR_DEFECTO, help='líneas de venta por corrida')
+    parser.add_argument('--etiqueta', default=None, help='nombre de la versión medida (por defecto, el commit)')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--sin-memoria', action='store_true', help='solo medir tiempos (una ejecución por etapa)')
+    parser.add_argument('--comparar', type=Path, default=None, help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--umbral', type=float, default=UMBRAL_REGRESION, help='razón a partir de la cual se marca regresión')
+    parser.add_argument('--salida', type=Path, default=DIR_RESULTADOS, help='carpeta de resultados')
+    args = parser.parse_args(argv)
+    
+    commit = _commit_actual()
+    etiqueta = args.etiqueta or commit or datetime.now().strftime('%Y%m%d%H%M')
+    resultado = {
+        'etiqueta': etiqueta,
+        'commit': commit,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'memoria': not args.sin_memoria,
+        'entorno': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+        },
+        'resultados': {},
+    }
+    
+    for n_lineas in args.tamanos:
+        print(f'{n_lineas:,} líneas', flush=True)
+        resultado['resultados'][str(n_lineas)] = medir_tamano(n_lineas, args.semilla, memoria=not args.sin_memoria)
+    
+    args.salida.mkdir(parents=True, exist_ok=True)
+    ruta = args.salida / f'{etiqueta}.json'
+    ruta.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f'Resultados guardados en {ruta}')
+    
+    if args.comparar:
+        base = json.loads(args.comparar.read_text(encoding='utf-8'))
+        if comparar_resultados(base, resultado, args.umbral):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Generador de ventas sintéticas con el formato del sistema de registro.
+
+Produce DataFrames con las columnas de Hoja1 y los escribe como Excel con
+nueve filas de cabecera antes del encabezado (el formato que lee la app).
+Sirve para medir el rendimiento sin usar datos reales de clientes.
+
+    python benchmarks/datos_sinteticos.py 100000 ventas_sinteticas.xlsx
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Cómo aparece cada estilista en el sistema de ventas (variantes incluidas)
+VARIANTES_ESTILISTAS = {
+    'Julio Luna': ['Julio Luna', 'JULIO LUNA', 'Julio', 'julio luna ', 'Julio Cesar', 'Julio Cesar L.'],
+    'Jhon': ['Jhon', 'Jhon ', 'JHON'],
+    'Yuri': ['Yuri', ' Yuri', 'YURI'],
+    'Susy': ['Susy', 'SUSY', 'Susy '],
+    'Vero': ['Vero', 'Veronica', 'VERONICA P', 'vero'],
+    'Maria': ['Maria', 'MARIA'],
+    'Recepción': ['Recepcion', 'CAJA'],
+}
+
+SERVICIOS = [
+    ('CORTE DAMA', 45), ('CORTE CABALLERO', 30), ('TINTE GLOBAL', 180), ('MECHAS BALAYAGE', 350),
+    ('BRUSHING', 40), ('PEINADO EVENTO', 90), ('MANICURE', 25), ('PEDICURE', 35),
+    ('TRATAMIENTO KERATINA', 280), ('MAQUILLAJE SOCIAL', 120),
+]
+PRODUCTOS = [
+    ('SHAMPOO REDKEN X300ML', 85), ('ACONDICIONADOR LOREAL 250ML', 70), ('MASCARILLA KERASTASE', 160),
+    ('SERUM OLAPLEX N7', 140), ('SPRAY FIJADOR 400ML', 45), ('CREMA PARA PEINAR', 55),
+    ('GEL FIJADOR 200GR', 30), ('ACEITE ARGAN 100ML', 95),
+]
+
+NOMBRES = ['Ana', 'María', 'Lucía', 'Carmen', 'Rosa', 'Sofía', 'Valeria', 'Camila', 'Daniela', 'Paola',
+           'Andrea', 'Gabriela', 'Patricia', 'Julia', 'Elena', 'Diego', 'Luis', 'Carlos', 'Jorge', 'Miguel']
+APELLIDOS = ['García', 'Rodríguez', 'López', 'Quispe', 'Flores', 'Sánchez', 'Ramírez', 'Torres',
+             'Huamán', 'Mendoza', 'Castillo', 'Vargas', 'Rojas', 'Chávez', 'Gutiérrez', 'Díaz']
+
+def generar_ventas(n_lineas, n_clientes=None, estilistas=None, anios=3, fraccion_productos=0.25,
+                   fraccion_variantes=0.3, fecha_fin='2025-06-30', semilla=0):
+    """DataFrame de ``n_lineas`` líneas de venta con el formato de Hoja1.
+
+    Cada cliente tiene un número de visitas sesgado (muchas de una sola vez,
+    pocas muy frecuentes) y un estilista habitual; cada visita tiene una o
+    más líneas con la misma fecha. ``fraccion_variantes`` es la parte de
+    líneas con el EMPLEADO escrito de otra forma (mayúsculas, espacios,
+    nombres completos). Las líneas salen ordenadas por fecha y, como en el
+    sistema, la FECHA solo aparece en la primera línea de cada visita.
+    """
+    rng = np.random.default_rng(semilla)
+    n_clientes = n_clientes or max(n_lineas // 6, 1)
+    estilistas = list(estilistas or VARIANTES_ESTILISTAS)
+    variantes = [VARIANTES_ESTILISTAS.get(e, [e]) for e in estilistas]
+    
+    # Visitas: el peso de cada cliente sigue una ley de potencia
+    lineas_por_visita = 1 + rng.poisson(0.6, n_lineas)
+    n_visitas = max(int(n_lineas / lineas_por_visita.mean()), 1)
+    peso = rng.pareto(1.2, n_clientes) + 1
+    cliente_visita = rng.choice(n_clientes, n_visitas, p=peso / peso.sum())
+    
+    fin = pd.Timestamp(fecha_fin)
+    dias = rng.integers(0, 365 * anios, n_visitas)
+    fecha_visita = (fin - pd.to_timedelta(dias, unit='D')).normalize()
+    
+    # Estilista habitual por cliente; un 20% de visitas con otra persona
+    habitual = rng.integers(0, len(estilistas), n_clientes)
+    estilista_visita = np.where(
+        rng.random(n_visitas) < 0.8, habitual[cliente_visita], rng.integers(0, len(estilistas), n_visitas)
+    )
+    
+    # Expandir visitas a líneas
+    visita = np.repeat(np.arange(n_visitas), lineas_por_visita[:n_visitas])[:n_lineas]
+    if len(visita) < n_lineas:
+        visita = np.concatenate([visita, rng.integers(0, n_visitas, n_lineas - len(visita))])
+    orden = np.argsort(dias[visita], kind='stable')[::-1]
+    visita = visita[orden]
+    cliente = cliente_visita[visita]
+    
+    primera_linea = np.r_[True, visita[1:] != visita[:-1]]
+    fecha = pd.Series(fecha_visita[visita]).where(primera_linea)
+    
+    estilista = estilista_visita[visita]
+    nombre_empleado = np.array([v[0] for v in variantes], dtype=object)[estilista]
+    otra_forma = rng.random(n_lineas) < fraccion_variantes
+    nombre_empleado[otra_forma] = [
+        variantes[e][rng.integers(len(variantes[e]))] for e in estilista[otra_forma]
+    ]
+    
+    es_producto = ~primera_linea & (rng.random(n_lineas) < fraccion_productos * 2)
+    catalogo_servicios = np.array([s for s, _ in SERVICIOS], dtype=object)
+    catalogo_productos = np.array([p for p, _ in PRODUCTOS], dtype=object)
+    i_servicio = rng.integers(0, len(SERVICIOS), n_lineas)
+    i_producto = rng.integers(0, len(PRODUCTOS), n_lineas)
+    item = np.where(es_producto, catalogo_productos[i_producto], catalogo_servicios[i_servicio])
+    precio = np.where(
+        es_producto,
+        np.array([p for _, p in PRODUCTOS])[i_producto],
+        np.array([p for _, p in SERVICIOS])[i_servicio]
+    ) * rng.uniform(0.9, 1.1, n_lineas)
+    
+    # CLASE a veces viene vacía y la app recurre a las palabras clave
+    clase = np.where(es_producto, 'PRODUCTO', 'SERVICIO').astype(object)
+    clase[rng.random(n_lineas) < 0.3] = None
+    
+    nombres_clientes = np.array([
+        f'{NOMBRES[i % len(NOMBRES)]} {APELLIDOS[(i // len(NOMBRES)) % len(APELLIDOS)]} {i}'
+        for i in range(n_clientes)
+    ], dtype=object)
+    telefonos = np.array([str(900000000 + i) for i in range(n_clientes)], dtype=object)
+    telefonos[rng.random(n_clientes) < 0.1] = None
+    
+    return pd.DataFrame({
+        'FECHA': fecha,
+        'NRO': np.arange(1, n_lineas + 1),
+        'EMPLEADO': nombre_empleado,
+        'CLIENTE': nombres_clientes[cliente],
+        'TELEF': telefonos[cliente],
+        'PRODUCTO / SERVICIO': item,
+        'CLASE': clase,
+        'TOTAL': precio.round(2),
+    })
+
+def escribir_excel_ventas(df, ruta):
+    """Escribe las ventas en Hoja1 con el encabezado en la fila 10"""
+    from openpyxl import Workbook
+    
+    wb = Workbook(write_only=True)
+    hoja = wb.create_sheet('Hoja1')
+    hoja.append(['BLUSH Hair & Make-Up'])
+    hoja.append(['Reporte de ventas detallado'])
+    for _ in range(7):
+        hoja.append([])
+    hoja.append(list(df.columns))
+    
+    columnas = [
+        [None if pd.isna(v) else v.to_pydatetime() for v in df[col]] if col == 'FECHA'
+        else df[col].tolist()
+        for col in df.columns
+    ]
+    for fila in zip(*columnas):
+        hoja.append(fila)
+    wb.save(ruta)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Genera un Excel de ventas sintéticas.')
+    parser.add_argument('lineas', type=int, help='número de líneas de venta')
+    parser.add_argument('salida', type=Path, help='ruta del .xlsx a escribir')
+    parser.add_argument('--clientes', type=int, default=None, help='número de clientes (por defecto, líneas/6)')
+    parser.add_argument('--anios', type=int, default=3, help='años de historia')
+    parser.add_argument('--productos', type=float, default=0.25, help='fracción aproximada de líneas de producto')
+    parser.add_argument('--variantes', type=float, default=0.3, help='fracción de EMPLEADO con otra escritura')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argv)
+    
+    df = generar_ventas(args.lineas, n_clientes=args.clientes, anios=args.anios,
+                        fraccion_productos=args.productos, fraccion_variantes=args.variantes,
+                        semilla=args.semilla)
+    escribir_excel_ventas(df, args.salida)
+    print(f'{len(df):,} líneas escritas en {args.salida}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Motor de análisis de retención de clientes de BLUSH.
+
+Se puede usar sin Streamlit (por ejemplo, en tareas nocturnas):
+
+    from retencion import leer_excel_ventas, analizar_retencion
+
+Los submódulos se importan recién al usar cada nombre, así que
+``import retencion`` no carga pandas, openpyxl ni matplotlib.
+"""
+import importlib
+
+_EXPORTADOS = {
+    'analizar_retencion': 'retencion.analisis',
+    'calcular_metricas_estilista': 'retencion.analisis',
+    'segmentar_clientes': 'retencion.analisis',
+    'agrupar_estilista': 'retencion.equipo',
+    'normalizar_estilistas': 'retencion.equipo',
+    'resolver_clientes': 'retencion.identidad',
+    'riesgo_churn': 'retencion.churn',
+    'analizar_por_bloques': 'retencion.bloques',
+    'es_producto': 'retencion.productos',
+    'clasificar_productos': 'retencion.productos',
+    'generar_mensaje_whatsapp': 'retencion.mensajes',
+    'generar_mensajes_whatsapp': 'retencion.mensajes',
+    'crear_excel_whatsapp': 'retencion.exportar',
+    'crear_csv_whatsapp': 'retencion.exportar',
+    'enviar_campana': 'retencion.envios',
+    'leer_excel_ventas': 'retencion.lectura',
+    'leer_contenidos_ventas': 'retencion.lectura',
+    'combinar_ventas': 'retencion.lectura',
+}
+
+__all__ = list(_EXPORTADOS)
+
+def __getattr__(nombre):
+    if nombre not in _EXPORTADOS:
+        raise AttributeError(f"module 'retencion' has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(_EXPORTADOS[nombre]), nombre)
+    globals()[nombre] = valor
+    return valor
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,5 @@
+import sys
+
+from retencion.cli import main
+
+sys.exit(main())
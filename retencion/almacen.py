@@ -0,0 +1,161 @@
+"""Almacén de resultados compartido por todas las sesiones del proceso.
+
+Varias personas del salón pueden tener el tablero abierto a la vez. En lugar
+de que cada sesión guarde su propia copia de las ventas leídas y del
+análisis, todas piden los resultados a un único almacén por una clave que
+sale del hash del contenido de los archivos: el mismo Excel subido desde dos
+sesiones se lee y se analiza una sola vez, y ambas reciben el mismo objeto
+(de solo lectura).
+
+Cada sesión mantiene referencias a lo que está mostrando; mientras una
+entrada tiene referencias no se desaloja. Las demás se desalojan de la menos
+usada recientemente a la más usada cuando el total estimado supera el
+presupuesto de memoria. El almacén cuenta aciertos, fallos y desalojos.
+"""
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+def tamano_bytes(valor):
+    """Memoria estimada de un resultado (DataFrames, arreglos y contenedores de ellos)"""
+    if isinstance(valor, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(valor, pd.DataFrame) else uso)
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamano_bytes(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamano_bytes(v) for v in valor.values())
+    if hasattr(valor, '__dict__'):
+        # Objetos armados sobre tablas (p. ej. IndiceClientes): se cuentan sus atributos
+        return sys.getsizeof(valor) + tamano_bytes(vars(valor))
+    return sys.getsizeof(valor)
+
+_FALTA = object()
+
+class ReferenciasSesion:
+    """Lo que una sesión está usando del almacén, una clave por espacio.
+
+    Al fijar una clave nueva en un espacio (p. ej. 'analisis') se suelta la
+    anterior. Cuando la sesión termina y este objeto se libera, se sueltan
+    todas.
+    """
+
+    def __init__(self, almacen):
+        self._almacen = almacen
+        self._claves = {}
+        weakref.finalize(self, almacen._soltar_todas, self._claves)
+
+    def fijar(self, espacio, clave):
+        anterior = self._claves.get(espacio)
+        if anterior == clave:
+            return
+        self._almacen._retener(clave)
+        self._claves[espacio] = clave
+        if anterior is not None:
+            self._almacen._soltar(anterior)
+
+class AlmacenCompartido:
+    """Resultados por clave con referencias por sesión y presupuesto de memoria (LRU)"""
+
+    def __init__(self, presupuesto_bytes):
+        self.presupuesto_bytes = presupuesto_bytes
+        self._entradas = OrderedDict()  # clave -> (valor, bytes), de la menos a la más reciente
+        self._referencias = {}
+        self._calculos = {}
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.bytes_desalojados = 0
+
+    def __contains__(self, clave):
+        with self._candado:
+            return clave in self._entradas
+
+    def sesion(self):
+        """Referencias de una sesión nueva (guardarlas en el estado de la sesión)"""
+        return ReferenciasSesion(self)
+
+    def obtener(self, clave, crear, referencias=None, espacio=None):
+        """Valor guardado para ``clave``; si no está, lo calcula con ``crear()``.
+
+        Si dos sesiones piden a la vez una clave que falta, la segunda espera
+        el cálculo de la primera. Con ``referencias`` y ``espacio`` la sesión
+        queda usando la clave (no se desaloja mientras la use).
+        """
+        with self._candado:
+            valor = self._buscar(clave)
+            calculo = self._calculos.setdefault(clave, threading.Lock()) if valor is _FALTA else None
+        if calculo is not None:
+            with calculo:
+                with self._candado:
+                    valor = self._buscar(clave)
+                if valor is _FALTA:
+                    valor = crear()
+                    with self._candado:
+                        self.fallos += 1
+                        self._entradas[clave] = (valor, tamano_bytes(valor))
+                        self._calculos.pop(clave, None)
+        if referencias is not None:
+            referencias.fijar(espacio, clave)
+        with self._candado:
+            self._ajustar()
+        return valor
+
+    def _buscar(self, clave):
+        if clave not in self._entradas:
+            return _FALTA
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return self._entradas[clave][0]
+
+    def _retener(self, clave):
+        with self._candado:
+            self._referencias[clave] = self._referencias.get(clave, 0) + 1
+
+    def _soltar(self, clave):
+        with self._candado:
+            restantes = self._referencias.pop(clave, 0) - 1
+            if restantes > 0:
+                self._referencias[clave] = restantes
+            self._ajustar()
+
+    def _soltar_todas(self, claves):
+        for clave in list(claves.values()):
+            self._soltar(clave)
+        claves.clear()
+
+    def _ajustar(self):
+        """Desaloja entradas sin referencias, de la menos reciente a la más reciente"""
+        total = sum(tamano for _, tamano in self._entradas.values())
+        for clave in list(self._entradas):
+            if total <= self.presupuesto_bytes:
+                break
+            if clave in self._referencias:
+                continue
+            _, tamano = self._entradas.pop(clave)
+            total -= tamano
+            self.desalojos += 1
+            self.bytes_desalojados += tamano
+
+    def metricas(self):
+        """Aciertos, fallos, tasa de aciertos, desalojos y memoria en uso"""
+        with self._candado:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'en_uso': sum(1 for clave in self._entradas if clave in self._referencias),
+                'bytes': sum(tamano for _, tamano in self._entradas.values()),
+                'presupuesto_bytes': self.presupuesto_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+                'desalojos': self.desalojos,
+                'bytes_desalojados': self.bytes_desalojados,
+            }
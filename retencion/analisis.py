@@ -0,0 +1,259 @@
+"""Análisis de retención: tabla de clientes y métricas por estilista."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from retencion.churn import riesgo_churn
+from retencion.equipo import ORDEN_ESTILISTAS, normalizar_estilistas
+from retencion.identidad import resolver_clientes
+from retencion.productos import clasificar_productos
+from retencion.visitas import ritmo_visitas, visitas_diarias
+
+SEGMENTOS = ['VIP', 'Regular', 'Ocasional', 'Nuevo', 'En Riesgo', 'Perdido']
+# Textos que se repiten en muchas líneas: se guardan como Categorical
+COLUMNAS_CATEGORICAS_VENTAS = ['EMPLEADO', 'CLIENTE', 'TELEF', 'PRODUCTO / SERVICIO', 'CLASE', 'ORIGEN']
+# Un cliente está en riesgo cuando lleva FACTOR_ATRASO veces su cadencia sin venir
+# (acotado a un rango razonable); sin cadencia se usan 90 días (hasta 3 visitas) o 60
+FACTOR_ATRASO = 1.5
+UMBRAL_RIESGO_MIN_DIAS = 21
+UMBRAL_RIESGO_MAX_DIAS = 180
+
+def estilista_preferido(df, clave='CLIENTE_ID'):
+    """Estilista más frecuente de cada cliente (la moda de EMPLEADO).
+
+    Cuenta los pares (cliente, estilista) y toma el máximo por cliente; los
+    empates se resuelven por orden alfabético, igual que Series.mode().
+    """
+    conteo = df.groupby([clave, 'EMPLEADO'], observed=True).size().unstack(fill_value=0)
+    return preferido_desde_conteo(conteo)
+
+def nombre_principal(ids, nombres, pesos=None):
+    """Escritura más frecuente del nombre de cada cliente (empates: orden alfabético)"""
+    conteo = pd.DataFrame({
+        'ID': ids, 'NOMBRE': nombres, 'PESO': 1 if pesos is None else pesos
+    }).groupby(['ID', 'NOMBRE'], observed=True)['PESO'].sum().reset_index()
+    conteo = conteo.sort_values(['PESO', 'NOMBRE'], ascending=[False, True], kind='stable')
+    return conteo.drop_duplicates('ID').set_index('ID')['NOMBRE']
+
+def preferido_desde_conteo(conteo):
+    """Columna con más conteo por fila de una matriz cliente x estilista"""
+    conteo = conteo[sorted(conteo.columns, key=str)]
+    nombres = np.array([str(c) for c in conteo.columns], dtype=object)
+    return pd.Series(nombres[conteo.to_numpy().argmax(axis=1)], index=conteo.index)
+
+def umbral_riesgo(num_visitas, cadencia=None):
+    """Días sin visita a partir de los cuales el cliente está atrasado respecto de su ritmo"""
+    fijo = np.where(np.asarray(num_visitas) <= 3, 90, 60)
+    if cadencia is None:
+        return fijo
+    propio = np.clip(FACTOR_ATRASO * np.asarray(cadencia, dtype=np.float64), UMBRAL_RIESGO_MIN_DIAS, UMBRAL_RIESGO_MAX_DIAS)
+    return np.where(np.isnan(propio), fijo, propio)
+
+def segmentar_clientes(num_visitas, dias_sin_visita, cadencia=None):
+    """Asigna el segmento de cada cliente según visitas y días sin visita.
+
+    Con ``cadencia`` (mediana de días entre visitas), "En Riesgo" se mide
+    contra el ritmo de cada cliente en lugar de los 60/90 días fijos.
+    """
+    atrasado = dias_sin_visita > umbral_riesgo(num_visitas, cadencia)
+    condiciones = [
+        (num_visitas == 1) & (dias_sin_visita > 60),
+        num_visitas == 1,
+        (num_visitas <= 3) & atrasado,
+        num_visitas <= 3,
+        (num_visitas <= 9) & atrasado,
+        num_visitas <= 9,
+    ]
+    segmentos = ['Perdido', 'Nuevo', 'En Riesgo', 'Ocasional', 'En Riesgo', 'Regular']
+    return pd.Categorical(np.select(condiciones, segmentos, default='VIP'), categories=SEGMENTOS)
+
+def analizar_retencion(df, hoy=None):
+    """Analiza patrones de retención de clientes.
+
+    ``hoy`` es la fecha de referencia (por defecto, el momento actual): las
+    ventas posteriores a ese día se ignoran, así que con una fecha pasada se
+    obtiene el análisis tal como era entonces.
+    """
+    
+    hoy = pd.Timestamp(hoy) if hoy is not None else datetime.now()
+    df = preparar_ventas(ventas_hasta(df, hoy))
+    
+    visitas = visitas_diarias(df['CLIENTE_ID'], df['FECHA'], df['TOTAL'], df['ES_PRODUCTO'])
+    clientes = completar_clientes(agregar_clientes(df, visitas), hoy)
+    return agregar_riesgo_churn(clientes, visitas, hoy), df
+
+def ventas_hasta(df, hoy):
+    """Líneas de venta hasta el final del día ``hoy`` (las sin fecha toman la de la línea anterior)"""
+    posteriores = pd.to_datetime(df['FECHA'], errors='coerce').ffill() >= pd.Timestamp(hoy).normalize() + pd.Timedelta(days=1)
+    return df[~posteriores] if posteriores.any() else df
+
+def compactar_ventas(df):
+    """Esquema compacto de las líneas de venta: Categorical para los textos
+    repetidos y float32 para los montos"""
+    for col in COLUMNAS_CATEGORICAS_VENTAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    df['TOTAL'] = pd.to_numeric(df['TOTAL'], errors='coerce').astype('float32')
+    return df
+
+def preparar_ventas(df):
+    """Completa fechas, agrupa estilistas y marca productos en las líneas de venta"""
+    df = compactar_ventas(df)
+    df['FECHA'] = pd.to_datetime(df['FECHA'], errors='coerce').ffill()
+    df['CLIENTE_ID'] = resolver_clientes(df['CLIENTE'], df.get('TELEF'))
+    df['EMPLEADO'] = normalizar_estilistas(df['EMPLEADO'])
+    
+    # Detectar productos vs servicios
+    df['ES_PRODUCTO'] = clasificar_productos(df['PRODUCTO / SERVICIO'], df.get('CLASE'))
+    
+    return df
+
+def agregar_clientes(df, visitas=None):
+    """Agrega las líneas de venta por cliente (visitas, gasto, estilista, teléfono).
+
+    Agrupa por CLIENTE_ID, así que las distintas escrituras de un cliente
+    cuentan juntas; CLIENTE es la escritura más usada. Las visitas son días
+    distintos con compras (ver retencion.visitas), no líneas de venta.
+    """
+    if visitas is None:
+        visitas = visitas_diarias(df['CLIENTE_ID'], df['FECHA'], df['TOTAL'], df['ES_PRODUCTO'])
+    # Los montos son float32; se suman en float64 (como en retencion.bloques)
+    columnas = df[['FECHA', 'TOTAL', 'TELEF']].astype({'TOTAL': 'float64'})
+    clientes = columnas.groupby(df['CLIENTE_ID'], observed=True).agg(
+        PRIMERA_VISITA=('FECHA', 'min'),
+        ULTIMA_VISITA=('FECHA', 'max'),
+        GASTO_TOTAL=('TOTAL', 'sum'),
+        TELEFONO=('TELEF', 'first')
+    )
+    clientes.insert(0, 'CLIENTE', nombre_principal(df['CLIENTE_ID'], df['CLIENTE']).reindex(clientes.index))
+    clientes.insert(4, 'ESTILISTA', estilista_preferido(df).reindex(clientes.index))
+    return ordenar_clientes(agregar_ritmo(clientes, visitas))
+
+def agregar_ritmo(clientes, visitas):
+    """Agrega NUM_VISITAS y CADENCIA_DIAS (índice: CLIENTE_ID) desde las visitas por día"""
+    ritmo = ritmo_visitas(visitas).reindex(clientes.index.astype(str))
+    clientes.insert(3, 'NUM_VISITAS', ritmo['NUM_VISITAS'].fillna(0).to_numpy())
+    clientes['CADENCIA_DIAS'] = ritmo['CADENCIA_DIAS'].to_numpy()
+    return clientes
+
+def ordenar_clientes(clientes):
+    """Tabla de clientes con CLIENTE_ID como columna, en orden alfabético"""
+    clientes.index = clientes.index.astype(str)
+    clientes['CLIENTE'] = clientes['CLIENTE'].astype(str)
+    return clientes.rename_axis('CLIENTE_ID').reset_index().sort_values(
+        ['CLIENTE', 'CLIENTE_ID'], ignore_index=True
+    )
+
+def completar_clientes(clientes, hoy):
+    """Agrega días sin visita, gasto promedio, próxima visita esperada y segmento.
+
+    Visitas y días quedan como enteros pequeños (más anchos si no entran, por
+    ejemplo con una última visita muy antigua), los montos y la cadencia en
+    float32 y estilista y segmento como Categorical.
+    """
+    clientes['NUM_VISITAS'] = _entero_compacto(clientes['NUM_VISITAS'], 'int32')
+    clientes['CADENCIA_DIAS'] = clientes['CADENCIA_DIAS'].astype('float32')
+    clientes['GASTO_TOTAL'] = clientes['GASTO_TOTAL'].astype('float32')
+    clientes['ESTILISTA'] = clientes['ESTILISTA'].astype(pd.CategoricalDtype(ORDEN_ESTILISTAS))
+    clientes['DIAS_SIN_VISITA'] = _entero_compacto((hoy - clientes['ULTIMA_VISITA']).dt.days, 'int16')
+    clientes['GASTO_PROMEDIO'] = (clientes['GASTO_TOTAL'] / clientes['NUM_VISITAS']).astype('float32')
+    clientes['PROXIMA_VISITA'] = clientes['ULTIMA_VISITA'] + pd.to_timedelta(clientes['CADENCIA_DIAS'].round(), unit='D')
+    
+    # Segmentación según el ritmo de cada cliente
+    clientes['SEGMENTO'] = segmentar_clientes(
+        clientes['NUM_VISITAS'], clientes['DIAS_SIN_VISITA'], clientes['CADENCIA_DIAS']
+    )
+    
+    return clientes
+
+def agregar_riesgo_churn(clientes, visitas, hoy):
+    """Agrega RIESGO_CHURN: probabilidad de no volver, según el modelo de retencion.churn"""
+    riesgo = riesgo_churn(visitas, clientes.set_index('CLIENTE_ID')['ESTILISTA'], hoy)
+    clientes['RIESGO_CHURN'] = clientes['CLIENTE_ID'].map(riesgo).astype('float32')
+    return clientes
+
+def _entero_compacto(valores, tipo):
+    """Entero del tipo indicado, o uno más ancho si los valores no entran; si hay vacíos, float32"""
+    if valores.isna().any():
+        return valores.astype('float32')
+    tipos = ['int16', 'int32', 'int64']
+    for tipo in tipos[tipos.index(tipo):]:
+        limites = np.iinfo(tipo)
+        if valores.empty or (limites.min <= valores.min() and valores.max() <= limites.max):
+            break
+    return valores.astype(tipo)
+
+def calcular_metricas_estilista(df, clientes):
+    """Calcula métricas detalladas por estilista.
+
+    Usa una sola agrupación de las ventas (por estilista y producto/servicio)
+    y otra de los clientes, sin recorrer cada estilista por separado.
+    """
+    
+    return metricas_desde_resumen(resumen_ventas_estilista(df), clientes)
+
+def resumen_ventas_estilista(df):
+    """Líneas, líneas con monto y monto total por estilista y producto/servicio.
+
+    EMPLEADO es Categorical, así que el resultado sale en ORDEN_ESTILISTAS.
+    El monto se suma en float64 y queda en float32.
+    """
+    tipo_item = df['ES_PRODUCTO'].astype(pd.CategoricalDtype([False, True]))
+    resumen = df['TOTAL'].astype('float64').groupby([df['EMPLEADO'], tipo_item], observed=False).agg(
+        ['size', 'count', 'sum']
+    ).unstack(fill_value=0)
+    resumen['sum'] = resumen['sum'].astype('float32')
+    return resumen
+
+def metricas_desde_resumen(ventas, clientes):
+    """Arma la tabla de métricas por estilista a partir del resumen de ventas"""
+    servicios = ventas.xs(False, axis=1, level=1)
+    productos = ventas.xs(True, axis=1, level=1)
+    
+    estilistas = ventas.index[(servicios['size'] + productos['size']) > 0]
+    servicios = servicios.loc[estilistas]
+    productos = productos.loc[estilistas]
+    
+    # Clientes por estilista preferido
+    por_cliente = clientes.assign(
+        RETENIDO=clientes['NUM_VISITAS'] > 1,
+        ACTIVO=clientes['DIAS_SIN_VISITA'] <= 60,
+        EN_RIESGO=clientes['SEGMENTO'] == 'En Riesgo'
+    ).groupby('ESTILISTA').agg(
+        TOTAL_CLIENTES=('CLIENTE', 'size'),
+        CLIENTES_ACTIVOS=('ACTIVO', 'sum'),
+        TASA_RETENCION=('RETENIDO', 'mean'),
+        CLIENTES_EN_RIESGO=('EN_RIESGO', 'sum'),
+        VISITAS_PROMEDIO=('NUM_VISITAS', 'mean'),
+        GASTO_PROMEDIO=('GASTO_PROMEDIO', 'mean')
+    ).reindex(estilistas.astype(str), fill_value=0)
+    
+    return pd.DataFrame({
+        'ESTILISTA': estilistas.astype(str),
+        'TOTAL_CLIENTES': por_cliente['TOTAL_CLIENTES'].to_numpy(),
+        'CLIENTES_ACTIVOS': por_cliente['CLIENTES_ACTIVOS'].to_numpy(),
+        'TASA_RETENCION': por_cliente['TASA_RETENCION'].to_numpy() * 100,
+        'CLIENTES_EN_RIESGO': por_cliente['CLIENTES_EN_RIESGO'].to_numpy(),
+        'VISITAS_PROMEDIO': por_cliente['VISITAS_PROMEDIO'].to_numpy(),
+        'GASTO_PROMEDIO': por_cliente['GASTO_PROMEDIO'].to_numpy(),
+        'TOTAL_SERVICIOS': servicios['size'].to_numpy(),
+        'TOTAL_PRODUCTOS': productos['size'].to_numpy(),
+        'INGRESO_SERVICIOS': servicios['sum'].to_numpy(),
+        'INGRESO_PRODUCTOS': productos['sum'].to_numpy(),
+        'TICKET_PROMEDIO': (
+            (servicios['sum'] + productos['sum']) / (servicios['count'] + productos['count'])
+        ).to_numpy()
+    })
+
+def filtrar_clientes(clientes, segmentos, estilistas, dias_min, riesgo_min=None):
+    """Clientes a contactar: por segmento, estilista, días mínimos sin visita y,
+    si se indica, riesgo de abandono mínimo (0 a 1)"""
+    filtro = (
+        (clientes['SEGMENTO'].isin(segmentos)) &
+        (clientes['ESTILISTA'].isin(estilistas)) &
+        (clientes['DIAS_SIN_VISITA'] >= dias_min)
+    )
+    if riesgo_min is not None:
+        filtro &= clientes['RIESGO_CHURN'] >= riesgo_min
+    return clientes[filtro].sort_values('DIAS_SIN_VISITA', ascending=False, kind='stable')
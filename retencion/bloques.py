@@ -0,0 +1,246 @@
+"""Análisis por bloques, para historiales que no entran cómodos en memoria.
+
+Las líneas de venta se leen de a bloques (ver
+lectura.leer_excel_ventas_por_bloques) y cada bloque se pliega en
+acumuladores que se combinan entre sí: por nombre de cliente (primera y
+última fecha, líneas, gasto y primer teléfono), pares nombre-teléfono, por
+cliente y estilista (líneas), por cliente y día (las visitas) y por
+estilista y tipo de ítem (líneas, líneas con monto y monto). Al final se
+resuelven las identidades sobre los nombres distintos y se arman las mismas
+tablas que analizar_retencion y calcular_metricas_estilista.
+
+En memoria queda un bloque más los acumuladores, que crecen con los
+clientes y sus días de visita, no con las líneas; el resultado es idéntico
+al análisis en memoria. Con ``max_dias_por_cliente`` se guardan a lo sumo
+los últimos días de cada nombre y cuántos más antiguos se descartaron, así
+que la memoria queda acotada por los clientes, a cambio de un resultado
+aproximado para los que pasan el tope: sus visitas se siguen contando (si
+los archivos vienen en orden de fecha; un día descartado con dos escrituras
+del nombre puede contar dos veces), pero la cadencia, las cohortes y la
+evolución mensual usan solo sus últimas visitas, y el modelo de riesgo de
+abandono se entrena con ellas. Los montos se suman en float64 y se pasan a
+float32 al final, igual que en el análisis en memoria.
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from retencion.analisis import (
+    agregar_riesgo_churn, agregar_ritmo, completar_clientes, metricas_desde_resumen, nombre_principal,
+    ordenar_clientes, preferido_desde_conteo
+)
+from retencion.equipo import normalizar_estilistas
+from retencion.identidad import resolver_clientes
+from retencion.lectura import LINEAS_POR_BLOQUE, leer_excel_ventas_por_bloques
+from retencion.productos import clasificar_productos
+from retencion.visitas import visitas_diarias
+
+def _reducir_nombres(nombres):
+    # El teléfono de cada nombre es el de su línea más antigua con teléfono
+    nombres = nombres.sort_values('ORDEN_TELEFONO', kind='stable')
+    return nombres.groupby(level=0).agg(
+        PRIMERA=('PRIMERA', 'min'),
+        ULTIMA=('ULTIMA', 'max'),
+        LINEAS=('LINEAS', 'sum'),
+        GASTO=('GASTO', 'sum'),
+        TELEFONO=('TELEFONO', 'first'),
+        ORDEN_TELEFONO=('ORDEN_TELEFONO', 'min')
+    )
+
+def _sumar_por_indice(tabla):
+    return tabla.groupby(level=list(range(tabla.index.nlevels)), observed=True).sum()
+
+_REDUCCIONES = {
+    'nombres': _reducir_nombres,
+    'telefonos': lambda pares: pares.drop_duplicates(ignore_index=True),
+    'empleados': _sumar_por_indice,
+    'dias': _sumar_por_indice,
+    'ventas': _sumar_por_indice,
+}
+
+class AcumuladorVentas:
+    """Agregados combinables de líneas de venta ya preparadas (ver preparar_bloque).
+
+    Cada tabla guarda una parte ya reducida y las partes nuevas; se vuelve a
+    reducir cuando lo pendiente alcanza a lo reducido, así que el costo total
+    es lineal en las líneas. Al reducir los días de visita se recortan a los
+    últimos ``max_dias_por_cliente`` de cada nombre (None: sin tope).
+    """
+
+    def __init__(self, max_dias_por_cliente=None):
+        self.lineas = 0
+        self.max_dias_por_cliente = max_dias_por_cliente
+        self.dias_descartados = pd.Series(dtype='int64')
+        self._partes = {tabla: [] for tabla in _REDUCCIONES}
+
+    def agregar(self, bloque):
+        """Pliega un bloque de líneas preparadas"""
+        orden = pd.RangeIndex(self.lineas, self.lineas + len(bloque))
+        bloque = bloque.assign(ORDEN=orden.to_numpy(), MONTO=bloque['TOTAL'].astype('float64'))
+    
+        con_telefono = bloque.dropna(subset=['CLIENTE', 'TELEF']).drop_duplicates('CLIENTE')
+        nombres = bloque.groupby('CLIENTE').agg(
+            PRIMERA=('FECHA', 'min'), ULTIMA=('FECHA', 'max'), LINEAS=('FECHA', 'size'), GASTO=('MONTO', 'sum')
+        ).join(con_telefono.set_index('CLIENTE')[['TELEF', 'ORDEN']].rename(
+            columns={'TELEF': 'TELEFONO', 'ORDEN': 'ORDEN_TELEFONO'}
+        ))
+    
+        tipo_item = bloque['ES_PRODUCTO'].astype(pd.CategoricalDtype([False, True]))
+        self._sumar('nombres', nombres)
+        self._sumar('telefonos', bloque[['CLIENTE', 'TELEF']].drop_duplicates(ignore_index=True))
+        self._sumar('empleados', bloque.groupby(['CLIENTE', 'EMPLEADO'], observed=True).size().to_frame('LINEAS'))
+        self._sumar('dias', bloque.assign(FECHA=bloque['FECHA'].dt.normalize(), PRODUCTOS=bloque['ES_PRODUCTO']).groupby(
+            ['CLIENTE', 'FECHA']
+        ).agg(LINEAS=('MONTO', 'size'), TOTAL=('MONTO', 'sum'), PRODUCTOS=('PRODUCTOS', 'sum')))
+        self._sumar('ventas', bloque.groupby([bloque['EMPLEADO'], tipo_item], observed=False)['MONTO'].agg(
+            ['size', 'count', 'sum']
+        ))
+        self.lineas += len(bloque)
+
+    def combinar(self, otro):
+        """Agrega los acumulados de ``otro``, cuyas líneas van después de las de este"""
+        for tabla in _REDUCCIONES:
+            parte = otro.tabla(tabla)
+            if tabla == 'nombres':
+                parte = parte.assign(ORDEN_TELEFONO=parte['ORDEN_TELEFONO'] + self.lineas)
+            self._sumar(tabla, parte)
+        self._descartar(otro.dias_descartados)
+        self.lineas += otro.lineas
+        return self
+
+    def _sumar(self, tabla, parte):
+        if tabla == 'dias' and self.max_dias_por_cliente is not None:
+            # Los últimos días de cada nombre están entre los últimos de alguna parte
+            parte = self._recortar_dias(parte)
+        partes = self._partes[tabla]
+        partes.append(parte)
+        if len(partes) > 1 and sum(len(p) for p in partes[1:]) >= len(partes[0]):
+            self._reducir(tabla)
+
+    def _reducir(self, tabla):
+        reducida = _REDUCCIONES[tabla](pd.concat(self._partes[tabla]))
+        if tabla == 'dias' and self.max_dias_por_cliente is not None:
+            reducida = self._recortar_dias(reducida)
+        self._partes[tabla] = [reducida]
+
+    def _recortar_dias(self, dias):
+        """Deja los últimos días de cada nombre y cuenta los descartados"""
+        # Después del groupby, las filas están ordenadas por nombre y fecha
+        desde_el_final = dias.groupby(level='CLIENTE', observed=True).cumcount(ascending=False).to_numpy()
+        quedan = desde_el_final < self.max_dias_por_cliente
+        if not quedan.all():
+            nombres = dias.index.get_level_values('CLIENTE')[~quedan]
+            self._descartar(pd.Series(1, index=nombres).groupby(level=0).sum())
+        return dias[quedan]
+
+    def _descartar(self, dias_por_nombre):
+        if len(dias_por_nombre):
+            self.dias_descartados = self.dias_descartados.add(dias_por_nombre, fill_value=0).astype('int64')
+
+    def tabla(self, tabla):
+        """Tabla acumulada, reducida"""
+        if len(self._partes[tabla]) != 1:
+            self._reducir(tabla)
+        return self._partes[tabla][0]
+
+    def identidades(self):
+        """CLIENTE_ID de cada nombre escrito, resuelto con todos los pares nombre-teléfono"""
+        pares = self.tabla('telefonos')
+        return dict(zip(pares['CLIENTE'], resolver_clientes(pares['CLIENTE'], pares['TELEF'])))
+
+    def visitas(self, id_nombre=None):
+        """Visitas por cliente y día, como visitas_diarias sobre todas las líneas.
+
+        Solo incluye los días guardados (ver max_dias_por_cliente).
+        """
+        if id_nombre is None:
+            id_nombre = self.identidades()
+        dias = self.tabla('dias').reset_index()
+        visitas = visitas_diarias(
+            dias['CLIENTE'].map(id_nombre), dias['FECHA'], dias['TOTAL'], dias['PRODUCTOS'], dias['LINEAS']
+        )
+        visitas['TOTAL'] = visitas['TOTAL'].astype('float32')
+        return visitas
+
+    def analizar(self, hoy):
+        """Tabla de clientes y métricas por estilista, como analizar_retencion y calcular_metricas_estilista"""
+        pares = self.tabla('telefonos')
+        id_nombre = self.identidades()
+        nombres = self.tabla('nombres').rename_axis('CLIENTE').reset_index()
+        ids = nombres['CLIENTE'].map(id_nombre)
+    
+        clientes = nombres.groupby(ids).agg(
+            PRIMERA_VISITA=('PRIMERA', 'min'),
+            ULTIMA_VISITA=('ULTIMA', 'max'),
+            GASTO_TOTAL=('GASTO', 'sum'),
+        )
+        clientes['GASTO_TOTAL'] = clientes['GASTO_TOTAL'].astype('float32')
+        por_orden = nombres.assign(CLIENTE_ID=ids).sort_values('ORDEN_TELEFONO', kind='stable')
+        # Categorical con todos los teléfonos, como TELEF en compactar_ventas
+        telefonos = pd.CategoricalDtype(pares['TELEF'].astype('category').cat.categories)
+        clientes['TELEFONO'] = por_orden.groupby('CLIENTE_ID')['TELEFONO'].first().reindex(clientes.index).astype(telefonos)
+        clientes.insert(0, 'CLIENTE', nombre_principal(ids, nombres['CLIENTE'], nombres['LINEAS']))
+    
+        empleados = self.tabla('empleados')['LINEAS']
+        ids_empleados = empleados.index.get_level_values('CLIENTE').map(id_nombre)
+        conteo = empleados.groupby([ids_empleados, empleados.index.get_level_values('EMPLEADO')], observed=True).sum()
+        clientes.insert(4, 'ESTILISTA', preferido_desde_conteo(conteo.unstack(fill_value=0)).reindex(clientes.index))
+    
+        visitas = self.visitas(id_nombre)
+        clientes = agregar_ritmo(clientes, visitas)
+        if len(self.dias_descartados):
+            # Los días descartados por el tope siguen contando como visitas
+            descartados = self.dias_descartados.groupby(self.dias_descartados.index.map(id_nombre)).sum()
+            clientes['NUM_VISITAS'] += descartados.reindex(clientes.index, fill_value=0).to_numpy()
+        clientes = completar_clientes(ordenar_clientes(clientes), hoy)
+        clientes = agregar_riesgo_churn(clientes, visitas, hoy)
+    
+        resumen = self.tabla('ventas').unstack(fill_value=0)
+        resumen['sum'] = resumen['sum'].astype('float32')
+        return clientes, metricas_desde_resumen(resumen, clientes)
+
+def preparar_bloque(bloque, fecha_anterior=None):
+    """Prepara un bloque como preparar_ventas, sin resolver identidades.
+
+    Las líneas sin fecha al inicio del bloque toman ``fecha_anterior`` (la
+    última del bloque previo).
+    """
+    fechas = pd.to_datetime(bloque['FECHA'], errors='coerce')
+    if len(fechas) and pd.isna(fechas.iloc[0]) and fecha_anterior is not None:
+        fechas.iloc[0] = fecha_anterior
+    return bloque.assign(
+        FECHA=fechas.ffill(),
+        TOTAL=pd.to_numeric(bloque['TOTAL'], errors='coerce').astype('float32'),
+        EMPLEADO=normalizar_estilistas(bloque['EMPLEADO']),
+        ES_PRODUCTO=clasificar_productos(bloque['PRODUCTO / SERVICIO'], bloque.get('CLASE')),
+    )
+
+def bloques_archivos(origenes, lineas_por_bloque=LINEAS_POR_BLOQUE):
+    """Bloques de líneas de venta de varios archivos, uno tras otro"""
+    for origen in origenes:
+        yield from leer_excel_ventas_por_bloques(origen, lineas_por_bloque)
+
+def acumular_bloques(bloques, hoy, max_dias_por_cliente=None):
+    """Pliega los bloques de líneas de venta (hasta el día ``hoy``) en un AcumuladorVentas"""
+    limite = hoy.normalize() + pd.Timedelta(days=1)
+    acumulador = AcumuladorVentas(max_dias_por_cliente)
+    fecha_anterior = None
+    for bloque in bloques:
+        bloque = preparar_bloque(bloque, fecha_anterior)
+        if bloque['FECHA'].notna().any():
+            fecha_anterior = bloque['FECHA'].iloc[-1]
+        # Igual que ventas_hasta: se descartan las ventas posteriores a la fecha de referencia
+        acumulador.agregar(bloque[~(bloque['FECHA'] >= limite)])
+    return acumulador
+
+def analizar_por_bloques(bloques, hoy=None, max_dias_por_cliente=None):
+    """Tabla de clientes y métricas por estilista a partir de bloques de líneas de venta.
+
+    ``bloques`` son DataFrames como los de leer_excel_ventas, en el orden de
+    los archivos (p. ej. bloques_archivos). El resultado es el mismo que el
+    de analizar_retencion y calcular_metricas_estilista con todas las líneas
+    juntas, sin tenerlas nunca a todas en memoria; con ``max_dias_por_cliente``
+    es aproximado para los clientes que pasan el tope (ver el módulo).
+    """
+    hoy = pd.Timestamp(hoy) if hoy is not None else datetime.now()
+    return acumular_bloques(bloques, hoy, max_dias_por_cliente).analizar(hoy)
@@ -0,0 +1,55 @@
+"""Cache en disco de las ventas ya leídas.
+
+La hoja ya leída y limpia se guarda en formato columnar (Arrow/Feather sin
+comprimir) por hash del archivo; al volver a subir el mismo archivo se carga
+de ahí en lugar de volver a parsear el Excel. Las columnas se pasan a pandas
+liberando la tabla de Arrow a medida que se convierten, para no tener dos
+copias completas en memoria.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+CACHE_DIR_VENTAS = Path(os.environ.get('BLUSH_CACHE_DIR', Path(__file__).resolve().parent.parent / '.cache_ventas'))
+CACHE_DISCO_MAX_ARCHIVOS = 20
+VERSION_CACHE_VENTAS = 3
+
+def _ruta_cache_ventas(hash_archivo):
+    return CACHE_DIR_VENTAS / f'{hash_archivo}_v{VERSION_CACHE_VENTAS}.arrow'
+
+def existe_ventas_disco(hash_archivo):
+    """Si hay ventas guardadas para este hash"""
+    return _ruta_cache_ventas(hash_archivo).exists()
+
+def cargar_ventas_disco(hash_archivo):
+    """Carga las ventas guardadas para este hash, o None si no existen"""
+    ruta = _ruta_cache_ventas(hash_archivo)
+    if not ruta.exists():
+        return None
+    try:
+        from pyarrow import feather
+        df = feather.read_table(ruta).to_pandas(split_blocks=True, self_destruct=True)
+    except (OSError, ValueError, TypeError, ImportError):
+        return None
+    os.utime(ruta)
+    return df
+
+def guardar_ventas_disco(hash_archivo, df):
+    """Guarda las ventas limpias y elimina los archivos más antiguos"""
+    ruta = _ruta_cache_ventas(hash_archivo)
+    try:
+        CACHE_DIR_VENTAS.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_suffix('.tmp')
+        df.to_feather(temporal, compression='uncompressed')
+        os.replace(temporal, ruta)
+        
+        archivos = sorted(CACHE_DIR_VENTAS.glob('*.arrow'), key=lambda r: r.stat().st_mtime, reverse=True)
+        for viejo in archivos[CACHE_DISCO_MAX_ARCHIVOS:]:
+            viejo.unlink(missing_ok=True)
+    except (OSError, ValueError, TypeError, ImportError):
+        # La cache en disco es opcional: si no se puede escribir, se sigue sin ella
+        pass
+
+def hash_contenido(contenido):
+    """Hash SHA-256 del contenido del archivo subido"""
+    return hashlib.sha256(contenido).hexdigest()
@@ -0,0 +1,118 @@
+"""Riesgo de abandono (churn) de cada cliente, aprendido del propio historial.
+
+El modelo es una regresión logística (numpy, sin dependencias extra) que
+se entrena con una foto del pasado: las características de cada cliente a
+``HORIZONTE_DIAS`` del final de los datos, con la etiqueta "no volvió en
+los días siguientes". Después se aplica a la foto de hoy, así que
+RIESGO_CHURN es la probabilidad de que el cliente no vuelva en los
+próximos ``HORIZONTE_DIAS`` días.
+
+Las características salen de las visitas por día (una fila por cliente y
+fecha): recencia, frecuencia, gasto, ticket, proporción de productos,
+antigüedad, regularidad entre visitas y estilista preferido.
+"""
+import numpy as np
+import pandas as pd
+
+from retencion.equipo import ORDEN_ESTILISTAS
+from retencion.visitas import intervalos_visitas
+
+HORIZONTE_DIAS = 90
+# Con menos clientes (o sin abandonos y regresos en la foto) no se entrena
+MIN_CLIENTES_ENTRENAMIENTO = 50
+REGULARIZACION_L2 = 1.0
+MAX_ITERACIONES = 50
+
+def caracteristicas_churn(visitas, estilistas, fecha):
+    """Características de los clientes con visitas hasta ``fecha`` (índice: CLIENTE_ID)"""
+    visitas = visitas[visitas['FECHA'] <= fecha]
+    ids = visitas['CLIENTE_ID'].astype(str).to_numpy()
+    agregados = visitas.groupby(ids).agg(
+        DIAS=('FECHA', 'size'), PRIMERA=('FECHA', 'min'), ULTIMA=('FECHA', 'max'),
+        LINEAS=('LINEAS', 'sum'), TOTAL=('TOTAL', 'sum'), PRODUCTOS=('PRODUCTOS', 'sum')
+    )
+    
+    desvio = intervalos_visitas(visitas).groupby(level=0).std(ddof=0).reindex(agregados.index)
+    
+    recencia = (pd.Timestamp(fecha) - agregados['ULTIMA']).dt.days.clip(lower=0)
+    antiguedad = (agregados['ULTIMA'] - agregados['PRIMERA']).dt.days
+    intervalo_medio = (antiguedad / (agregados['DIAS'] - 1)).where(agregados['DIAS'] > 1)
+    gasto = agregados['TOTAL'].clip(lower=0)
+    
+    caracteristicas = pd.DataFrame({
+        'recencia': np.log1p(recencia),
+        'visitas': np.log1p(agregados['DIAS']),
+        'gasto': np.log1p(gasto),
+        'ticket': np.log1p(gasto / agregados['DIAS']),
+        'productos': agregados['PRODUCTOS'] / agregados['LINEAS'],
+        'antiguedad': np.log1p(antiguedad),
+        'una_visita': (agregados['DIAS'] == 1).astype(float),
+        # Atraso respecto del ritmo propio y variación de ese ritmo
+        'atraso': np.log1p(recencia / intervalo_medio.where(intervalo_medio > 0)).fillna(0),
+        'irregularidad': (desvio / intervalo_medio.where(intervalo_medio > 0)).fillna(0),
+    }, index=agregados.index).astype(float)
+    
+    estilista = estilistas.reindex(caracteristicas.index).astype(pd.CategoricalDtype(ORDEN_ESTILISTAS))
+    return caracteristicas.join(pd.get_dummies(estilista, prefix='ESTILISTA', dtype=float))
+
+def _logistica(z):
+    return 1 / (1 + np.exp(-np.clip(z, -35, 35)))
+
+class ModeloChurn:
+    """Regresión logística sobre características estandarizadas"""
+
+    def __init__(self, columnas, media, escala, coeficientes):
+        self.columnas = columnas
+        self.media = media
+        self.escala = escala
+        self.coeficientes = coeficientes
+
+    @classmethod
+    def entrenar(cls, caracteristicas, abandono, l2=REGULARIZACION_L2):
+        """Ajusta los coeficientes por Newton (IRLS) con penalización L2"""
+        x = caracteristicas.to_numpy(dtype=np.float64)
+        media = x.mean(axis=0)
+        escala = x.std(axis=0)
+        escala[escala == 0] = 1
+        a = np.column_stack([np.ones(len(x)), (x - media) / escala])
+        y = np.asarray(abandono, dtype=np.float64)
+    
+        penalizacion = l2 * np.eye(a.shape[1])
+        penalizacion[0, 0] = 0  # sin penalizar la constante
+        w = np.zeros(a.shape[1])
+        for _ in range(MAX_ITERACIONES):
+            p = _logistica(a @ w)
+            gradiente = a.T @ (p - y) + penalizacion @ w
+            hessiana = (a * (p * (1 - p))[:, None]).T @ a + penalizacion
+            paso = np.linalg.solve(hessiana, gradiente)
+            w -= paso
+            if np.abs(paso).max() < 1e-6:
+                break
+        return cls(list(caracteristicas.columns), media, escala, w)
+
+    def probabilidad(self, caracteristicas):
+        x = caracteristicas.reindex(columns=self.columnas, fill_value=0).to_numpy(dtype=np.float64)
+        z = self.coeficientes[0] + ((x - self.media) / self.escala) @ self.coeficientes[1:]
+        return pd.Series(_logistica(z), index=caracteristicas.index)
+
+def entrenar_churn(visitas, estilistas, hoy, horizonte=HORIZONTE_DIAS):
+    """Entrena con la foto de ``horizonte`` días antes del final de los datos (None si no alcanza)"""
+    if len(visitas) == 0:
+        return None
+    fin = min(pd.Timestamp(hoy).normalize(), visitas['FECHA'].max())
+    corte = fin - pd.Timedelta(days=horizonte)
+    caracteristicas = caracteristicas_churn(visitas, estilistas, corte)
+    
+    siguientes = visitas['FECHA'].between(corte, fin, inclusive='right')
+    volvieron = set(visitas.loc[siguientes, 'CLIENTE_ID'].astype(str))
+    abandono = ~caracteristicas.index.isin(list(volvieron))
+    if len(caracteristicas) < MIN_CLIENTES_ENTRENAMIENTO or abandono.all() or not abandono.any():
+        return None
+    return ModeloChurn.entrenar(caracteristicas, abandono)
+
+def riesgo_churn(visitas, estilistas, hoy, horizonte=HORIZONTE_DIAS):
+    """Probabilidad de no volver en ``horizonte`` días por CLIENTE_ID (vacía si no hay modelo)"""
+    modelo = entrenar_churn(visitas, estilistas, hoy, horizonte)
+    if modelo is None:
+        return pd.Series(np.nan, index=estilistas.index, dtype='float32')
+    return modelo.probabilidad(caracteristicas_churn(visitas, estilistas, pd.Timestamp(hoy))).astype('float32')
@@ -0,0 +1,134 @@
+"""Línea de comandos: analiza uno o más Excel de ventas sin levantar Streamlit.
+
+    python -m retencion ventas_2024.xlsx ventas_2025.xlsx --salida reportes/
+
+Escribe la tabla de clientes, las métricas por estilista, la retención por
+cohortes mensuales, la evolución mensual de los indicadores y la lista de WhatsApp (con los mismos filtros por
+defecto que el tablero). Con ``--enviar CAMPANA`` además envía la lista por
+el proveedor configurado en BLUSH_WHATSAPP_URL (y BLUSH_WHATSAPP_TOKEN).
+Con ``--por-bloques`` lee los archivos de a bloques de líneas, para
+historiales que no entran en memoria (ver retencion.bloques).
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+SEGMENTOS_POR_DEFECTO = ['En Riesgo', 'Perdido']
+# Igual que retencion.lectura.LINEAS_POR_BLOQUE (sin importar pandas al armar el parser)
+LINEAS_POR_BLOQUE = 100_000
+
+def _fecha(texto):
+    return datetime.strptime(texto, '%Y-%m-%d').date()
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m retencion',
+        description='Análisis de retención de clientes BLUSH a partir de Excel de ventas.'
+    )
+    parser.add_argument('archivos', nargs='+', type=Path, help='Excel de ventas (Hoja1, encabezado en la fila 10)')
+    parser.add_argument('--salida', type=Path, default=Path('.'), help='carpeta donde escribir los reportes')
+    parser.add_argument('--fecha', type=_fecha, default=None, help='fecha de referencia AAAA-MM-DD: analiza las ventas hasta ese día (por defecto, hoy)')
+    parser.add_argument('--segmentos', nargs='+', default=SEGMENTOS_POR_DEFECTO,
+                        help='segmentos a incluir en la lista de WhatsApp')
+    parser.add_argument('--estilistas', nargs='+', default=None,
+                        help='estilistas a incluir en la lista de WhatsApp (por defecto, todos)')
+    parser.add_argument('--dias-min', type=int, default=30, help='días mínimos sin visita para la lista de WhatsApp')
+    parser.add_argument('--riesgo-min', type=float, default=None,
+                        help='riesgo de abandono mínimo (0 a 1) para la lista de WhatsApp')
+    parser.add_argument('--csv', action='store_true', help='exportar la lista de WhatsApp como CSV en lugar de Excel')
+    parser.add_argument('--enviar', metavar='CAMPANA', default=None,
+                        help='enviar la lista de WhatsApp como esta campaña (omite a quienes ya la recibieron)')
+    parser.add_argument('--sin-horario', action='store_true',
+                        help='enviar aunque se esté fuera del horario recomendado (martes a jueves, 10-12 y 15-17)')
+    parser.add_argument('--sin-cache', action='store_true', help='no usar la cache en disco de ventas leídas')
+    parser.add_argument('--por-bloques', type=int, nargs='?', const=LINEAS_POR_BLOQUE, default=None, metavar='LINEAS',
+                        help=f'leer y agregar de a bloques de LINEAS líneas (por defecto {LINEAS_POR_BLOQUE}), sin cache')
+    parser.add_argument('--max-dias-cliente', type=int, default=None, metavar='DIAS',
+                        help='con --por-bloques, guardar solo los últimos DIAS días de visita de cada cliente '
+                             '(menos memoria; aproximado para los clientes con más visitas)')
+    return parser
+
+def cargar_archivos(rutas, usar_cache=True):
+    """Lee los archivos (en paralelo) reutilizando la cache en disco"""
+    from retencion.cache_disco import cargar_ventas_disco, guardar_ventas_disco, hash_contenido
+    from retencion.lectura import combinar_ventas, leer_contenidos_ventas
+    
+    contenidos = [ruta.read_bytes() for ruta in rutas]
+    hashes = [hash_contenido(c) for c in contenidos]
+    ventas = [cargar_ventas_disco(h) if usar_cache else None for h in hashes]
+    pendientes = [i for i, df in enumerate(ventas) if df is None]
+    for i, df in zip(pendientes, leer_contenidos_ventas([contenidos[i] for i in pendientes])):
+        if usar_cache:
+            guardar_ventas_disco(hashes[i], df)
+        ventas[i] = df
+    return combinar_ventas(ventas, [ruta.name for ruta in rutas])
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.enviar and not os.environ.get('BLUSH_WHATSAPP_URL'):
+        parser.error('--enviar necesita la variable BLUSH_WHATSAPP_URL')
+    
+    import pandas as pd
+    
+    from retencion.analisis import analizar_retencion, calcular_metricas_estilista, filtrar_clientes
+    from retencion.cohortes import matrices_cohortes, meses_con_visita
+    from retencion.exportar import crear_csv_whatsapp, crear_excel_whatsapp
+    from retencion.tendencias import kpis_mensuales
+    from retencion.visitas import visitas_diarias
+    
+    if args.por_bloques:
+        from retencion.bloques import acumular_bloques, bloques_archivos
+        
+        hoy = pd.Timestamp(args.fecha or datetime.now())
+        acumulador = acumular_bloques(
+            bloques_archivos(args.archivos, args.por_bloques), hoy, args.max_dias_cliente
+        )
+        clientes, metricas = acumulador.analizar(hoy)
+        visitas = acumulador.visitas()
+        num_lineas = acumulador.lineas
+    else:
+        df = cargar_archivos(args.archivos, usar_cache=not args.sin_cache)
+        clientes, df_procesado = analizar_retencion(df, hoy=args.fecha)
+        metricas = calcular_metricas_estilista(df_procesado, clientes)
+        visitas = visitas_diarias(df_procesado['CLIENTE_ID'], df_procesado['FECHA'], df_procesado['TOTAL'],
+                                  df_procesado['ES_PRODUCTO'])
+        num_lineas = len(df_procesado)
+    
+    estilistas = args.estilistas or clientes['ESTILISTA'].unique()
+    lista = filtrar_clientes(clientes, args.segmentos, estilistas, args.dias_min, args.riesgo_min)
+    
+    args.salida.mkdir(parents=True, exist_ok=True)
+    clientes.to_csv(args.salida / 'clientes.csv', index=False, encoding='utf-8-sig')
+    metricas.to_csv(args.salida / 'metricas_estilistas.csv', index=False, encoding='utf-8-sig')
+    # Los meses con visita salen igual de las visitas por día que de las líneas
+    cohortes = matrices_cohortes(meses_con_visita(visitas['CLIENTE_ID'], visitas['FECHA']))[None]
+    cohortes.round(1).to_csv(args.salida / 'cohortes.csv', encoding='utf-8-sig')
+    evolucion = kpis_mensuales(visitas, args.fecha or date.today())
+    evolucion.round(1).to_csv(args.salida / 'evolucion_mensual.csv', encoding='utf-8-sig')
+    sufijo = (args.fecha or date.today()).strftime('%d%m%Y')
+    if args.csv:
+        ruta_lista = args.salida / f'WhatsApp_BLUSH_{sufijo}.csv'
+        ruta_lista.write_bytes(crear_csv_whatsapp(lista))
+    else:
+        ruta_lista = args.salida / f'WhatsApp_BLUSH_{sufijo}.xlsx'
+        ruta_lista.write_bytes(crear_excel_whatsapp(lista, args.fecha or date.today()).getvalue())
+    
+    print(f'{num_lineas} líneas de venta, {len(clientes)} clientes, {len(lista)} a contactar')
+    print(f'Reportes en {args.salida.resolve()}')
+    
+    if args.enviar:
+        from retencion.envios import ProveedorHTTP, VentanaEnvio, enviar_campana
+        
+        proveedor = ProveedorHTTP(os.environ['BLUSH_WHATSAPP_URL'], os.environ.get('BLUSH_WHATSAPP_TOKEN'))
+        ventana = None if args.sin_horario else VentanaEnvio()
+        resumen = enviar_campana(lista, proveedor, args.enviar, ventana=ventana)
+        print('Envío: ' + ', '.join(f'{n} {estado}' for estado, n in sorted(resumen.items())))
+        if resumen['pendientes']:
+            print(f"{resumen['pendientes']} pendientes (fuera de horario); vuelve a ejecutar para completarlos")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
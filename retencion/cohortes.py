@@ -0,0 +1,78 @@
+"""Retención por cohortes mensuales.
+
+Una cohorte son los clientes cuya primera visita cae en el mismo mes; cada
+celda es el % de la cohorte que volvió a visitar k meses después. Todo se
+calcula con conteos de numpy sobre pares (cliente, mes), sin recorrer
+cohortes ni estilistas en Python.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_MESES_COHORTE = 12
+
+def mes_absoluto(fechas):
+    """Número de mes continuo (año * 12 + mes - 1) de una columna de fechas"""
+    return fechas.dt.year * 12 + fechas.dt.month - 1
+
+def meses_con_visita(ids, fechas):
+    """Pares distintos (CLIENTE_ID, MES) de las líneas de venta"""
+    visitas = pd.DataFrame({'CLIENTE_ID': ids, 'MES': mes_absoluto(fechas)}).dropna()
+    return visitas.astype({'MES': 'int32'}).drop_duplicates(ignore_index=True)
+
+def _etiqueta_mes(mes):
+    return f'{mes // 12}-{mes % 12 + 1:02d}'
+
+def matrices_cohortes(visitas, grupos=None, max_meses=MAX_MESES_COHORTE):
+    """Matriz de retención por cohorte, total y por grupo (p. ej. estilista).
+
+    ``visitas`` tiene CLIENTE_ID y MES (ver meses_con_visita); ``grupos`` es
+    una Series opcional CLIENTE_ID -> grupo. Devuelve un dict con la clave
+    ``None`` para todos los clientes y una clave por grupo; cada matriz
+    tiene una fila por cohorte, la columna CLIENTES con su tamaño y las
+    columnas 'Mes 0'..'Mes k' en %. Las celdas que todavía no ocurrieron
+    (después del último mes con datos) quedan vacías.
+    """
+    codigos, ids = pd.factorize(visitas['CLIENTE_ID'])
+    mes = visitas['MES'].to_numpy(dtype=np.int64)
+    if len(mes) == 0:
+        return {None: pd.DataFrame(columns=['CLIENTES'])}
+    
+    primer_mes = pd.Series(mes).groupby(codigos).min().to_numpy()
+    cohorte = primer_mes[codigos]
+    desfase = mes - cohorte
+    dentro = desfase <= max_meses
+    
+    inicio, fin = int(primer_mes.min()), int(mes.max())
+    n_cohortes, n_desfases = fin - inicio + 1, max_meses + 1
+    
+    if grupos is None:
+        nombres_grupos, grupo_cliente = [], np.zeros(len(ids), dtype=np.int64)
+    else:
+        grupo_cliente, nombres_grupos = pd.factorize(grupos.reindex(ids))
+        nombres_grupos = list(nombres_grupos)
+        grupo_cliente = np.where(grupo_cliente < 0, len(nombres_grupos), grupo_cliente)
+    n_grupos = len(nombres_grupos) + 1
+    
+    # Un solo bincount sobre (grupo, cohorte, desfase)
+    celda = (grupo_cliente[codigos] * n_cohortes + cohorte - inicio) * n_desfases + desfase
+    conteo = np.bincount(celda[dentro], minlength=n_grupos * n_cohortes * n_desfases)
+    conteo = conteo.reshape(n_grupos, n_cohortes, n_desfases)
+    
+    # Celdas futuras: cohorte + desfase después del último mes
+    futuras = (np.arange(n_cohortes)[:, None] + np.arange(n_desfases)[None, :]) > (fin - inicio)
+    etiquetas = [_etiqueta_mes(m) for m in range(inicio, fin + 1)]
+
+    def matriz(conteo_grupo):
+        tamano = conteo_grupo[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = conteo_grupo / tamano[:, None] * 100
+        pct[futuras] = np.nan
+        tabla = pd.DataFrame(pct, index=pd.Index(etiquetas, name='COHORTE'),
+                             columns=[f'Mes {k}' for k in range(n_desfases)])
+        tabla.insert(0, 'CLIENTES', tamano)
+        return tabla[tamano > 0]
+    
+    matrices = {None: matriz(conteo.sum(axis=0))}
+    for g, nombre in enumerate(nombres_grupos):
+        matrices[nombre] = matriz(conteo[g])
+    return matrices
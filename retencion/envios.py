@@ -0,0 +1,299 @@
+"""Envío automático de la lista de WhatsApp.
+
+Los envíos de una campaña salen de una cola que atienden varias tareas de
+asyncio. Antes de enviar se quita cada número repetido y cada número que ya
+figura como enviado en el registro de la campaña, así que volver a ejecutar
+una campaña solo manda lo que faltó. Cada envío espera su turno en un cubo de
+tokens (mensajes por segundo), se reintenta con espera exponencial si el
+proveedor falla de forma transitoria y deja su resultado en un registro
+SQLite. Fuera de la ventana de envío no se toman envíos nuevos: quedan
+pendientes para la próxima ejecución.
+
+El proveedor es cualquier objeto con ``async enviar(telefono, mensaje)``;
+ProveedorHTTP usa solo la biblioteca estándar y sirve para la API de
+WhatsApp Cloud o para un servidor de prueba local.
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+from datetime import time as hora
+from pathlib import Path
+
+from retencion.identidad import normalizar_telefono
+from retencion.mensajes import generar_mensajes_whatsapp
+
+RUTA_ENVIOS = Path(os.environ.get('BLUSH_ENVIOS', Path(__file__).resolve().parent.parent / 'envios_whatsapp.sqlite'))
+PREFIJO_PAIS = '51'
+MENSAJES_POR_SEGUNDO = 5
+ENVIOS_SIMULTANEOS = 8
+REINTENTOS = 3
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 60.0
+# Códigos HTTP que vale la pena reintentar
+CODIGOS_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504}
+
+_ESQUEMA_ENVIOS = """
+CREATE TABLE IF NOT EXISTS envios (
+    campana TEXT NOT NULL,
+    telefono TEXT NOT NULL,
+    cliente TEXT,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL,
+    id_mensaje TEXT,
+    error TEXT,
+    fecha TEXT NOT NULL,
+    PRIMARY KEY (campana, telefono)
+);
+"""
+
+class ErrorEnvio(Exception):
+    """Falla de un envío; ``reintentable`` indica si vale la pena repetirlo"""
+
+    def __init__(self, mensaje, reintentable=False, espera=None):
+        super().__init__(mensaje)
+        self.reintentable = reintentable
+        self.espera = espera
+        self.intentos = 1
+
+class ProveedorHTTP:
+    """Envía cada mensaje con un POST JSON (formato de la API de WhatsApp Cloud).
+
+    Las solicitudes usan urllib en hilos aparte, así que no hace falta
+    ninguna dependencia extra. Para otro proveedor basta con redefinir
+    ``cuerpo`` (y ``id_mensaje`` si responde distinto).
+    """
+
+    def __init__(self, url, token=None, timeout=10):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+
+    def cuerpo(self, telefono, mensaje):
+        return {
+            'messaging_product': 'whatsapp',
+            'to': telefono,
+            'type': 'text',
+            'text': {'body': mensaje},
+        }
+
+    def id_mensaje(self, respuesta):
+        mensajes = respuesta.get('messages') or [{}]
+        return mensajes[0].get('id') or respuesta.get('id')
+
+    def _enviar(self, telefono, mensaje):
+        encabezados = {'Content-Type': 'application/json'}
+        if self.token:
+            encabezados['Authorization'] = f'Bearer {self.token}'
+        solicitud = urllib.request.Request(
+            self.url, data=json.dumps(self.cuerpo(telefono, mensaje)).encode('utf-8'),
+            headers=encabezados, method='POST'
+        )
+        try:
+            with urllib.request.urlopen(solicitud, timeout=self.timeout) as respuesta:
+                texto = respuesta.read()
+        except urllib.error.HTTPError as e:
+            espera = e.headers.get('Retry-After') if e.headers else None
+            raise ErrorEnvio(
+                f'HTTP {e.code}', reintentable=e.code in CODIGOS_TRANSITORIOS,
+                espera=float(espera) if espera and espera.isdigit() else None
+            ) from e
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise ErrorEnvio(f'sin conexión: {e}', reintentable=True) from e
+        try:
+            return self.id_mensaje(json.loads(texto or b'{}'))
+        except (ValueError, AttributeError):
+            return None
+
+    async def enviar(self, telefono, mensaje):
+        return await asyncio.to_thread(self._enviar, telefono, mensaje)
+
+class CuboTokens:
+    """Limita los envíos a ``por_segundo`` con ráfagas de hasta ``capacidad``"""
+
+    def __init__(self, por_segundo, capacidad=None):
+        self.por_segundo = por_segundo
+        self.capacidad = capacidad or max(1, por_segundo)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._candado = asyncio.Lock()
+
+    async def tomar(self):
+        async with self._candado:
+            while True:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.por_segundo)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.por_segundo)
+
+class VentanaEnvio:
+    """Días (0 = lunes) y franjas horarias en las que se permite enviar"""
+
+    def __init__(self, dias=(1, 2, 3), franjas=((hora(10), hora(12)), (hora(15), hora(17)))):
+        self.dias = set(dias)
+        self.franjas = list(franjas)
+
+    def permite(self, momento=None):
+        momento = momento or datetime.now()
+        return momento.weekday() in self.dias and any(
+            desde <= momento.time() < hasta for desde, hasta in self.franjas
+        )
+
+    def proxima_apertura(self, momento=None):
+        """Inicio de la próxima franja permitida (el mismo momento si ya está abierta)"""
+        momento = momento or datetime.now()
+        if self.permite(momento):
+            return momento
+        for dias in range(8):
+            fecha = momento.date() + timedelta(days=dias)
+            if fecha.weekday() not in self.dias:
+                continue
+            for desde, _ in sorted(self.franjas):
+                inicio = datetime.combine(fecha, desde)
+                if inicio > momento:
+                    return inicio
+        return None
+
+def abrir_registro(ruta=None):
+    """Abre (y crea si hace falta) el registro de envíos"""
+    conexion = sqlite3.connect(ruta or RUTA_ENVIOS)
+    conexion.executescript(_ESQUEMA_ENVIOS)
+    return conexion
+
+def ya_enviados(conexion, campana):
+    """Teléfonos con envío exitoso en la campaña"""
+    filas = conexion.execute(
+        "SELECT telefono FROM envios WHERE campana = ? AND estado = 'enviado'", (campana,)
+    )
+    return {telefono for telefono, in filas}
+
+def _registrar(conexion, campana, envio, estado, intentos, id_mensaje=None, error=None):
+    conexion.execute(
+        'INSERT OR REPLACE INTO envios VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        (campana, envio['telefono'], envio['cliente'], estado, intentos, id_mensaje, error,
+         datetime.now().isoformat(timespec='seconds'))
+    )
+    conexion.commit()
+
+def preparar_envios(clientes):
+    """Un envío por número (el primero de la lista) con su mensaje y teléfono internacional.
+
+    Devuelve la lista de envíos y un Counter con los descartados
+    ('sin_telefono' y 'duplicados').
+    """
+    mensajes = generar_mensajes_whatsapp(clientes)
+    envios, vistos, descartados = [], set(), Counter()
+    for cliente, telefono, mensaje in zip(clientes['CLIENTE'], clientes['TELEFONO'], mensajes):
+        numero = normalizar_telefono(telefono)
+        if numero is None:
+            descartados['sin_telefono'] += 1
+        elif numero in vistos:
+            descartados['duplicados'] += 1
+        else:
+            vistos.add(numero)
+            envios.append({'cliente': cliente, 'telefono': PREFIJO_PAIS + numero, 'mensaje': mensaje})
+    return envios, descartados
+
+async def _enviar_con_reintentos(proveedor, envio, reintentos, espera_base):
+    """(id del mensaje, intentos); relanza ErrorEnvio si se agotan los intentos"""
+    for intento in range(1, reintentos + 2):
+        try:
+            return await proveedor.enviar(envio['telefono'], envio['mensaje']), intento
+        except ErrorEnvio as e:
+            if not e.reintentable or intento > reintentos:
+                e.intentos = intento
+                raise
+            espera = e.espera or espera_base * 2 ** (intento - 1) * (1 + random.random())
+            await asyncio.sleep(min(espera, ESPERA_MAXIMA_SEGUNDOS))
+
+async def despachar(envios, proveedor, conexion, campana, ventana=None, por_segundo=MENSAJES_POR_SEGUNDO,
+                    simultaneos=ENVIOS_SIMULTANEOS, reintentos=REINTENTOS, espera_base=ESPERA_BASE_SEGUNDOS,
+                    al_avanzar=None):
+    """Envía la campaña y devuelve un Counter con el resultado de cada envío.
+
+    Claves: 'enviados', 'fallidos', 'ya_enviados' (en una ejecución
+    anterior) y 'pendientes' (la ventana se cerró antes de tomarlos).
+    ``al_avanzar`` recibe el Counter después de cada envío.
+    """
+    resumen = Counter()
+    enviados_antes = ya_enviados(conexion, campana)
+    cola = asyncio.Queue()
+    for envio in envios:
+        if envio['telefono'] in enviados_antes:
+            resumen['ya_enviados'] += 1
+        else:
+            cola.put_nowait(envio)
+    cubo = CuboTokens(por_segundo)
+
+    def avanzar(estado):
+        resumen[estado] += 1
+        if al_avanzar is not None:
+            al_avanzar(resumen)
+
+    async def trabajador():
+        while not cola.empty():
+            if ventana is not None and not ventana.permite():
+                return
+            envio = cola.get_nowait()
+            await cubo.tomar()
+            try:
+                id_mensaje, intentos = await _enviar_con_reintentos(proveedor, envio, reintentos, espera_base)
+            except ErrorEnvio as e:
+                _registrar(conexion, campana, envio, 'fallido', e.intentos, error=str(e))
+                avanzar('fallidos')
+            else:
+                _registrar(conexion, campana, envio, 'enviado', intentos, id_mensaje)
+                avanzar('enviados')
+    
+    await asyncio.gather(*(trabajador() for _ in range(max(1, simultaneos))))
+    resumen['pendientes'] = cola.qsize()
+    return resumen
+
+def enviar_campana(clientes, proveedor, campana, ruta_registro=None, **opciones):
+    """Prepara y envía la campaña (bloquea hasta terminar); ver despachar"""
+    envios, descartados = preparar_envios(clientes)
+    conexion = abrir_registro(ruta_registro)
+    try:
+        resumen = asyncio.run(despachar(envios, proveedor, conexion, campana, **opciones))
+    finally:
+        conexion.close()
+    return resumen + descartados
+
+def enviar_en_segundo_plano(clientes, proveedor, campana, ruta_registro=None, **opciones):
+    """Envía la campaña en un hilo aparte para no bloquear el tablero.
+
+    Devuelve (hilo, estado): ``estado`` es un dict con 'campana' y 'total'
+    que se va actualizando con 'resumen' y, al terminar, 'terminado' (y
+    'error' si falló).
+    """
+    envios, descartados = preparar_envios(clientes)
+    estado = {'campana': campana, 'total': len(envios), 'resumen': Counter(descartados), 'terminado': False}
+
+    def al_avanzar(resumen):
+        estado['resumen'] = resumen + descartados
+
+    def ejecutar():
+        conexion = abrir_registro(ruta_registro)
+        try:
+            estado['resumen'] = asyncio.run(despachar(
+                envios, proveedor, conexion, campana, al_avanzar=al_avanzar, **opciones
+            )) + descartados
+        except Exception as e:
+            estado['error'] = f'{type(e).__name__}: {e}'
+        finally:
+            conexion.close()
+            estado['terminado'] = True
+    
+    hilo = threading.Thread(target=ejecutar, name=f'envio-{campana}', daemon=True)
+    hilo.start()
+    return hilo, estado
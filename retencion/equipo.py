@@ -0,0 +1,47 @@
+"""Equipo del salón y agrupación de los nombres de EMPLEADO."""
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# Equipo del salón: se edita en equipo.json, sin tocar el código.
+# El orden del archivo es el orden de evaluación de alias y de visualización.
+RUTA_EQUIPO = Path(os.environ.get('BLUSH_EQUIPO', Path(__file__).resolve().parent.parent / 'equipo.json'))
+
+with open(RUTA_EQUIPO, encoding='utf-8') as f:
+    _config_equipo = json.load(f)
+
+EQUIPO = _config_equipo['estilistas']
+ESTILISTA_OTROS = _config_equipo['otros']
+NOMBRES_EQUIPO = [e['nombre'] for e in EQUIPO]
+ORDEN_ESTILISTAS = NOMBRES_EQUIPO + [ESTILISTA_OTROS]
+EMOJIS_ESTILISTA = {e['nombre']: e['emoji'] for e in EQUIPO}
+
+# nombre crudo de EMPLEADO -> estilista agrupado
+_cache_estilistas = {}
+
+def agrupar_estilista(nombre):
+    """Agrupa estilistas según la estructura del salón"""
+    nombre = str(nombre).strip()
+    
+    for estilista in EQUIPO:
+        if estilista['coincidencia'] == 'contiene':
+            if any(x in nombre for x in estilista['alias']):
+                return estilista['nombre']
+        elif nombre in estilista['alias']:
+            return estilista['nombre']
+    
+    return ESTILISTA_OTROS
+
+def normalizar_estilistas(empleados):
+    """Agrupa una columna EMPLEADO completa como Categorical ordenado.
+
+    Cada nombre distinto se resuelve una sola vez con agrupar_estilista y se
+    memoriza entre ejecuciones.
+    """
+    for nombre in pd.unique(empleados):
+        if nombre not in _cache_estilistas:
+            _cache_estilistas[nombre] = agrupar_estilista(nombre)
+    
+    return empleados.map(_cache_estilistas).astype(pd.CategoricalDtype(ORDEN_ESTILISTAS))
@@ -0,0 +1,101 @@
+"""Exportación de la lista de WhatsApp a Excel y CSV.
+
+openpyxl se importa solo al generar el Excel.
+"""
+import io
+from datetime import datetime
+
+import pandas as pd
+
+from retencion.mensajes import generar_mensajes_whatsapp
+
+COLUMNAS_WHATSAPP = ['CLIENTE', 'TELEFONO', 'ESTILISTA', 'DIAS SIN VISITA', 'SEGMENTO', 'MENSAJE']
+
+def _columnas_whatsapp(clientes_filtrados):
+    """Valores de la lista de WhatsApp como columnas (listas de Python)"""
+    return [
+        clientes_filtrados['CLIENTE'].tolist(),
+        [str(t) for t in clientes_filtrados['TELEFONO'].tolist()],
+        clientes_filtrados['ESTILISTA'].astype(str).tolist(),
+        clientes_filtrados['DIAS_SIN_VISITA'].tolist(),
+        clientes_filtrados['SEGMENTO'].astype(str).tolist(),
+        generar_mensajes_whatsapp(clientes_filtrados).tolist(),
+    ]
+
+def _estilos_excel_whatsapp():
+    """Estilos con nombre compartidos por todas las celdas del Excel"""
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+    
+    borde = Border(
+        left=Side(style='thin'), right=Side(style='thin'),
+        top=Side(style='thin'), bottom=Side(style='thin')
+    )
+    return [
+        NamedStyle(name='wa_titulo', font=Font(bold=True, size=14),
+                   alignment=Alignment(horizontal='center')),
+        NamedStyle(name='wa_encabezado', font=Font(bold=True, color="FFFFFF", size=11),
+                   fill=PatternFill(start_color="E91E63", end_color="E91E63", fill_type="solid"),
+                   alignment=Alignment(horizontal='center', wrap_text=True), border=borde),
+        NamedStyle(name='wa_dato', border=borde),
+        NamedStyle(name='wa_mensaje', border=borde,
+                   alignment=Alignment(wrap_text=True, vertical='top')),
+    ]
+
+def crear_excel_whatsapp(clientes_filtrados, fecha=None):
+    """Crea Excel con lista de WhatsApp.
+
+    ``fecha`` es la fecha de referencia del análisis, que va en el título
+    (por defecto, hoy). Usa un libro de solo escritura que se vuelca fila a
+    fila: las celdas se reutilizan con estilos con nombre y los valores salen
+    de columnas ya extraídas, sin iterrows ni estilos por celda.
+    """
+    
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Lista WhatsApp")
+    for estilo in _estilos_excel_whatsapp():
+        wb.add_named_style(estilo)
+    
+    # Anchos (deben definirse antes de escribir filas)
+    for letra, ancho in zip('ABCDEF', [35, 15, 15, 12, 15, 80]):
+        ws.column_dimensions[letra].width = ancho
+    
+    # Título
+    ws.merged_cells.add('A1:F1')
+    fecha = fecha or datetime.now()
+    titulo = WriteOnlyCell(ws, f'LISTA WHATSAPP - BLUSH SALON - {fecha.strftime("%d/%m/%Y")}')
+    titulo.style = 'wa_titulo'
+    ws.append([titulo])
+    ws.append([])
+    
+    # Headers
+    encabezados = []
+    for h in COLUMNAS_WHATSAPP:
+        c = WriteOnlyCell(ws, h)
+        c.style = 'wa_encabezado'
+        encabezados.append(c)
+    ws.append(encabezados)
+    
+    # Datos: las mismas seis celdas se reescriben en cada fila
+    celdas = [WriteOnlyCell(ws) for _ in COLUMNAS_WHATSAPP]
+    for c in celdas[:-1]:
+        c.style = 'wa_dato'
+    celdas[-1].style = 'wa_mensaje'
+    
+    for valores in zip(*_columnas_whatsapp(clientes_filtrados)):
+        for c, v in zip(celdas, valores):
+            c.value = v
+        ws.append(celdas)
+    
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+def crear_csv_whatsapp(clientes_filtrados):
+    """Crea la lista de WhatsApp como CSV UTF-8 (alternativa para listas grandes)"""
+    lista = pd.DataFrame(dict(zip(COLUMNAS_WHATSAPP, _columnas_whatsapp(clientes_filtrados))))
+    # utf-8-sig para que Excel respete tildes y emojis al abrirlo
+    return lista.to_csv(index=False).encode('utf-8-sig')
@@ -0,0 +1,49 @@
+"""Índice de clientes para filtrar la lista de WhatsApp sin recorrer toda la tabla.
+
+La tabla se ordena una sola vez por días sin visita (de mayor a menor) y se
+guardan las posiciones de cada combinación (segmento, estilista). Filtrar es
+juntar las combinaciones pedidas y cortar cada una con una búsqueda binaria
+sobre los días.
+"""
+import numpy as np
+import pandas as pd
+
+class IndiceClientes:
+    """Clientes ordenados por DIAS_SIN_VISITA con posiciones por segmento y estilista"""
+
+    def __init__(self, clientes):
+        orden = np.argsort(-clientes['DIAS_SIN_VISITA'].to_numpy(dtype=np.float64), kind='stable')
+        self.clientes = clientes.iloc[orden]
+        self._dias_negativos = -self.clientes['DIAS_SIN_VISITA'].to_numpy(dtype=np.float64)
+        self._riesgo = self.clientes['RIESGO_CHURN'].to_numpy() if 'RIESGO_CHURN' in clientes else None
+    
+        segmentos = self.clientes['SEGMENTO'].astype(object).to_numpy()
+        estilistas = self.clientes['ESTILISTA'].astype(object).to_numpy()
+        grupos = pd.Series(np.arange(len(self.clientes))).groupby([segmentos, estilistas]).indices
+        # Posiciones crecientes = días decrecientes dentro de cada grupo
+        self._grupos = {clave: (pos, self._dias_negativos[pos]) for clave, pos in grupos.items()}
+
+    def __len__(self):
+        return len(self.clientes)
+
+    def posiciones(self, segmentos, estilistas, dias_min, riesgo_min=None):
+        """Posiciones (en el orden por días) de los clientes que cumplen el filtro"""
+        partes = []
+        for segmento in segmentos:
+            for estilista in estilistas:
+                grupo = self._grupos.get((segmento, estilista))
+                if grupo is None:
+                    continue
+                pos, dias_negativos = grupo
+                partes.append(pos[:np.searchsorted(dias_negativos, -dias_min, side='right')])
+        if not partes:
+            return np.empty(0, dtype=np.int64)
+        posiciones = np.sort(np.concatenate(partes))
+        if riesgo_min is not None:
+            # Solo se mira el riesgo de los que ya pasaron los otros filtros
+            posiciones = posiciones[self._riesgo[posiciones] >= riesgo_min]
+        return posiciones
+
+    def filtrar(self, segmentos, estilistas, dias_min, riesgo_min=None):
+        """Mismo resultado que filtrar_clientes, usando el índice"""
+        return self.clientes.iloc[self.posiciones(segmentos, estilistas, dias_min, riesgo_min)]
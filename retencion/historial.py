@@ -0,0 +1,362 @@
+"""Historial incremental de ventas en SQLite.
+
+Acumula las ventas de las exportaciones mensuales en un archivo local. Cada
+línea tiene una clave de deduplicación, así que al subir un archivo solo se
+insertan las líneas nuevas y los agregados por cliente, por cliente y día
+(las visitas) y por estilista se actualizan con ese delta; el tablero lee
+los agregados, no todas las líneas.
+"""
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from retencion.analisis import (
+    agregar_riesgo_churn, agregar_ritmo, completar_clientes, metricas_desde_resumen, nombre_principal,
+    ordenar_clientes, preferido_desde_conteo
+)
+from retencion.cohortes import meses_con_visita
+from retencion.equipo import normalizar_estilistas
+from retencion.identidad import resolver_clientes
+from retencion.productos import clasificar_productos
+from retencion.visitas import visitas_diarias
+
+RUTA_HISTORIAL = Path(os.environ.get('BLUSH_HISTORIAL', Path(__file__).resolve().parent.parent / 'historial_ventas.sqlite'))
+
+_ESQUEMA_HISTORIAL = """
+CREATE TABLE IF NOT EXISTS ventas (
+    clave TEXT PRIMARY KEY,
+    fecha TEXT,
+    empleado TEXT,
+    cliente TEXT,
+    telef TEXT,
+    item TEXT,
+    clase TEXT,
+    total REAL,
+    es_producto INTEGER NOT NULL,
+    archivo TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ventas_cliente_fecha ON ventas (cliente, fecha);
+CREATE TABLE IF NOT EXISTS clientes (
+    cliente TEXT PRIMARY KEY,
+    primera_visita TEXT,
+    ultima_visita TEXT,
+    num_visitas INTEGER NOT NULL,
+    gasto_total REAL NOT NULL,
+    telefono TEXT
+);
+CREATE TABLE IF NOT EXISTS cliente_dia (
+    cliente TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    lineas INTEGER NOT NULL,
+    total REAL,
+    productos INTEGER NOT NULL,
+    PRIMARY KEY (cliente, dia)
+);
+CREATE TABLE IF NOT EXISTS cliente_empleado (
+    cliente TEXT NOT NULL,
+    empleado TEXT NOT NULL,
+    lineas INTEGER NOT NULL,
+    PRIMARY KEY (cliente, empleado)
+);
+CREATE TABLE IF NOT EXISTS empleado_ventas (
+    empleado TEXT NOT NULL,
+    es_producto INTEGER NOT NULL,
+    lineas INTEGER NOT NULL,
+    lineas_con_total INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (empleado, es_producto)
+);
+CREATE TABLE IF NOT EXISTS archivos (
+    hash TEXT PRIMARY KEY,
+    nombre TEXT,
+    cargado TEXT NOT NULL,
+    lineas INTEGER NOT NULL,
+    nuevas INTEGER NOT NULL
+);
+"""
+
+def abrir_historial(ruta=None):
+    """Abre (y crea si hace falta) el historial de ventas"""
+    conexion = sqlite3.connect(ruta or RUTA_HISTORIAL)
+    conexion.executescript(_ESQUEMA_HISTORIAL)
+    _completar_cliente_dia(conexion)
+    return conexion
+
+def _completar_cliente_dia(conexion):
+    """Arma cliente_dia desde las líneas en historiales creados antes de que existiera"""
+    vacia, = conexion.execute('SELECT NOT EXISTS (SELECT 1 FROM cliente_dia)').fetchone()
+    if vacia:
+        with conexion:
+            conexion.execute(
+                """INSERT INTO cliente_dia
+                   SELECT cliente, substr(fecha, 1, 10), count(*), sum(total), sum(es_producto) FROM ventas
+                   WHERE fecha IS NOT NULL AND cliente IS NOT NULL GROUP BY cliente, substr(fecha, 1, 10)"""
+            )
+
+def _texto_o_nulo(serie):
+    return serie.astype(object).where(serie.notna(), None)
+
+def claves_ventas(df):
+    """Clave de deduplicación de cada línea de venta.
+
+    Se calcula sobre los campos de la línea más su número de ocurrencia
+    dentro del archivo, para no fusionar dos líneas idénticas legítimas.
+    """
+    partes = [df['FECHA'].dt.strftime('%Y-%m-%d %H:%M:%S')]
+    for col in ['EMPLEADO', 'CLIENTE', 'TELEF', 'PRODUCTO / SERVICIO', 'CLASE']:
+        if col in df.columns:
+            partes.append(df[col].astype(object).where(df[col].notna(), '').astype(str))
+        else:
+            partes.append(pd.Series('', index=df.index))
+    partes.append(pd.to_numeric(df['TOTAL'], errors='coerce').astype(float).astype(str))
+    
+    texto = partes[0].str.cat(partes[1:], sep='\x1f', na_rep='')
+    texto = texto + '\x1f' + texto.groupby(texto).cumcount().astype(str)
+    return pd.Series(
+        [hashlib.blake2b(t.encode('utf-8'), digest_size=16).hexdigest() for t in texto],
+        index=df.index
+    )
+
+def ingresar_historial(conexion, hash_archivo, nombre, df):
+    """Agrega al historial solo las líneas nuevas del archivo.
+
+    Las líneas sin fecha del comienzo del archivo se omiten: son la cola de
+    una visita cuya fecha quedó en la exportación anterior, y su clave no
+    coincidiría con la de las líneas ya registradas. Devuelve (líneas del
+    archivo, líneas nuevas, líneas iniciales sin fecha). Un archivo ya
+    cargado (mismo hash) no se vuelve a procesar.
+    """
+    previo = conexion.execute('SELECT lineas, nuevas FROM archivos WHERE hash = ?', (hash_archivo,)).fetchone()
+    if previo is not None:
+        return (*previo, 0)
+    
+    lineas = len(df)
+    fechas = pd.to_datetime(df['FECHA'], errors='coerce')
+    con_fecha = fechas.notna().cummax()
+    df = df[con_fecha].copy()
+    df['FECHA'] = fechas[con_fecha].ffill()
+    df['CLAVE'] = claves_ventas(df)
+    
+    with conexion:
+        conexion.execute('CREATE TEMP TABLE IF NOT EXISTS entrada (clave TEXT PRIMARY KEY)')
+        conexion.execute('DELETE FROM entrada')
+        conexion.executemany('INSERT OR IGNORE INTO entrada VALUES (?)', ((c,) for c in df['CLAVE']))
+        existentes = {c for (c,) in conexion.execute(
+            'SELECT clave FROM entrada WHERE clave IN (SELECT clave FROM ventas)'
+        )}
+        delta = df[~df['CLAVE'].isin(existentes)].drop_duplicates('CLAVE')
+    
+        if len(delta) > 0:
+            _aplicar_delta(conexion, hash_archivo, delta)
+    
+        conexion.execute(
+            'INSERT INTO archivos VALUES (?, ?, ?, ?, ?)',
+            (hash_archivo, nombre, datetime.now().isoformat(timespec='seconds'), lineas, len(delta))
+        )
+    
+    return lineas, len(delta), lineas - len(df)
+
+def _aplicar_delta(conexion, hash_archivo, delta):
+    """Inserta las líneas nuevas y actualiza los agregados con ellas"""
+    clases = delta['CLASE'] if 'CLASE' in delta.columns else pd.Series(None, index=delta.index)
+    es_prod = clasificar_productos(delta['PRODUCTO / SERVICIO'], delta.get('CLASE'))
+    fechas = delta['FECHA'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    total = pd.to_numeric(delta['TOTAL'], errors='coerce')
+    
+    conexion.executemany(
+        'INSERT INTO ventas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        zip(delta['CLAVE'], _texto_o_nulo(fechas), _texto_o_nulo(delta['EMPLEADO']),
+            _texto_o_nulo(delta['CLIENTE']), _texto_o_nulo(delta['TELEF']),
+            _texto_o_nulo(delta['PRODUCTO / SERVICIO']), _texto_o_nulo(clases),
+            _texto_o_nulo(total), es_prod.astype(int).tolist(), [hash_archivo] * len(delta))
+    )
+    
+    # Clientes: mismas reglas que analizar_retencion, aplicadas al delta
+    por_cliente = delta.assign(FECHA_TXT=fechas, TOTAL=total).groupby('CLIENTE').agg(
+        PRIMERA=('FECHA_TXT', 'min'),
+        ULTIMA=('FECHA_TXT', 'max'),
+        VISITAS=('FECHA_TXT', 'count'),
+        GASTO=('TOTAL', 'sum'),
+        TELEFONO=('TELEF', 'first')
+    )
+    conexion.executemany(
+        """INSERT INTO clientes VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(cliente) DO UPDATE SET
+            primera_visita = coalesce(min(primera_visita, excluded.primera_visita), primera_visita, excluded.primera_visita),
+            ultima_visita = coalesce(max(ultima_visita, excluded.ultima_visita), ultima_visita, excluded.ultima_visita),
+            num_visitas = num_visitas + excluded.num_visitas,
+            gasto_total = gasto_total + excluded.gasto_total,
+            telefono = coalesce(telefono, excluded.telefono)""",
+        zip(por_cliente.index, _texto_o_nulo(por_cliente['PRIMERA']), _texto_o_nulo(por_cliente['ULTIMA']),
+            por_cliente['VISITAS'].tolist(), por_cliente['GASTO'].astype(float).tolist(),
+            _texto_o_nulo(por_cliente['TELEFONO']))
+    )
+    
+    # Visitas: líneas, monto y productos por cliente y día (el monto queda vacío si ninguna línea lo tiene)
+    por_dia = delta.assign(DIA=fechas.str[:10], TOTAL=total, ES_PRODUCTO=es_prod.astype(int)).dropna(
+        subset=['CLIENTE', 'DIA']
+    ).groupby(['CLIENTE', 'DIA']).agg(
+        LINEAS=('ES_PRODUCTO', 'size'), CON_TOTAL=('TOTAL', 'count'), TOTAL=('TOTAL', 'sum'),
+        PRODUCTOS=('ES_PRODUCTO', 'sum')
+    )
+    conexion.executemany(
+        """INSERT INTO cliente_dia VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(cliente, dia) DO UPDATE SET
+            lineas = lineas + excluded.lineas,
+            total = coalesce(total + excluded.total, total, excluded.total),
+            productos = productos + excluded.productos""",
+        zip(por_dia.index.get_level_values('CLIENTE'), por_dia.index.get_level_values('DIA'),
+            por_dia['LINEAS'].tolist(), _texto_o_nulo(por_dia['TOTAL'].where(por_dia['CON_TOTAL'] > 0)),
+            por_dia['PRODUCTOS'].tolist())
+    )
+    
+    # Conteo por cliente y nombre crudo de EMPLEADO (se agrupa al leer)
+    pares = delta.groupby(['CLIENTE', 'EMPLEADO']).size()
+    conexion.executemany(
+        """INSERT INTO cliente_empleado VALUES (?, ?, ?)
+        ON CONFLICT(cliente, empleado) DO UPDATE SET lineas = lineas + excluded.lineas""",
+        ((c, e, int(n)) for (c, e), n in pares.items())
+    )
+    
+    # Ventas por nombre crudo de EMPLEADO y producto/servicio
+    por_empleado = delta.assign(TOTAL=total, ES_PRODUCTO=es_prod.astype(int)).groupby(
+        ['EMPLEADO', 'ES_PRODUCTO']
+    )['TOTAL'].agg(['size', 'count', 'sum'])
+    conexion.executemany(
+        """INSERT INTO empleado_ventas VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(empleado, es_producto) DO UPDATE SET
+            lineas = lineas + excluded.lineas,
+            lineas_con_total = lineas_con_total + excluded.lineas_con_total,
+            total = total + excluded.total""",
+        ((e, int(p), int(r['size']), int(r['count']), float(r['sum'])) for (e, p), r in por_empleado.iterrows())
+    )
+
+def version_historial(conexion):
+    """Identifica el contenido actual del historial (para la cache)"""
+    return conexion.execute('SELECT count(*), coalesce(max(rowid), 0) FROM ventas').fetchone()
+
+def corte_historial(conexion, hoy):
+    """Límite de fecha (texto, excluido) para ver el historial al día ``hoy``.
+
+    None si no hay ventas posteriores: entonces alcanzan los agregados.
+    """
+    limite = (pd.Timestamp(hoy).normalize() + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    ultima, = conexion.execute('SELECT max(fecha) FROM ventas').fetchone()
+    return limite if ultima is not None and ultima >= limite else None
+
+# Con un corte, los agregados se recalculan desde las líneas anteriores a él
+# (el teléfono es el de la primera línea con teléfono de cada cliente, en una sola pasada)
+_CLIENTES_HASTA = """
+WITH primer_telefono AS (
+    SELECT cliente, min(rowid) AS fila FROM ventas
+    WHERE cliente IS NOT NULL AND telef IS NOT NULL AND fecha < :hasta GROUP BY cliente
+)
+SELECT v.cliente, min(v.fecha) AS primera_visita, max(v.fecha) AS ultima_visita, count(*) AS num_visitas,
+       total(v.total) AS gasto_total, t.telef AS telefono
+FROM ventas v
+LEFT JOIN primer_telefono p ON p.cliente = v.cliente
+LEFT JOIN ventas t ON t.rowid = p.fila
+WHERE v.cliente IS NOT NULL AND v.fecha < :hasta GROUP BY v.cliente
+"""
+_CLIENTE_EMPLEADO_HASTA = """
+SELECT cliente, empleado, count(*) AS lineas FROM ventas
+WHERE cliente IS NOT NULL AND empleado IS NOT NULL AND fecha < :hasta GROUP BY cliente, empleado
+"""
+_EMPLEADO_VENTAS_HASTA = """
+SELECT empleado, es_producto, count(*) AS lineas, count(total) AS lineas_con_total, total(total) AS total
+FROM ventas WHERE empleado IS NOT NULL AND fecha < :hasta GROUP BY empleado, es_producto
+"""
+
+def _origen(tabla, consulta_hasta, hasta):
+    """Tabla de agregados del historial, o su versión recalculada hasta el corte"""
+    if hasta is None:
+        return f'SELECT * FROM {tabla}', {}
+    return consulta_hasta, {'hasta': hasta}
+
+def _clientes_por_nombre(conexion, hasta=None):
+    """Agregados de la tabla clientes (uno por nombre escrito) y el CLIENTE_ID de cada uno"""
+    origen, parametros = _origen('clientes', _CLIENTES_HASTA, hasta)
+    por_nombre = pd.read_sql_query(
+        f"""SELECT cliente AS CLIENTE, primera_visita AS PRIMERA_VISITA, ultima_visita AS ULTIMA_VISITA,
+                  num_visitas AS NUM_VISITAS, gasto_total AS GASTO_TOTAL, telefono AS TELEFONO
+           FROM ({origen}) ORDER BY cliente""",
+        conexion, params=parametros, parse_dates=['PRIMERA_VISITA', 'ULTIMA_VISITA']
+    )
+    return por_nombre, resolver_clientes(por_nombre['CLIENTE'], por_nombre['TELEFONO'])
+
+def visitas_mensuales_historial(conexion, hasta=None):
+    """Pares distintos (CLIENTE_ID, MES) del historial, para las cohortes"""
+    por_nombre, ids = _clientes_por_nombre(conexion, hasta)
+    meses = pd.read_sql_query(
+        """SELECT DISTINCT cliente, substr(dia, 1, 7) AS mes FROM cliente_dia
+           WHERE :hasta IS NULL OR dia < :hasta""",
+        conexion, params={'hasta': hasta}
+    )
+    fechas = pd.to_datetime(meses['mes'], format='%Y-%m')
+    ids_meses = meses['cliente'].map(dict(zip(por_nombre['CLIENTE'], ids)))
+    return meses_con_visita(ids_meses, fechas)
+
+def visitas_diarias_historial(conexion, hasta=None):
+    """Visitas por cliente y día del historial, para la evolución mensual"""
+    return _visitas_diarias(conexion, *_clientes_por_nombre(conexion, hasta), hasta)
+
+def _visitas_diarias(conexion, por_nombre, ids, hasta=None):
+    """Visitas por cliente y día desde la tabla cliente_dia (el corte es un día, así que alcanza)"""
+    dias = pd.read_sql_query(
+        """SELECT cliente, dia, lineas, total, productos FROM cliente_dia
+           WHERE :hasta IS NULL OR dia < :hasta""",
+        conexion, params={'hasta': hasta}
+    )
+    ids_dias = dias['cliente'].map(dict(zip(por_nombre['CLIENTE'], ids)))
+    return visitas_diarias(
+        ids_dias, pd.to_datetime(dias['dia'], format='%Y-%m-%d'), dias['total'],
+        dias['productos'], dias['lineas']
+    )
+
+def analizar_historial(conexion, hoy=None):
+    """Tabla de clientes y métricas por estilista desde los agregados del historial.
+
+    Si el historial tiene ventas posteriores a ``hoy``, los agregados se
+    recalculan solo con las anteriores (el historial visto a esa fecha).
+    """
+    hoy = pd.Timestamp(hoy) if hoy is not None else datetime.now()
+    hasta = corte_historial(conexion, hoy)
+    
+    por_nombre, ids = _clientes_por_nombre(conexion, hasta)
+    
+    # Los agregados por nombre se combinan por cliente resuelto
+    clientes = por_nombre.groupby(ids, observed=True).agg(
+        PRIMERA_VISITA=('PRIMERA_VISITA', 'min'),
+        ULTIMA_VISITA=('ULTIMA_VISITA', 'max'),
+        GASTO_TOTAL=('GASTO_TOTAL', 'sum'),
+        TELEFONO=('TELEFONO', 'first')
+    )
+    clientes.insert(0, 'CLIENTE', nombre_principal(ids, por_nombre['CLIENTE'], por_nombre['NUM_VISITAS']))
+    
+    origen, parametros = _origen('cliente_empleado', _CLIENTE_EMPLEADO_HASTA, hasta)
+    pares = pd.read_sql_query(f'SELECT cliente, empleado, lineas FROM ({origen})', conexion, params=parametros)
+    pares['CLIENTE_ID'] = pares['cliente'].map(dict(zip(por_nombre['CLIENTE'], ids)))
+    pares['EMPLEADO'] = normalizar_estilistas(pares['empleado'])
+    conteo = pares.groupby(['CLIENTE_ID', 'EMPLEADO'], observed=True)['lineas'].sum().unstack(fill_value=0)
+    clientes.insert(4, 'ESTILISTA', preferido_desde_conteo(conteo).reindex(clientes.index))
+    
+    # Visitas reales (días distintos) y cadencia desde los agregados por cliente y día
+    visitas = _visitas_diarias(conexion, por_nombre, ids, hasta)
+    clientes = completar_clientes(ordenar_clientes(agregar_ritmo(clientes, visitas)), hoy)
+    clientes = agregar_riesgo_churn(clientes, visitas, hoy)
+    
+    origen, parametros = _origen('empleado_ventas', _EMPLEADO_VENTAS_HASTA, hasta)
+    ventas = pd.read_sql_query(
+        f'SELECT empleado, es_producto, lineas, lineas_con_total, total FROM ({origen})', conexion, params=parametros
+    )
+    ventas['EMPLEADO'] = normalizar_estilistas(ventas['empleado'])
+    tipo_item = ventas['es_producto'].astype(bool).astype(pd.CategoricalDtype([False, True]))
+    resumen = ventas.groupby([ventas['EMPLEADO'], tipo_item], observed=False)[
+        ['lineas', 'lineas_con_total', 'total']
+    ].sum().rename(columns={'lineas': 'size', 'lineas_con_total': 'count', 'total': 'sum'}).unstack(fill_value=0)
+    
+    return clientes, metricas_desde_resumen(resumen, clientes)
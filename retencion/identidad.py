@@ -0,0 +1,176 @@
+"""Resolución de identidad: une las distintas escrituras de un mismo cliente.
+
+Cada nombre se normaliza (sin tildes, en minúsculas, sin signos) y cada
+teléfono se reduce a sus dígitos. La comparación aproximada se hace solo
+dentro de bloques (mismo teléfono o mismo prefijo de nombre) y contra una
+ventana de vecinos en orden alfabético, así que el costo crece casi
+linealmente con la cantidad de nombres distintos en lugar de compararlos
+todos contra todos.
+"""
+import hashlib
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+# Similitud mínima (difflib) para unir dos nombres
+SIMILITUD_MISMO_TELEFONO = 0.8
+SIMILITUD_NOMBRE = 0.9
+# Vecinos, en orden alfabético dentro de cada bloque, contra los que se compara
+VENTANA_COMPARACION = 5
+DIGITOS_TELEFONO = 9
+LARGO_MINIMO_TELEFONO = 7
+# Nombres escritos cuya clave se recuerda entre llamadas (el proceso del tablero es largo)
+MAX_CACHE_NOMBRES = 200_000
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+_NO_DIGITO = re.compile(r'\D+')
+_cache_nombres = {}
+
+def normalizar_nombre(nombre):
+    """Clave de nombre: sin tildes, en minúsculas y sin signos ni espacios repetidos"""
+    if nombre is None or pd.isna(nombre):
+        return ''
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_NO_ALFANUMERICO.sub(' ', texto.casefold()).split())
+
+def normalizar_telefono(telefono):
+    """Clave de teléfono: solo dígitos y sin prefijo de país (None si es muy corto)"""
+    if telefono is None or pd.isna(telefono):
+        return None
+    digitos = _NO_DIGITO.sub('', str(telefono))[-DIGITOS_TELEFONO:]
+    if len(digitos) < LARGO_MINIMO_TELEFONO or len(set(digitos)) == 1:
+        return None
+    return digitos
+
+def claves_nombres(nombres):
+    """normalizar_nombre sobre una columna completa, una vez por valor distinto.
+
+    Las claves quedan memorizadas para las siguientes llamadas; la memoria se
+    vacía antes de pasar de MAX_CACHE_NOMBRES nombres.
+    """
+    distintos = pd.unique(nombres)
+    if len(_cache_nombres) + len(distintos) > MAX_CACHE_NOMBRES:
+        _cache_nombres.clear()
+    for nombre in distintos:
+        if nombre not in _cache_nombres:
+            _cache_nombres[nombre] = normalizar_nombre(nombre)
+    return nombres.map(_cache_nombres)
+
+def _raiz(padres, i):
+    while padres[i] != i:
+        padres[i] = padres[padres[i]]
+        i = padres[i]
+    return i
+
+def _unir(padres, i, j, telefonos=None):
+    """Une los grupos de i y j; ``telefonos`` (por raíz) pasa a la nueva raíz"""
+    i, j = _raiz(padres, i), _raiz(padres, j)
+    if i != j:
+        raiz, otra = min(i, j), max(i, j)
+        padres[otra] = raiz
+        if telefonos is not None:
+            telefonos[raiz] |= telefonos[otra]
+
+def _comparar_bloque(nombres, miembros, padres, similitud, compatibles=None, por_palabras=False, telefonos=None):
+    """Une los miembros del bloque parecidos a alguno de sus vecinos en orden alfabético"""
+    miembros = sorted(miembros)
+    comparador = SequenceMatcher(autojunk=False)
+    for k, j in enumerate(miembros):
+        largo_j = len(nombres[j])
+        palabras_j = set(nombres[j].split()) if por_palabras else None
+        preparado = False
+        for i in miembros[max(0, k - VENTANA_COMPARACION):k]:
+            if _raiz(padres, i) == _raiz(padres, j):
+                continue
+            if compatibles is not None and not compatibles(i, j):
+                continue
+            if por_palabras:
+                palabras_i = set(nombres[i].split())
+                if min(len(palabras_i), len(palabras_j)) >= 2 and (palabras_i <= palabras_j or palabras_j <= palabras_i):
+                    _unir(padres, i, j, telefonos)
+                    continue
+            # Cota de difflib por largo antes de armar el comparador
+            if 2 * min(largo_j, len(nombres[i])) < similitud * (largo_j + len(nombres[i])):
+                continue
+            if not preparado:
+                comparador.set_seq2(nombres[j])
+                preparado = True
+            comparador.set_seq1(nombres[i])
+            if comparador.quick_ratio() >= similitud and comparador.ratio() >= similitud:
+                _unir(padres, i, j, telefonos)
+
+def _clave_bloque(nombre):
+    """Prefijo del nombre: tres letras de la primera palabra y la inicial de la segunda"""
+    palabras = nombre.split()
+    return palabras[0][:3] + ' ' + (palabras[1][:1] if len(palabras) > 1 else '')
+
+def _id_cliente(clave):
+    return 'C' + hashlib.blake2b(clave.encode('utf-8'), digest_size=6).hexdigest()
+
+def resolver_clientes(clientes, telefonos=None):
+    """ID estable de cliente para cada línea.
+
+    Dos líneas son del mismo cliente si su nombre normalizado coincide, si
+    comparten teléfono y los nombres se parecen (o uno contiene las palabras
+    del otro), o si sus grupos no tienen teléfonos distintos, el primer
+    nombre es el mismo y el resto es muy parecido: sin un teléfono en común
+    no se toleran errores en el primer nombre ("Luis Pérez" y "Luisa Pérez"
+    son dos clientes). El ID se deriva del menor nombre normalizado del grupo, así
+    que no depende del orden de las líneas. Devuelve un Categorical (vacío
+    donde no hay nombre).
+    """
+    claves = claves_nombres(clientes)
+    if telefonos is None:
+        telefonos = pd.Series(None, index=clientes.index, dtype=object)
+    pares = pd.DataFrame({'nombre': claves.astype(object), 'telefono': telefonos.astype(object)})
+    pares = pares[pares['nombre'] != ''].drop_duplicates()
+    pares['telefono'] = pares['telefono'].map(normalizar_telefono, na_action='ignore')
+    
+    nombres = sorted(pares['nombre'].unique())
+    posicion = {n: i for i, n in enumerate(nombres)}
+    padres = list(range(len(nombres)))
+    # Teléfonos de cada grupo, guardados en su raíz
+    telefonos_grupo = [set() for _ in nombres]
+    bloques = {}
+    con_telefono = pares.dropna(subset=['telefono'])
+    for nombre, telefono in zip(con_telefono['nombre'], con_telefono['telefono']):
+        telefonos_grupo[posicion[nombre]].add(telefono)
+        bloques.setdefault(telefono, []).append(posicion[nombre])
+    
+    # Un número en el nombre (p. ej. "Cliente 12") no es un error de tipeo
+    numeros = [_NO_DIGITO.sub(' ', n).strip() for n in nombres]
+    primeros = [n.split()[0] for n in nombres]
+
+    def mismos_numeros(i, j):
+        return numeros[i] == numeros[j]
+    
+    # Bloques por teléfono: basta un parecido moderado
+    for miembros in bloques.values():
+        if len(miembros) > 1:
+            _comparar_bloque(
+                nombres, miembros, padres, SIMILITUD_MISMO_TELEFONO, mismos_numeros, por_palabras=True,
+                telefonos=telefonos_grupo
+            )
+    
+    # Bloques por prefijo de nombre: mismo primer nombre, parecido alto y sin
+    # teléfonos que se contradigan entre los grupos ya formados (no solo entre
+    # los dos nombres: uno sin teléfono no puede unir dos clientes distintos)
+    def compatibles(i, j):
+        if not (mismos_numeros(i, j) and primeros[i] == primeros[j]):
+            return False
+        telefonos_i = telefonos_grupo[_raiz(padres, i)]
+        telefonos_j = telefonos_grupo[_raiz(padres, j)]
+        return not telefonos_i or not telefonos_j or bool(telefonos_i & telefonos_j)
+    
+    bloques = {}
+    for i, nombre in enumerate(nombres):
+        bloques.setdefault(_clave_bloque(nombre), []).append(i)
+    for miembros in bloques.values():
+        if len(miembros) > 1:
+            _comparar_bloque(nombres, miembros, padres, SIMILITUD_NOMBRE, compatibles, telefonos=telefonos_grupo)
+    
+    # Los nombres están ordenados y la raíz es el menor índice del grupo
+    ids = {n: _id_cliente(nombres[_raiz(padres, i)]) for i, n in enumerate(nombres)}
+    return claves.map(ids).astype('category')
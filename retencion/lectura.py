@@ -0,0 +1,141 @@
+"""Lectura de la hoja de ventas exportada por el sistema de registro.
+
+No importa Streamlit: se usa desde la app y desde procesos de trabajo
+para leer varios archivos en paralelo.
+"""
+import importlib.util
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from pathlib import Path
+
+import pandas as pd
+
+COLUMNAS_VENTAS = ['FECHA', 'EMPLEADO', 'CLIENTE', 'TELEF', 'PRODUCTO / SERVICIO', 'CLASE', 'TOTAL']
+COLUMNAS_TEXTO_VENTAS = ['EMPLEADO', 'CLIENTE', 'PRODUCTO / SERVICIO', 'CLASE']
+FILA_ENCABEZADO_VENTAS = 10
+LINEAS_POR_BLOQUE = 100_000
+
+def leer_excel_ventas(origen):
+    """Lee la hoja de ventas del Excel con solo las columnas que usa la app.
+
+    Con python-calamine instalado usa ese motor; si no, recorre la hoja con
+    openpyxl en modo solo lectura y descarta al vuelo las filas sin EMPLEADO.
+    En ambos casos los tipos se fijan con limpiar_ventas.
+    """
+    if importlib.util.find_spec('python_calamine') is not None:
+        df = pd.read_excel(
+            origen, sheet_name='Hoja1', skiprows=FILA_ENCABEZADO_VENTAS - 1,
+            usecols=lambda c: c in COLUMNAS_VENTAS, dtype=object, engine='calamine'
+        )
+        df = df[df['EMPLEADO'].notna()].reset_index(drop=True)
+    else:
+        df = _leer_hoja_openpyxl(origen)
+    return limpiar_ventas(df)
+
+def leer_excel_ventas_por_bloques(origen, lineas_por_bloque=LINEAS_POR_BLOQUE):
+    """Lee la hoja de ventas en bloques de hasta ``lineas_por_bloque`` líneas.
+
+    Recorre la hoja con openpyxl en modo solo lectura, así que en memoria
+    solo hay un bloque a la vez; cada bloque sale como de leer_excel_ventas.
+    """
+    for columnas, registros in _bloques_hoja_openpyxl(origen, lineas_por_bloque):
+        yield limpiar_ventas(pd.DataFrame.from_records(registros, columns=columnas))
+
+def _leer_hoja_openpyxl(origen):
+    """Recorre Hoja1 en modo streaming guardando solo las columnas usadas"""
+    bloques = _bloques_hoja_openpyxl(origen, None)
+    columnas, registros = next(bloques)
+    bloques.close()
+    return pd.DataFrame.from_records(registros, columns=columnas)
+
+def _bloques_hoja_openpyxl(origen, lineas_por_bloque):
+    """(columnas, registros) de Hoja1 por bloques; con None, un único bloque con todo"""
+    from openpyxl import load_workbook
+    
+    wb = load_workbook(origen, read_only=True, data_only=True)
+    try:
+        filas = wb['Hoja1'].iter_rows(min_row=FILA_ENCABEZADO_VENTAS, values_only=True)
+        posiciones = {}
+        for i, nombre in enumerate(next(filas, ())):
+            if nombre in COLUMNAS_VENTAS:
+                posiciones.setdefault(nombre, i)
+        if 'EMPLEADO' not in posiciones:
+            raise KeyError('EMPLEADO')
+        
+        indices = list(posiciones.values())
+        tomar = itemgetter(*indices) if len(indices) > 1 else (lambda f: (f[indices[0]],))
+        ancho = max(indices) + 1
+        i_empleado = posiciones['EMPLEADO']
+        
+        registros = []
+        for fila in filas:
+            if len(fila) < ancho:
+                fila = fila + (None,) * (ancho - len(fila))
+            if fila[i_empleado] is None or fila[i_empleado] == '':
+                continue
+            registros.append(tomar(fila))
+            if lineas_por_bloque is not None and len(registros) >= lineas_por_bloque:
+                yield list(posiciones), registros
+                registros = []
+        if registros or lineas_por_bloque is None:
+            yield list(posiciones), registros
+    finally:
+        wb.close()
+
+def _telefonos_como_texto(telefonos):
+    """Teléfonos como texto, sin el '.0' que Excel deja en los numéricos"""
+    numeros = pd.to_numeric(telefonos, errors='coerce')
+    enteros = numeros.notna() & (numeros % 1 == 0)
+    texto = telefonos.astype(object).where(telefonos.isna(), telefonos.astype(str)).astype(object)
+    texto[enteros] = numeros[enteros].astype('int64').astype(str).astype(object)
+    return texto
+
+def limpiar_ventas(df):
+    """Fija los tipos de cada columna (fecha, texto, teléfono y monto).
+
+    Los textos y el teléfono quedan como 'str' (vacíos como NaN), así que
+    calamine y openpyxl dan el mismo esquema.
+    """
+    df = df.copy()
+    df['FECHA'] = pd.to_datetime(df['FECHA'], errors='coerce')
+    if not pd.api.types.is_numeric_dtype(df['TOTAL']):
+        df['TOTAL'] = pd.to_numeric(df['TOTAL'], errors='coerce')
+    if 'TELEF' in df.columns:
+        df['TELEF'] = _como_texto(_telefonos_como_texto(df['TELEF']))
+    for col in COLUMNAS_TEXTO_VENTAS:
+        if col in df.columns:
+            df[col] = _como_texto(df[col])
+    return df
+
+def _como_texto(valores):
+    """Columna 'str' con los vacíos como NaN (en pandas 2, astype('str') los vuelve 'nan')"""
+    return valores.astype('str').where(valores.notna())
+
+def leer_contenido_ventas(contenido):
+    """Lee la hoja de ventas desde el contenido (bytes) de un archivo"""
+    return leer_excel_ventas(io.BytesIO(contenido))
+
+def leer_contenidos_ventas(contenidos, max_procesos=None):
+    """Lee varios archivos de ventas, en paralelo si hay más de uno.
+
+    El parseo de openpyxl es intensivo en CPU y no libera el GIL, así que
+    cada archivo se lee en un proceso distinto. Devuelve los DataFrames en
+    el mismo orden que ``contenidos``.
+    """
+    procesos = min(len(contenidos), max_procesos or os.cpu_count() or 1)
+    if procesos <= 1:
+        return [leer_contenido_ventas(c) for c in contenidos]
+    
+    # spawn: el proceso de Streamlit tiene hilos y fork no es seguro
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(leer_contenido_ventas, contenidos))
+
+def combinar_ventas(ventas, nombres):
+    """Une las ventas de varios archivos marcando el ORIGEN de cada línea"""
+    return pd.concat([
+        df.assign(FECHA=df['FECHA'].ffill(), ORIGEN=Path(nombre).stem)
+        for df, nombre in zip(ventas, nombres)
+    ], ignore_index=True)
@@ -0,0 +1,107 @@
+"""Mensajes personalizados de WhatsApp."""
+from string import Formatter
+
+import numpy as np
+import pandas as pd
+
+# Plantillas según el atraso, medido en ciclos del propio cliente (días sin
+# visita / cadencia): más de 3, más de 2, más de 1 y el resto. Sin cadencia
+# el ciclo es de 30 días (>90, >60 y >30 días sin visita).
+CICLO_REFERENCIA_DIAS = 30
+# Ciclo mínimo, para no tratar como perdido a quien viene cada semana y faltó dos
+CICLO_MINIMO_DIAS = 14
+PLANTILLAS_WHATSAPP = [
+    """¡Hola {nombre}! 💇‍♀️ Somos BLUSH Hair & Make-Up y te extrañamos mucho! 
+
+Han pasado {dias} días desde tu última visita con {estilista} y queremos verte de nuevo ✨
+
+🎁 OFERTA ESPECIAL PARA TI:
+- 20% de descuento en tu próximo servicio
+- Válido hasta fin de mes
+
+📍 Los Olivos, Lima
+📱 Escríbenos para agendar tu cita
+
+¡{estilista} te está esperando! 💕""",
+    """Hola {nombre}! 😊
+
+{estilista} te manda saludos desde BLUSH! ✨
+
+Hace {dias} días que no te vemos y ya es hora de consentirte de nuevo 💅
+
+¿Agendamos tu cita esta semana?
+🎁 Tenemos promociones especiales para ti
+
+¡Te esperamos! 💕""",
+    """¡{nombre}! 💖
+
+{estilista} te recuerda que ya pasaron {dias} días desde tu última visita a BLUSH 
+
+Es momento de volver a lucir espectacular! ✨
+
+¿Cuándo te viene bien para tu próxima cita?
+
+Nos vemos pronto! 😊""",
+    """¡Hola {nombre}! 
+
+Gracias por confiar en BLUSH y en {estilista} 💕
+
+Queremos saber si quedaste satisfecha con tu último servicio y recordarte que estamos aquí para consentirte siempre que lo necesites ✨
+
+¡Hasta pronto! 💇‍♀️""",
+]
+
+# Cada plantilla precompilada como lista de (texto literal, campo)
+_PLANTILLAS_COMPILADAS = [
+    [(literal, campo) for literal, campo, _, _ in Formatter().parse(plantilla)]
+    for plantilla in PLANTILLAS_WHATSAPP
+]
+
+def banda_mensaje(dias_sin_visita, cadencia=None):
+    """Índice de la plantilla según los ciclos sin visita (cadencia en días, opcional)"""
+    dias = np.asarray(dias_sin_visita, dtype=np.float64)
+    ciclo = CICLO_REFERENCIA_DIAS
+    if cadencia is not None:
+        cadencia = np.asarray(cadencia, dtype=np.float64)
+        ciclo = np.maximum(np.where(np.isnan(cadencia), CICLO_REFERENCIA_DIAS, cadencia), CICLO_MINIMO_DIAS)
+    ciclos = dias / ciclo
+    return np.select([ciclos > 3, ciclos > 2, ciclos > 1], [0, 1, 2], default=3)
+
+def generar_mensaje_whatsapp(nombre, estilista, dias_sin_visita, num_visitas, cadencia=None):
+    """Genera mensaje personalizado según el perfil del cliente"""
+    
+    nombre_corto = nombre.split()[0] if nombre else "estimado(a) cliente"
+    
+    return PLANTILLAS_WHATSAPP[int(banda_mensaje(dias_sin_visita, cadencia))].format(
+        nombre=nombre_corto, estilista=estilista, dias=dias_sin_visita
+    )
+
+def generar_mensajes_whatsapp(clientes):
+    """Genera los mensajes de WhatsApp solo para las filas recibidas.
+
+    Las plantillas se rellenan por lotes concatenando columnas completas;
+    se llama con lo que se muestra o exporta, no con toda la base.
+    """
+    mensajes = pd.Series('', index=clientes.index, dtype=object)
+    if len(clientes) == 0:
+        return mensajes
+    
+    campos = {
+        'nombre': clientes['CLIENTE'].str.split().str[0].fillna("estimado(a) cliente").astype(object),
+        'estilista': clientes['ESTILISTA'].astype(str).astype(object),
+        'dias': clientes['DIAS_SIN_VISITA'].astype(str).astype(object),
+    }
+    bandas = banda_mensaje(clientes['DIAS_SIN_VISITA'], clientes.get('CADENCIA_DIAS'))
+    
+    for banda, plantilla in enumerate(_PLANTILLAS_COMPILADAS):
+        filas = bandas == banda
+        if not filas.any():
+            continue
+        texto = pd.Series('', index=clientes.index[filas], dtype=object)
+        for literal, campo in plantilla:
+            texto = texto + literal
+            if campo is not None:
+                texto = texto + campos[campo][filas]
+        mensajes[filas] = texto
+    
+    return mensajes
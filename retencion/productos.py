@@ -0,0 +1,53 @@
+"""Clasificación de cada línea de venta como producto o servicio."""
+import re
+
+import pandas as pd
+
+PALABRAS_PRODUCTO = [
+    'MASCARILLA', 'SHAMPOO', 'SHAMPO', 'ACONDICIONADOR',
+    'CREMA', 'SERUM', 'AMPOLLA', 'SPRAY', 'GEL',
+    'LOTION', 'REDKEN', 'LOREAL', 'TIGI', 'KERASTASE',
+    'X250ML', 'X300ML', 'X500ML', 'ML', 'GR',
+    'BED HEAD', 'ALL SOFT', 'FRIZZ DISMISS'
+]
+
+_PATRON_PRODUCTO = re.compile('|'.join(re.escape(p) for p in PALABRAS_PRODUCTO))
+
+# item -> es producto, compartido entre ejecuciones
+_cache_items_producto = {}
+
+def es_producto(nombre_item, clase):
+    """Detecta si un item es producto o servicio"""
+    if pd.notna(clase):
+        return str(clase).upper().strip() == 'PRODUCTO'
+    
+    if pd.isna(nombre_item):
+        return False
+    
+    return _PATRON_PRODUCTO.search(str(nombre_item).upper()) is not None
+
+def clasificar_productos(items, clases=None):
+    """Versión vectorizada de es_producto para columnas completas.
+
+    Cada item distinto se evalúa una sola vez con el patrón precompilado y
+    el resultado se memoriza entre ejecuciones; la CLASE, cuando existe,
+    tiene prioridad sobre el nombre.
+    """
+    nuevos = [x for x in pd.unique(items.dropna()) if x not in _cache_items_producto]
+    if nuevos:
+        textos = pd.Series([str(x) for x in nuevos], dtype=object).str.upper()
+        marcas = textos.str.contains(_PATRON_PRODUCTO, regex=True)
+        _cache_items_producto.update(zip(nuevos, marcas.tolist()))
+    
+    resultado = items.map(_cache_items_producto).fillna(False).astype(bool)
+    
+    if clases is not None:
+        con_clase = clases.notna()
+        if con_clase.any():
+            mapa_clases = {
+                c: str(c).upper().strip() == 'PRODUCTO'
+                for c in pd.unique(clases[con_clase])
+            }
+            resultado[con_clase] = clases[con_clase].map(mapa_clases).astype(bool)
+    
+    return resultado
@@ -0,0 +1,91 @@
+"""Evolución mensual de los indicadores principales.
+
+Las visitas por día (ordenadas por cliente y fecha, ver retencion.visitas)
+quedan en un solo arreglo ordenado por (cliente, día). Para cada cierre de
+mes, una búsqueda binaria por cliente da cuántas visitas tenía hasta ese
+día; con esa posición se leen la última visita y la cadencia de ese momento,
+y se segmenta igual que en el análisis. No se repite el análisis por fecha.
+"""
+import numpy as np
+import pandas as pd
+
+from retencion.analisis import segmentar_clientes
+
+# Días sin visita hasta los que un cliente cuenta como activo (igual que el tablero)
+DIAS_ACTIVO = 60
+# Celdas (cierre x cliente) por bloque, para acotar la memoria
+CELDAS_POR_BLOQUE = 2_000_000
+
+def fechas_cierre(desde, hasta):
+    """Último día de cada mes entre ``desde`` y ``hasta``; el último corte es ``hasta``"""
+    hasta = pd.Timestamp(hasta).normalize()
+    cierres = pd.date_range(pd.Timestamp(desde).normalize(), hasta, freq='ME')
+    if len(cierres) == 0 or cierres[-1] != hasta:
+        cierres = cierres.append(pd.DatetimeIndex([hasta]))
+    return cierres
+
+def cadencias_acumuladas(inicio, dias):
+    """Cadencia de cada cliente justo después de cada una de sus visitas.
+
+    ``inicio`` es la posición de la primera visita de cada cliente en
+    ``dias`` (ordenado por cliente y día). La cadencia tras la visita k es la
+    mediana de los k - 1 intervalos anteriores (vacía en la primera visita).
+    """
+    intervalos = np.zeros(len(dias))
+    intervalos[1:] = np.diff(dias)
+    cadencias = np.full(len(dias), np.nan)
+    cantidad = np.diff(np.append(inicio, len(dias)))
+    # Un paso por cantidad de intervalos, con todos los clientes que la alcanzan
+    for k in range(1, int(cantidad.max(initial=0))):
+        primeros = inicio[cantidad > k]
+        cadencias[primeros + k] = np.median(intervalos[primeros[:, None] + np.arange(1, k + 1)], axis=1)
+    return cadencias
+
+def kpis_mensuales(visitas, hoy, cierres=None):
+    """Indicadores del tablero al cierre de cada mes hasta ``hoy``.
+
+    Una fila por fecha de corte (índice: FECHA) con TOTAL_CLIENTES,
+    TASA_RETENCION (%), CLIENTES_ACTIVOS y CLIENTES_EN_RIESGO, con las mismas
+    definiciones que analizar_retencion a esa fecha.
+    """
+    columnas = ['TOTAL_CLIENTES', 'TASA_RETENCION', 'CLIENTES_ACTIVOS', 'CLIENTES_EN_RIESGO']
+    if len(visitas) == 0:
+        return pd.DataFrame(columns=columnas, index=pd.DatetimeIndex([], name='FECHA'))
+    if cierres is None:
+        cierres = fechas_cierre(visitas['FECHA'].min(), hoy)
+    
+    codigos, ids = pd.factorize(visitas['CLIENTE_ID'])
+    dias = visitas['FECHA'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    primer_dia = dias.min()
+    ancho = int(dias.max() - primer_dia) + 2
+    clave = codigos.astype(np.int64) * ancho + (dias - primer_dia)
+    inicio = np.searchsorted(codigos, np.arange(len(ids)))
+    cadencias = cadencias_acumuladas(inicio, dias)
+    
+    cortes = pd.DatetimeIndex(cierres).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    base = np.arange(len(ids), dtype=np.int64) * ancho
+    filas = []
+    paso = max(1, CELDAS_POR_BLOQUE // len(ids))
+    for desde in range(0, len(cortes), paso):
+        corte = cortes[desde:desde + paso, None]
+        posicion = np.searchsorted(clave, base + np.clip(corte - primer_dia, -1, ancho - 1), side='right')
+        num_visitas = posicion - inicio
+        con_visitas = num_visitas > 0
+        ultima = np.maximum(posicion - 1, 0)
+        dias_sin_visita = corte - dias[ultima]
+    
+        en_riesgo = np.zeros(num_visitas.shape, dtype=bool)
+        en_riesgo[con_visitas] = segmentar_clientes(
+            num_visitas[con_visitas], dias_sin_visita[con_visitas], cadencias[ultima][con_visitas]
+        ) == 'En Riesgo'
+    
+        total = con_visitas.sum(axis=1)
+        filas.append(np.column_stack([
+            total,
+            np.divide((num_visitas > 1).sum(axis=1) * 100, total, out=np.zeros(len(total)), where=total > 0),
+            (con_visitas & (dias_sin_visita <= DIAS_ACTIVO)).sum(axis=1),
+            en_riesgo.sum(axis=1),
+        ]))
+    
+    tabla = pd.DataFrame(np.vstack(filas), columns=columnas, index=pd.DatetimeIndex(cierres, name='FECHA'))
+    return tabla.astype({'TOTAL_CLIENTES': int, 'CLIENTES_ACTIVOS': int, 'CLIENTES_EN_RIESGO': int})
@@ -0,0 +1,47 @@
+"""Visitas reales y ritmo de visita de cada cliente.
+
+Una visita es un par (cliente, día): un corte, un color y un shampoo
+comprados la misma tarde son una sola visita. Los pares se arman con un
+groupby que los deja ordenados por cliente y fecha, y los intervalos entre
+visitas salen de una sola diferencia sobre todo el arreglo, descartando las
+que cruzan de un cliente al siguiente; no hay bucles por cliente.
+"""
+import numpy as np
+import pandas as pd
+
+def visitas_diarias(ids, fechas, totales, productos, lineas=1):
+    """Una fila por cliente y día con LINEAS, TOTAL y PRODUCTOS, ordenada por cliente y fecha.
+
+    Recibe líneas de venta (``productos`` es ES_PRODUCTO) o conteos ya
+    agrupados (``productos`` y ``lineas`` son cantidades de líneas). TOTAL se
+    suma en float64 y vuelve al tipo de ``totales``.
+    """
+    visitas = pd.DataFrame({
+        'CLIENTE_ID': ids,
+        'FECHA': fechas.dt.normalize(),
+        'LINEAS': lineas,
+        'TOTAL': totales.astype('float64'),
+        'PRODUCTOS': productos.astype('float32'),
+    }).dropna(subset=['CLIENTE_ID', 'FECHA'])
+    visitas = visitas.groupby(['CLIENTE_ID', 'FECHA'], observed=True).sum().reset_index()
+    return visitas.astype({'TOTAL': totales.dtype})
+
+def intervalos_visitas(visitas):
+    """Días entre cada visita y la anterior del mismo cliente (índice: CLIENTE_ID)"""
+    codigos, ids = pd.factorize(visitas['CLIENTE_ID'])
+    dias = visitas['FECHA'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    mismo = codigos[1:] == codigos[:-1]
+    return pd.Series(
+        np.diff(dias)[mismo].astype(np.float64),
+        index=np.asarray(ids.astype(str))[codigos[1:][mismo]]
+    )
+
+def ritmo_visitas(visitas):
+    """Visitas y cadencia (mediana de días entre visitas) por CLIENTE_ID.
+
+    La cadencia queda vacía para los clientes con una sola visita.
+    """
+    num_visitas = visitas.groupby('CLIENTE_ID', observed=True).size()
+    num_visitas.index = num_visitas.index.astype(str)
+    cadencia = intervalos_visitas(visitas).groupby(level=0).median()
+    return pd.DataFrame({'NUM_VISITAS': num_visitas, 'CADENCIA_DIAS': cadencia.reindex(num_visitas.index)})
@@ -0,0 +1,44 @@
+"""Resúmenes que muestran las pestañas de la app.
+
+Cada función recorre la tabla de clientes una sola vez (un ordenamiento o un
+groupby) en lugar de filtrar por estilista dentro de un bucle, y devuelve
+tablas chicas que la app memoriza por análisis.
+"""
+COLUMNAS_TOP_ESTILISTA = ['CLIENTE', 'NUM_VISITAS', 'GASTO_TOTAL', 'DIAS_SIN_VISITA', 'SEGMENTO']
+COLUMNAS_RANKING = ['CLIENTE', 'NUM_VISITAS', 'GASTO_TOTAL', 'ESTILISTA', 'DIAS_SIN_VISITA']
+
+def ranking_visitas(clientes):
+    """Clientes de más a menos visitas (empates en el orden de la tabla, como nlargest)"""
+    return clientes.sort_values('NUM_VISITAS', ascending=False, kind='stable')
+
+def top_clientes_por_estilista(clientes, estilistas, n=5):
+    """Los n clientes con más visitas de cada estilista, en un dict estilista -> tabla"""
+    top = ranking_visitas(clientes).groupby('ESTILISTA', observed=True, sort=False).head(n)
+    grupos = dict(list(top.groupby('ESTILISTA', observed=True)[COLUMNAS_TOP_ESTILISTA]))
+    return {e: grupos[e] for e in estilistas if e in grupos}
+
+def segmentos_por_estilista(clientes, estilistas):
+    """Clientes por estilista y segmento (como pd.crosstab, solo con estilistas dados)"""
+    principales = clientes[clientes['ESTILISTA'].isin(estilistas)]
+    tabla = principales.groupby(['ESTILISTA', 'SEGMENTO'], observed=True).size().unstack(fill_value=0)
+    return tabla.rename_axis(index='ESTILISTA', columns='SEGMENTO')
+
+def estadisticas_generales(clientes):
+    """Indicadores de visitas y gasto de la pestaña de estadísticas"""
+    visitas = clientes['NUM_VISITAS']
+    una_visita = int((visitas == 1).sum())
+    return {
+        'visitas_promedio': visitas.mean(),
+        'visitas_mediana': visitas.median(),
+        'visitas_max': visitas.max(),
+        'una_visita': una_visita,
+        'pct_una_visita': una_visita / len(clientes) * 100 if len(clientes) else 0.0,
+        'gasto_promedio_visita': clientes['GASTO_PROMEDIO'].mean(),
+        'gasto_promedio_cliente': clientes['GASTO_TOTAL'].mean(),
+        'gasto_max': clientes['GASTO_TOTAL'].max(),
+    }
+
+def distribucion_segmentos(clientes):
+    """Clientes por segmento, sin los segmentos vacíos"""
+    segmentos = clientes['SEGMENTO'].value_counts()
+    return segmentos[segmentos > 0]
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from retencion.analisis import completar_clientes
+
+def test_dias_sin_visita_no_desborda_con_visitas_muy_antiguas():
+    hoy = pd.Timestamp('2025-12-30')
+    clientes = pd.DataFrame({
+        'CLIENTE': ['Ana Ruiz', 'Luis Soto'],
+        'NUM_VISITAS': [1, 1],
+        'CADENCIA_DIAS': [float('nan')] * 2,
+        'GASTO_TOTAL': [50.0, 80.0],
+        'ESTILISTA': [None, None],
+        'ULTIMA_VISITA': pd.to_datetime(['1899-12-30', '2025-12-20']),
+    })
+    clientes = completar_clientes(clientes, hoy)
+    
+    assert list(clientes['DIAS_SIN_VISITA']) == [(hoy - pd.Timestamp('1899-12-30')).days, 10]
+    assert list(clientes['SEGMENTO']) == ['Perdido', 'Nuevo']
+
+def test_dias_sin_visita_queda_en_int16_si_entra():
+    clientes = pd.DataFrame({
+        'CLIENTE': ['Ana Ruiz'], 'NUM_VISITAS': [2], 'CADENCIA_DIAS': [30.0], 'GASTO_TOTAL': [50.0],
+        'ESTILISTA': [None], 'ULTIMA_VISITA': pd.to_datetime(['2025-12-01']),
+    })
+    clientes = completar_clientes(clientes, pd.Timestamp('2025-12-30'))
+    assert clientes['DIAS_SIN_VISITA'].dtype == 'int16'
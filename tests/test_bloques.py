@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from benchmarks.datos_sinteticos import escribir_excel_ventas, generar_ventas
+from retencion.analisis import analizar_retencion
+from retencion.bloques import acumular_bloques
+from retencion.cli import main
+from retencion.lectura import limpiar_ventas
+
+FECHA = '2025-07-01'
+
+@pytest.fixture(scope='module')
+def ventas():
+    # Incluye clientes con cientos de visitas
+    return generar_ventas(4000, semilla=3)
+
+def _bloques(df, tamano):
+    for inicio in range(0, len(df), tamano):
+        yield df.iloc[inicio:inicio + tamano].copy()
+
+def test_por_bloques_igual_a_lectura_completa(ventas, tmp_path):
+    excel = tmp_path / 'ventas.xlsx'
+    escribir_excel_ventas(ventas, excel)
+    main([str(excel), '--fecha', FECHA, '--csv', '--sin-cache', '--salida', str(tmp_path / 'completa')])
+    main([str(excel), '--fecha', FECHA, '--csv', '--por-bloques', '700', '--salida', str(tmp_path / 'bloques')])
+    
+    completa = sorted(p.name for p in (tmp_path / 'completa').iterdir())
+    assert completa == sorted(p.name for p in (tmp_path / 'bloques').iterdir())
+    for nombre in completa:
+        assert (tmp_path / 'completa' / nombre).read_bytes() == (tmp_path / 'bloques' / nombre).read_bytes(), nombre
+
+def test_tope_de_dias_por_cliente(ventas):
+    df = limpiar_ventas(ventas)
+    hoy = pd.Timestamp(FECHA)
+    tope = 20
+    acumulador = acumular_bloques(_bloques(df, 500), hoy, max_dias_por_cliente=tope)
+    
+    dias = acumulador.tabla('dias')
+    assert dias.groupby(level='CLIENTE').size().max() <= tope
+    assert acumulador.dias_descartados.sum() > 0
+    
+    clientes, _ = acumulador.analizar(hoy)
+    esperados, _ = analizar_retencion(df, hoy=hoy)
+    pd.testing.assert_frame_equal(
+        clientes[['CLIENTE_ID', 'PRIMERA_VISITA', 'ULTIMA_VISITA', 'GASTO_TOTAL']],
+        esperados[['CLIENTE_ID', 'PRIMERA_VISITA', 'ULTIMA_VISITA', 'GASTO_TOTAL']]
+    )
+    # Las visitas descartadas siguen contando (salvo días repetidos con dos escrituras del nombre)
+    assert (clientes['NUM_VISITAS'] >= esperados['NUM_VISITAS']).all()
+    
+    # Diferencia documentada: la cadencia de los clientes que pasan el tope usa solo
+    # sus últimas visitas; la de los demás no cambia
+    pasan = esperados['NUM_VISITAS'] > tope
+    assert pasan.any()
+    pd.testing.assert_series_equal(
+        clientes.loc[~pasan, 'CADENCIA_DIAS'], esperados.loc[~pasan, 'CADENCIA_DIAS']
+    )
+    assert not clientes.loc[pasan, 'CADENCIA_DIAS'].equals(esperados.loc[pasan, 'CADENCIA_DIAS'])
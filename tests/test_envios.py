@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from retencion.envios import ProveedorHTTP, abrir_registro, enviar_campana, ya_enviados
+
+class _ServidorPrueba(BaseHTTPRequestHandler):
+    """Proveedor simulado: responde 200 salvo las fallas programadas por número"""
+
+    def do_POST(self):
+        cuerpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        servidor = self.server
+        with servidor.candado:
+            servidor.recibidos.append((cuerpo['to'], time.monotonic()))
+            fallas = servidor.fallas.get(cuerpo['to'])
+            falla = fallas.pop(0) if fallas else None
+        if falla is not None:
+            codigo, encabezados = falla
+            self.send_response(codigo)
+            for nombre, valor in encabezados.items():
+                self.send_header(nombre, valor)
+            self.end_headers()
+            return
+        respuesta = json.dumps({'messages': [{'id': f"wamid.{cuerpo['to']}"}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(respuesta)))
+        self.end_headers()
+        self.wfile.write(respuesta)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServidorPrueba)
+    servidor.recibidos, servidor.fallas, servidor.candado = [], {}, threading.Lock()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+def _clientes(telefonos):
+    return pd.DataFrame({
+        'CLIENTE': [f'Cliente {i}' for i in range(len(telefonos))],
+        'TELEFONO': telefonos,
+        'ESTILISTA': 'Vero',
+        'DIAS_SIN_VISITA': 90,
+        'CADENCIA_DIAS': 30.0,
+    })
+
+def _proveedor(servidor):
+    return ProveedorHTTP(f'http://127.0.0.1:{servidor.server_address[1]}/messages', timeout=5)
+
+def _enviar(clientes, proveedor, registro, **opciones):
+    return enviar_campana(clientes, proveedor, 'prueba', registro, por_segundo=100, espera_base=0.01, **opciones)
+
+def test_no_envia_dos_veces_al_mismo_numero(servidor, tmp_path):
+    clientes = _clientes(['987654321', '+51 987 654 321', '912345678', None])
+    resumen = _enviar(clientes, _proveedor(servidor), tmp_path / 'envios.sqlite')
+    
+    assert sorted(to for to, _ in servidor.recibidos) == ['51912345678', '51987654321']
+    assert resumen['enviados'] == 2
+    assert resumen['duplicados'] == 1
+    assert resumen['sin_telefono'] == 1
+
+def test_retoma_sin_repetir_lo_ya_enviado(servidor, tmp_path):
+    clientes = _clientes([f'9{i:08d}' for i in range(1, 7)])
+    registro = tmp_path / 'envios.sqlite'
+    
+    class ProveedorQueSeCae(ProveedorHTTP):
+        """Se cae (una excepción que no es ErrorEnvio) después de tres envíos"""
+
+        async def enviar(self, telefono, mensaje):
+            if len(servidor.recibidos) >= 3:
+                raise RuntimeError('caída del proceso')
+            return await super().enviar(telefono, mensaje)
+    
+    with pytest.raises(RuntimeError):
+        _enviar(clientes, ProveedorQueSeCae(_proveedor(servidor).url), registro, simultaneos=1)
+    primeros = [to for to, _ in servidor.recibidos]
+    assert len(primeros) == 3
+    
+    resumen = _enviar(clientes, _proveedor(servidor), registro)
+    enviados = [to for to, _ in servidor.recibidos]
+    
+    assert resumen['ya_enviados'] == 3
+    assert resumen['enviados'] == 3
+    assert sorted(enviados) == sorted(set(enviados)) and len(enviados) == 6
+    conexion = abrir_registro(registro)
+    try:
+        assert len(ya_enviados(conexion, 'prueba')) == 6
+    finally:
+        conexion.close()
+
+def test_reintenta_un_503_despues_de_retry_after(servidor, tmp_path):
+    servidor.fallas['51987654321'] = [(503, {'Retry-After': '1'})]
+    registro = tmp_path / 'envios.sqlite'
+    resumen = _enviar(_clientes(['987654321']), _proveedor(servidor), registro)
+    
+    (_, primero), (_, segundo) = servidor.recibidos
+    assert resumen['enviados'] == 1
+    assert segundo - primero >= 0.9
+    conexion = abrir_registro(registro)
+    try:
+        estado, intentos, id_mensaje = conexion.execute('SELECT estado, intentos, id_mensaje FROM envios').fetchone()
+    finally:
+        conexion.close()
+    assert (estado, intentos, id_mensaje) == ('enviado', 2, 'wamid.51987654321')
@@ -0,0 +1,14 @@
+from datetime import date
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from retencion.exportar import crear_excel_whatsapp
+
+def test_titulo_del_excel_usa_la_fecha_de_referencia():
+    clientes = pd.DataFrame({
+        'CLIENTE': ['Ana Ruiz'], 'TELEFONO': ['987654321'], 'ESTILISTA': ['Vero'],
+        'DIAS_SIN_VISITA': [90], 'CADENCIA_DIAS': [30.0], 'SEGMENTO': ['En Riesgo'],
+    })
+    libro = load_workbook(crear_excel_whatsapp(clientes, date(2024, 3, 15)))
+    assert libro['Lista WhatsApp']['A1'].value == 'LISTA WHATSAPP - BLUSH SALON - 15/03/2024'
@@ -0,0 +1,23 @@
+from contextlib import closing
+
+from benchmarks.datos_sinteticos import generar_ventas
+from retencion.historial import abrir_historial, ingresar_historial
+from retencion.lectura import limpiar_ventas
+
+def test_exportaciones_superpuestas_no_duplican_lineas(tmp_path):
+    df = limpiar_ventas(generar_ventas(3000, semilla=5))
+    # La segunda exportación empieza a mitad de una visita: sus primeras líneas no tienen fecha
+    corte = next(i for i in range(2000, 2400) if df['FECHA'].isna().iloc[i])
+    primera, segunda = df.iloc[:2500], df.iloc[corte:]
+    
+    with closing(abrir_historial(tmp_path / 'historial.sqlite')) as conexion:
+        assert ingresar_historial(conexion, 'a', 'enero.xlsx', primera) == (2500, 2500, 0)
+        lineas, nuevas, sin_fecha = ingresar_historial(conexion, 'b', 'febrero.xlsx', segunda)
+        assert ingresar_historial(conexion, 'b', 'febrero.xlsx', segunda) == (lineas, nuevas, 0)
+        total, = conexion.execute('SELECT count(*) FROM ventas').fetchone()
+    
+    assert sin_fecha > 0
+    assert lineas == len(df) - corte
+    # La cola sin fecha de la visita cortada ya estaba en la primera exportación
+    assert nuevas == len(df) - 2500
+    assert total == len(df)
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from retencion.identidad import resolver_clientes
+
+def _ids(nombres, telefonos):
+    return list(resolver_clientes(pd.Series(nombres), pd.Series(telefonos, dtype=object)))
+
+def test_no_une_primeros_nombres_distintos_sin_telefono():
+    for nombre, otro in [('Luis Pérez', 'Luisa Pérez'), ('Maria Gómez', 'Mario Gómez'), ('Julia Ríos', 'Julio Ríos')]:
+        ids = _ids([nombre, otro], ['987654321', None])
+        assert ids[0] != ids[1], (nombre, otro)
+        ids = _ids([nombre, otro], [None, None])
+        assert ids[0] != ids[1], (nombre, otro)
+
+def test_une_errores_en_el_apellido_sin_telefono():
+    ids = _ids(['Maria Fernandez', 'Maria Fernandes', 'MARÍA FERNÁNDEZ'], ['987654321', None, None])
+    assert len(set(ids)) == 1
+
+def test_une_nombres_parecidos_con_el_mismo_telefono():
+    ids = _ids(['Luis Pérez', 'Luiz Perez'], ['987654321', '+51 987 654 321'])
+    assert ids[0] == ids[1]
+
+def test_no_une_nombres_parecidos_con_telefonos_distintos():
+    ids = _ids(['Maria Fernandez', 'Maria Fernandes'], ['987654321', '912345678'])
+    assert ids[0] != ids[1]
+
+def test_un_nombre_sin_telefono_no_une_grupos_con_telefonos_distintos():
+    ids = _ids(['Maria Fernandez', 'Maria Fernandes', 'Maria Fernandes z'], ['987654321', None, '912345678'])
+    assert ids[0] != ids[2]
+    assert ids[1] in (ids[0], ids[2])
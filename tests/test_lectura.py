@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from retencion.lectura import limpiar_ventas
+
+@pytest.mark.parametrize('texto_como_str', [True, False])
+def test_limpiar_ventas_deja_los_vacios_como_nan(texto_como_str):
+    # Sin future.infer_string, astype('str') se comporta como en pandas 2
+    with pd.option_context('future.infer_string', texto_como_str):
+        df = pd.DataFrame({
+            'FECHA': ['2025-01-01', '2025-01-02'],
+            'EMPLEADO': ['Ana', None],
+            'CLIENTE': ['Luis Pérez', np.nan],
+            'TELEF': [987654321.0, None],
+            'PRODUCTO / SERVICIO': ['Corte', None],
+            'CLASE': [None, 'PRODUCTO'],
+            'TOTAL': [30, 45],
+        }, dtype=object)
+        df = limpiar_ventas(df)
+    
+    assert list(df['TELEF'].isna()) == [False, True]
+    assert df.loc[0, 'TELEF'] == '987654321'
+    for col in ['EMPLEADO', 'CLIENTE', 'PRODUCTO / SERVICIO']:
+        assert list(df[col].isna()) == [False, True], col
+    assert list(df['CLASE'].isna()) == [True, False]
+    assert not df.isin(['nan', 'None']).any().any()